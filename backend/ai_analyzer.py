@@ -1,65 +1,129 @@
-import requests
+import asyncio
 import json
+from http_client import DatabricksHTTP
+from analysis_scheduler import analysis_scheduler
+from llm_cache import LLMCache, llm_cache
+from prompt_builder import PromptBuilder
+from rule_engine import RuleEngine
 from utils import get_logger, get_config
 
 logger = get_logger(__name__)
 config = get_config()
 
+# 'auto' calls the LLM only for issues no rule covers, 'rules' never calls it, 'llm' always does
+AI_MODES = ("auto", "rules", "llm")
+
 class AIAnalyzer:
     @staticmethod
-    def analyze_issues(dq_results):
-        """Sends DQ results to an LLM for analysis."""
-        logger.info("Starting AI analysis...")
-        
-        prompt = f"""
-        You are a Data Quality Expert for Databricks. Analyze the following data quality issues and provide:
-        1. Root cause analysis.
-        2. A pipeline reliability score (0-100).
-        3. Recommended SQL fixes.
-        4. Recommended Python fixes.
-        5. Delta Lake optimization suggestions.
+    def llm_available():
+        return bool(config["token"] and config["serving_endpoint"])
+
+    @staticmethod
+    async def analyze_issues(dq_results, on_token=None, mode=None):
+        """
+        Analyzes DQ results with the rule engine, and the LLM where the mode calls for it.
+
+        Args:
+            dq_results: Results from DQChecks
+            on_token: Optional callable(text) receiving the completion as it streams from the
+                      serving endpoint (not called when the analysis is served from the cache)
+            mode: One of AI_MODES (defaults to AI_MODE)
+
+        Returns:
+            The analysis dict; 'analysis_source' says whether it came from 'rules', 'llm' or
+            'rules+llm'. The rules analysis stands in when no endpoint is configured, or the LLM
+            fails or misses the LLM_TIMEOUT_SECONDS deadline.
+        """
+        mode = mode or config["ai_mode"]
+        rules_analysis = RuleEngine.analyze(dq_results)
+        if mode == "rules" or not AIAnalyzer.llm_available():
+            return rules_analysis
         
-        Data Quality Report:
-        {json.dumps(dq_results, indent=2)}
+        if mode == "auto":
+            uncovered = rules_analysis["uncovered_issues"]
+            if not uncovered:
+                return rules_analysis
+            # Only the issues the rules could not explain go to the LLM
+            llm_analysis = await AIAnalyzer._llm_analysis({**dq_results, "issues": uncovered}, on_token)
+            return RuleEngine.merge(rules_analysis, llm_analysis) if llm_analysis else rules_analysis
         
-        Return the response as valid JSON with keys: 
-        root_cause_analysis, pipeline_health, recommended_sql_fixes, recommended_python_fixes, delta_optimizations, summary.
-        """
+        llm_analysis = await AIAnalyzer._llm_analysis(dq_results, on_token)
+        return llm_analysis or rules_analysis
+
+    @staticmethod
+    async def _llm_analysis(dq_results, on_token=None):
+        """Sends DQ results to the LLM through the analysis scheduler; returns None if it fails."""
+        logger.info("Starting AI analysis...")
         
-        # Try Databricks Serving
-        if config["token"] and config["serving_endpoint"]:
-            try:
-                return AIAnalyzer._call_databricks_llm(prompt)
-            except Exception as e:
-                logger.warning(f"Databricks LLM failed: {e}. Falling back to mock.")
+        # Ranked issues plus a summary of healthy columns, sized to PROMPT_TOKEN_BUDGET
+        prompt, prompt_stats = PromptBuilder.build(dq_results)
         
-        # Fallback to Mock/Heuristic if no LLM available
-        return AIAnalyzer._mock_analysis(dq_results)
+        # Identical issue sets reuse (or join) an earlier call
+        key = LLMCache.key(dq_results, config["serving_endpoint"])
+        stream = AIAnalyzer._stream_databricks_llm if on_token is not None and config["llm_streaming"] else None
+        report = None
+        if analysis_scheduler.batching and prompt_stats["estimated_tokens"] <= config["llm_batch_table_max_tokens"]:
+            # Small enough to share a prompt with other tables analyzed at about the same time
+            report, _ = PromptBuilder.build(dq_results, instructions=None)
+        call = lambda: analysis_scheduler.submit(
+            prompt, AIAnalyzer._call_databricks_llm, stream=stream, on_token=on_token, report=report
+        )
+        try:
+            # The deadline covers queueing, throttling and the call itself; the shared
+            # call is bounded, so joiners of a stuck request give up with it
+            analysis = await llm_cache.get_or_call(key, lambda: asyncio.wait_for(call(), config["llm_timeout_seconds"]))
+        except asyncio.TimeoutError:
+            logger.warning(f"Databricks LLM did not answer within {config['llm_timeout_seconds']:g}s. Falling back to rules.")
+            return None
+        except Exception as e:
+            logger.warning(f"Databricks LLM failed: {e}. Falling back to rules.")
+            return None
+        analysis["prompt_stats"] = prompt_stats
+        analysis["analysis_source"] = "llm"
+        return analysis
 
     @staticmethod
-    def _call_databricks_llm(prompt):
-        url = f"{config['host']}/serving-endpoints/{config['serving_endpoint']}/invocations"
-        headers = {"Authorization": f"Bearer {config['token']}", "Content-Type": "application/json"}
+    async def _call_databricks_llm(prompt, max_retries=None):
+        path = f"/serving-endpoints/{config['serving_endpoint']}/invocations"
         payload = {"messages": [{"role": "user", "content": prompt}]}
         
-        response = requests.post(url, headers=headers, json=payload)
+        response = await DatabricksHTTP.request(
+            "POST", path, json=payload, max_retries=max_retries, timeout=config["llm_timeout_seconds"]
+        )
         response.raise_for_status()
         # Parse response (assuming chat format)
-        content = response.json()['choices'][0]['message']['content']
+        return AIAnalyzer._parse_content(response.json()['choices'][0]['message']['content'])
+
+    @staticmethod
+    async def _stream_databricks_llm(prompt, on_token, max_retries=None):
+        """Calls the serving endpoint in streaming mode, passing each content delta to on_token."""
+        path = f"/serving-endpoints/{config['serving_endpoint']}/invocations"
+        payload = {"messages": [{"role": "user", "content": prompt}], "stream": True}
+        
+        parts = []
+        async with DatabricksHTTP.stream(
+            "POST", path, json=payload, max_retries=max_retries, timeout=config["llm_timeout_seconds"]
+        ) as response:
+            if response.is_error:
+                await response.aread()
+            response.raise_for_status()
+            # Chat completion chunks arrive as server-sent events: 'data: {...}' lines, then 'data: [DONE]'
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                text = (choices[0].get("delta") or {}).get("content")
+                if text:
+                    parts.append(text)
+                    on_token(text)
+        return AIAnalyzer._parse_content("".join(parts))
+
+    @staticmethod
+    def _parse_content(content):
         # Extract JSON from content if wrapped in markdown code blocks
         if "```json" in content:
             content = content.split("```json")[1].split("```")[0]
         return json.loads(content)
-
-    @staticmethod
-    def _mock_analysis(dq_results):
-        """Mock response for testing/demo without keys."""
-        issues_count = len(dq_results.get("issues", []))
-        return {
-            "root_cause_analysis": f"Detected {issues_count} issues. Primary concerns involve null values and potential duplicates.",
-            "pipeline_health": "At Risk" if issues_count > 2 else "Healthy",
-            "recommended_sql_fixes": "DELETE FROM table WHERE id IS NULL;",
-            "recommended_python_fixes": "df = df.dropna(subset=['critical_col'])",
-            "delta_optimizations": ["Run OPTIMIZE on the table", "Run VACUUM to remove old files"],
-            "summary": "Data quality is generally acceptable but requires attention to null handling."
-        }
@@ -0,0 +1,205 @@
+import asyncio
+import time
+import httpx
+from http_client import DatabricksHTTP, RETRY_STATUS_CODES
+from prompt_builder import PromptBuilder
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+
+class TokenBucket:
+    """Paces requests to rate_per_second with bursts of up to capacity.
+
+    pause() holds every caller back for a while (e.g. a 429's Retry-After),
+    after which requests resume one at a time at the normal rate. A rate of
+    0 disables pacing but still honours pauses.
+    """
+
+    def __init__(self, rate_per_second, capacity):
+        self.rate = rate_per_second
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            if self.rate <= 0:
+                return
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 1.0
+        self.updated = self.paused_until
+
+
+class _Item:
+    def __init__(self, report, complete):
+        self.report = report
+        self.complete = complete
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class AnalysisScheduler:
+    """Schedules LLM analysis requests to the serving endpoint.
+
+    At most max_in_flight requests run at once, and they are paced by a token
+    bucket of requests_per_minute. A 429/503 pauses every request for the
+    Retry-After the endpoint asked for (or an exponential backoff) before
+    retrying, instead of each request retrying on its own schedule. Small
+    reports arriving within batch_window_seconds of each other are combined,
+    up to batch_max_tables at a time, into one prompt whose response is split
+    back per table. A report missing from a batched response, or from a batched
+    request that failed, is requested on its own; a report arriving while
+    nothing else is queued or running is sent at once.
+    """
+
+    def __init__(self, max_in_flight=4, requests_per_minute=60, batch_max_tables=5, batch_window_seconds=0.5):
+        self.max_in_flight = max(1, max_in_flight)
+        self.requests_per_minute = requests_per_minute
+        self.batch_max_tables = batch_max_tables
+        self.batch_window_seconds = batch_window_seconds
+        self.bucket = TokenBucket(requests_per_minute / 60, self.max_in_flight)
+        self._slots = None
+        self._pending = []
+        self._flush_task = None
+        self.in_flight = 0
+        self.requests = 0
+        self.batches = 0
+        self.batched_tables = 0
+        self.throttled = 0
+
+    @property
+    def batching(self):
+        return self.batch_max_tables > 1
+
+    async def submit(self, prompt, complete, stream=None, on_token=None, report=None):
+        """
+        Runs one analysis request through the scheduler.
+
+        Args:
+            prompt: The full single-table prompt
+            complete: Async callable(prompt, max_retries) returning the parsed response
+            stream: Optional async callable(prompt, on_token, max_retries) streaming the response
+            on_token: Callback for streamed text; used when the request is sent on its own
+            report: The table's report without instructions (PromptBuilder.build(instructions=None));
+                    given for small reports that may share a batched prompt
+
+        Returns:
+            The parsed analysis (raises if the endpoint fails after retries)
+        """
+        if report is None or not self.batching or (not self._pending and self.in_flight == 0):
+            # Nothing to share a prompt with, so don't hold the request back for the batch window
+            return await self._single(prompt, complete, stream, on_token)
+
+        item = _Item(report, complete)
+        self._pending.append(item)
+        if len(self._pending) >= self.batch_max_tables:
+            self._flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        analysis = await item.future
+        if analysis is None:
+            # Only one report was waiting, or the batched request failed or left this one out
+            return await self._single(prompt, complete, stream, on_token)
+        return analysis
+
+    def stats(self):
+        return {
+            "max_in_flight": self.max_in_flight,
+            "requests_per_minute": self.requests_per_minute,
+            "batch_max_tables": self.batch_max_tables,
+            "in_flight": self.in_flight,
+            "queued_for_batch": len(self._pending),
+            "requests": self.requests,
+            "batches": self.batches,
+            "batched_tables": self.batched_tables,
+            "throttled": self.throttled
+        }
+
+    async def _single(self, prompt, complete, stream, on_token):
+        if stream is not None and on_token is not None:
+            return await self._send(lambda max_retries: stream(prompt, on_token, max_retries=max_retries))
+        return await self._send(lambda max_retries: complete(prompt, max_retries=max_retries))
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.batch_window_seconds)
+        self._flush_task = None
+        self._flush()
+
+    def _flush(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        # Callers that hit their deadline while waiting are left out
+        items = [item for item in self._pending if not item.future.done()]
+        self._pending = []
+        if len(items) == 1:
+            items[0].future.set_result(None)
+        elif items:
+            asyncio.create_task(self._run_batch(items))
+
+    async def _run_batch(self, items):
+        prompt, labels = PromptBuilder.build_batch([item.report for item in items])
+        logger.info(f"Sending {len(items)} table analyses in one batched prompt")
+        try:
+            response = await self._send(lambda max_retries: items[0].complete(prompt, max_retries=max_retries))
+        except Exception as e:
+            # A combined prompt can fail where its parts would not (e.g. too long); retry each on its own
+            logger.warning(f"Batched analysis of {len(items)} tables failed ({e}); requesting them one by one")
+            for item in items:
+                if not item.future.done():
+                    item.future.set_result(None)
+            return
+        self.batches += 1
+        self.batched_tables += len(items)
+        for label, item in zip(labels, items):
+            analysis = response.get(label) if isinstance(response, dict) else None
+            if not item.future.done():
+                item.future.set_result(analysis if isinstance(analysis, dict) else None)
+
+    async def _send(self, call):
+        """Runs call(max_retries=0) in a slot, paced by the bucket, retrying throttled attempts after a shared pause."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+        retries = config["http_max_retries"]
+        attempt = 0
+        while True:
+            async with self._slots:
+                await self.bucket.acquire()
+                self.in_flight += 1
+                self.requests += 1
+                try:
+                    # The HTTP layer must not retry on its own; throttling is handled here for every request at once
+                    return await call(0)
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code not in RETRY_STATUS_CODES or attempt >= retries:
+                        raise
+                    status_code = e.response.status_code
+                    delay = DatabricksHTTP._retry_delay(e.response, attempt)
+                finally:
+                    self.in_flight -= 1
+            self.throttled += 1
+            logger.warning(f"Serving endpoint returned {status_code}, pausing LLM requests for {delay:.1f}s (attempt {attempt + 1}/{retries})")
+            self.bucket.pause(delay)
+            attempt += 1
+
+
+analysis_scheduler = AnalysisScheduler(
+    max_in_flight=config["llm_max_in_flight"],
+    requests_per_minute=config["llm_requests_per_minute"],
+    batch_max_tables=config["llm_batch_max_tables"],
+    batch_window_seconds=config["llm_batch_window_seconds"]
+)
@@ -1,20 +1,39 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import pandas as pd
+import asyncio
 import os
-import uuid
+import time
 
 from dbx_cli import DatabricksCLI
-from dq_checks import DQChecks
-from ai_analyzer import AIAnalyzer
+from dq_checks import DQChecks, PROFILE_MODES, DUPLICATE_MODES
+from query_planner import QueryPlanner
+from incremental import IncrementalProfiler
+from streaming_profiler import StreamingProfiler
+from dbfs_reader import DBFSReader, DBFS_SAMPLE_MODES
+from columnar_reader import ColumnarReader, COLUMNAR_FORMATS, detect_format
+from dbx_rest import DatabricksREST
+from ai_analyzer import AIAnalyzer, AI_MODES
 from fixit_generator import FixItGenerator
 from report_generator import ReportGenerator
 from model_selector import get_active_model
-from utils import get_logger
+from http_client import DatabricksHTTP
+from metadata_cache import metadata_cache
+from profile_cache import ProfileCache, profile_cache
+from llm_cache import llm_cache
+from analysis_scheduler import analysis_scheduler
+from scan_jobs import ScanJobManager, TERMINAL_STATES
+from statement_manager import statement_manager, current_scan_id
+from batch_scheduler import BatchScan, BATCH_PRIORITIES, expand_target
+from scan_planner import ScanPlanner
+from scan_store import create_scan_store
+from utils import get_logger, get_config
 
 logger = get_logger(__name__)
+config = get_config()
 
 app = FastAPI(title="Databricks PS AI Data Quality Guardrail")
 
@@ -27,16 +46,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# State storage (in-memory for demo)
-scans = {}
+# Scan history lives in the scan store (SQLite by default) so it survives restarts
+# and is shared between uvicorn workers; running jobs are tracked per worker
+scan_store = create_scan_store()
+scan_jobs = ScanJobManager(store=scan_store, persist_interval_seconds=config["scan_persist_interval_seconds"])
 
 class ScanRequest(BaseModel):
     path: str
     type: str  # 'file' or 'table'
+    profile_mode: str = "exact"  # 'exact' or 'approximate' (push-down table scans only)
+    relative_error: float = None  # defaults to PROFILE_RELATIVE_ERROR
+    sample_percent: float = None  # TABLESAMPLE (n PERCENT) fast tier for table scans
+    sample_rows: int = None  # sampled rows; run as the matching PERCENT when the row count is known, else a head sample
+    sample_seed: int = None  # REPEATABLE seed, defaults to SAMPLE_SEED
+    duplicate_mode: str = None  # 'exact', 'approximate', 'key' or 'none'; defaults to profile_mode ('approximate' for files)
+    key_columns: list = None  # key for 'key' duplicate detection; inferred from potential_keys if omitted
+    incremental: bool = False  # Delta tables: profile only versions added since the last scan
+    file_sample_mode: str = None  # files: 'head', 'blocks' or 'full'; defaults to DBFS_SAMPLE_MODE (DBFS) or 'full' (local)
+    file_sample_size: int = None  # rows for 'head', blocks (row groups for Parquet) for 'blocks'
+    columns: list = None  # Parquet/Delta/Arrow files: columns to read; the rest get footer metrics only ([] reads none)
+    confirmed: bool = False  # run table scans heavier than the planner recommends as requested
+    ai_mode: str = None  # 'auto', 'rules' or 'llm'; defaults to AI_MODE
+
+    def sampling(self):
+        """TABLESAMPLE settings for DQChecks, or None for a full scan."""
+        if self.sample_percent is not None:
+            return {"method": "percent", "value": self.sample_percent, "seed": self.sample_seed}
+        if self.sample_rows is not None:
+            return {"method": "rows", "value": self.sample_rows, "seed": self.sample_seed}
+        return None
+
+class BatchScanRequest(BaseModel):
+    path: str  # catalog, catalog.schema, or a glob over catalog.schema.table (e.g. 'main.sales_*')
+    type: str = "batch"
+    priority: str = "size"  # 'size' (smallest first), 'stale' (longest since last scan first) or 'name'
+    max_concurrent_scans: int = None  # tables of this batch scanned at once; defaults to BATCH_MAX_CONCURRENT_SCANS
+    include_views: bool = False
+    scan_options: dict = None  # ScanRequest options applied to every table (e.g. profile_mode, sample_percent)
 
 class FixItRequest(BaseModel):
     scan_id: str
 
+class CacheInvalidateRequest(BaseModel):
+    name: str = None  # catalog, schema or table full name; omit to clear everything
+
 @app.on_event("startup")
 async def startup_event():
     # Create sample data
@@ -53,13 +106,19 @@ async def startup_event():
         df.to_csv("data/sample.csv", index=False)
         logger.info("Created sample.csv")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Don't leave statements running on the warehouse after the server stops
+    await statement_manager.cancel_all()
+    await DatabricksHTTP.close()
+
 @app.get("/api/status")
 async def get_status():
-    return {"status": "online", "model": get_active_model()}
+    return {"status": "online", "model": get_active_model(), "analysis_scheduler": analysis_scheduler.stats()}
 
 @app.get("/api/paths")
 async def list_paths(path: str = "dbfs:/"):
-    return DatabricksCLI.list_path(path)
+    return await DatabricksCLI.list_path(path)
 
 # ==========================================
 # Unity Catalog Endpoints
@@ -68,22 +127,35 @@ async def list_paths(path: str = "dbfs:/"):
 @app.get("/api/catalogs")
 async def list_catalogs():
     """List all catalogs in Unity Catalog."""
-    return DatabricksCLI.list_catalogs()
+    return await DatabricksCLI.list_catalogs()
 
 @app.get("/api/catalogs/{catalog_name}/schemas")
 async def list_schemas(catalog_name: str):
     """List schemas in a catalog."""
-    return DatabricksCLI.list_schemas(catalog_name)
+    return await DatabricksCLI.list_schemas(catalog_name)
 
 @app.get("/api/catalogs/{catalog_name}/schemas/{schema_name}/tables")
 async def list_tables(catalog_name: str, schema_name: str):
     """List tables in a schema."""
-    return DatabricksCLI.list_tables(catalog_name, schema_name)
+    return await DatabricksCLI.list_tables(catalog_name, schema_name)
 
 @app.get("/api/catalogs/{catalog_name}/schemas/{schema_name}/tables/{table_name}")
 async def get_table_info(catalog_name: str, schema_name: str, table_name: str):
     """Get detailed information about a table."""
-    return DatabricksCLI.get_table_info(catalog_name, schema_name, table_name)
+    return await DatabricksCLI.get_table_info(catalog_name, schema_name, table_name)
+
+
+@app.post("/api/cache/invalidate")
+async def invalidate_cache(request: CacheInvalidateRequest):
+    """Drop cached Unity Catalog metadata and profiles for a catalog/schema/table subtree (or everything)."""
+    removed = metadata_cache.invalidate(request.name)
+    profiles = profile_cache.invalidate(request.name)
+    return {"invalidated": removed, "profiles_invalidated": profiles, "name": request.name}
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Hit/miss counters and size of the Unity Catalog metadata cache (and of the profile and LLM caches)."""
+    return {**metadata_cache.stats(), "profile_cache": profile_cache.stats(), "llm_cache": llm_cache.stats()}
 
 
 @app.get("/api/report/{scan_id}")
@@ -91,11 +163,11 @@ async def get_report(scan_id: str):
     """Get the markdown report for a scan."""
     from fastapi.responses import PlainTextResponse
     
-    if scan_id not in scans:
+    scan_data = await asyncio.to_thread(scan_store.get, scan_id)
+    if scan_data is None:
         raise HTTPException(status_code=404, detail="Scan not found")
     
-    scan_data = scans[scan_id]
-    report_path = scan_data.get("report_path", "")
+    report_path = scan_data.get("report_path") or ""
     
     if report_path and os.path.exists(report_path):
         with open(report_path, 'r') as f:
@@ -104,109 +176,588 @@ async def get_report(scan_id: str):
     raise HTTPException(status_code=404, detail="Report not found")
 
 
+def _validate_scan_request(request):
+    """Checks a scan request's options and fills in their defaults (raises HTTPException 400)."""
+    if request.profile_mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail=f"profile_mode must be one of {', '.join(PROFILE_MODES)}")
+    if request.relative_error is None:
+        request.relative_error = config["profile_relative_error"]
+    if not 0 < request.relative_error < 1:
+        raise HTTPException(status_code=400, detail="relative_error must be between 0 and 1")
+    if request.sample_percent is not None and request.sample_rows is not None:
+        raise HTTPException(status_code=400, detail="Use either sample_percent or sample_rows, not both")
+    if request.sample_percent is not None and not 0 < request.sample_percent <= 100:
+        raise HTTPException(status_code=400, detail="sample_percent must be between 0 and 100")
+    if request.sample_rows is not None and request.sample_rows <= 0:
+        raise HTTPException(status_code=400, detail="sample_rows must be positive")
+    if request.sample_seed is None:
+        request.sample_seed = config["sample_seed"]
+    if request.duplicate_mode is None:
+        # Streamed files default to the Bloom filter, whose memory is bounded; exact keeps a hash per row
+        request.duplicate_mode = "approximate" if request.type == "file" else request.profile_mode
+    if request.duplicate_mode not in DUPLICATE_MODES:
+        raise HTTPException(status_code=400, detail=f"duplicate_mode must be one of {', '.join(DUPLICATE_MODES)}")
+    if request.incremental and request.sampling():
+        raise HTTPException(status_code=400, detail="Incremental scans cannot be sampled")
+    if request.file_sample_mode is not None and request.file_sample_mode not in DBFS_SAMPLE_MODES:
+        raise HTTPException(status_code=400, detail=f"file_sample_mode must be one of {', '.join(DBFS_SAMPLE_MODES)}")
+    if request.file_sample_size is not None and request.file_sample_size <= 0:
+        raise HTTPException(status_code=400, detail="file_sample_size must be positive")
+    if request.columns is not None and request.type == "table":
+        raise HTTPException(status_code=400, detail="columns applies to Parquet, Delta and Arrow files only")
+    if request.ai_mode is None:
+        request.ai_mode = config["ai_mode"]
+    if request.ai_mode not in AI_MODES:
+        raise HTTPException(status_code=400, detail=f"ai_mode must be one of {', '.join(AI_MODES)}")
+
 @app.post("/api/scan")
 async def run_scan(request: ScanRequest):
-    scan_id = str(uuid.uuid4())
+    """Starts a scan in the background and returns its id immediately.
+
+    Progress and the final result are available from GET /api/scan/{scan_id}
+    (polling) or GET /api/scan/{scan_id}/events (server-sent events). Both carry
+    the DQ results as soon as profiling finishes, before the AI analysis, which
+    the event stream also delivers token by token.
+    """
+    _validate_scan_request(request)
+    if _is_planned(request) and not request.confirmed:
+        # Refuse e.g. exact distinct counts over a huge table until the estimate has been seen
+        scan_plan = await _plan_scan(request)
+        if scan_plan["requires_confirmation"]:
+            raise HTTPException(status_code=409, detail={
+                "message": f"Scan needs confirmation: {scan_plan['summary']}. "
+                           f"Resubmit with confirmed=true or use the recommended options.",
+                "plan": scan_plan
+            })
+    job = scan_jobs.submit(request, _execute_scan)
+    return {"scan_id": job.scan_id, "status": job.status}
+
+@app.post("/api/scan/plan")
+async def plan_scan(request: ScanRequest):
+    """Estimates a table scan's cost from metadata and recommends a strategy, without running it."""
+    _validate_scan_request(request)
+    if not _is_planned(request):
+        raise HTTPException(status_code=400, detail="Only Unity Catalog table scans (catalog.schema.table) are planned")
+    return await _plan_scan(request)
+
+@app.post("/api/batch-scan")
+async def run_batch_scan(request: BatchScanRequest):
+    """Starts a scan of every table in a catalog, schema or glob and returns the batch id.
+
+    The batch is a scan job itself: GET /api/scan/{batch_id} (or /events) reports
+    aggregated progress and per-table status, and POST /api/scan/{batch_id}/cancel
+    stops it along with its running table scans.
+    """
+    if request.priority not in BATCH_PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {', '.join(BATCH_PRIORITIES)}")
+    if request.max_concurrent_scans is not None and request.max_concurrent_scans <= 0:
+        raise HTTPException(status_code=400, detail="max_concurrent_scans must be positive")
+    options = request.scan_options or {}
+    unknown = (set(options) - set(ScanRequest.model_fields)) | (set(options) & {"path", "type"})
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unsupported scan_options: {', '.join(sorted(unknown))}")
+    # Every table is scanned with the same options, so check them once up front
+    _validate_scan_request(ScanRequest(**options, path=request.path, type="table"))
+    
+    job = scan_jobs.submit(request, _execute_batch)
+    return {"batch_id": job.scan_id, "status": job.status}
+
+@app.post("/api/scan/{scan_id}/upgrade")
+async def upgrade_scan(scan_id: str, confirmed: bool = False):
+    """Re-run a sampled scan as a full scan with the same settings (confirmed=true if the planner asks)."""
+    job = scan_jobs.get(scan_id)
+    if job is not None:
+        original = job.request
+    else:
+        scan_data = await asyncio.to_thread(scan_store.get, scan_id)
+        if scan_data is None or not scan_data.get("request"):
+            raise HTTPException(status_code=404, detail="Scan not found")
+        original = ScanRequest(**{k: v for k, v in scan_data["request"].items() if v is not None})
+    if original.type == "batch":
+        raise HTTPException(status_code=400, detail="Batch scans cannot be upgraded; upgrade their table scans instead")
+    
+    full_request = original.model_copy(update={"sample_percent": None, "sample_rows": None, "confirmed": confirmed})
+    return await run_scan(full_request)
+
+@app.post("/api/scan/{scan_id}/analyze")
+async def analyze_scan(scan_id: str):
+    """Runs the LLM analysis of a finished scan on request (e.g. one analyzed by the rules only) and rewrites its report."""
+    if not AIAnalyzer.llm_available():
+        raise HTTPException(status_code=400, detail="No serving endpoint configured (DATABRICKS_TOKEN, DATABRICKS_SERVING_ENDPOINT)")
+    scan_data = await asyncio.to_thread(scan_store.get, scan_id, True)
+    if scan_data is None or scan_data.get("dq_results") is None:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    dq_results = scan_data["dq_results"]
+    if dq_results.get("source_type") == "batch":
+        raise HTTPException(status_code=400, detail="Batch scans are not analyzed; analyze their table scans instead")
+    
+    ai_analysis = await AIAnalyzer.analyze_issues(dq_results, mode="llm")
+    if ai_analysis.get("analysis_source") != "llm":
+        raise HTTPException(status_code=502, detail="LLM analysis failed; the scan keeps its current analysis")
+    report_path = await asyncio.to_thread(ReportGenerator.generate_report, dq_results, ai_analysis)
+    await asyncio.to_thread(
+        scan_store.save_result, scan_id, dq_results, ai_analysis,
+        report_path=report_path, request=scan_data.get("request")
+    )
+    job = scan_jobs.get(scan_id)
+    if job is not None and job.result is not None:
+        job.result["analysis"] = ai_analysis
+    return {"scan_id": scan_id, "analysis": ai_analysis, "report_path": report_path}
+
+@app.post("/api/scan/{scan_id}/cancel")
+async def cancel_scan(scan_id: str):
+    """Cancel a running scan and the SQL statements it has running on the warehouse."""
+    job = scan_jobs.get(scan_id)
+    if job is None:
+        scan_data = await asyncio.to_thread(scan_store.get, scan_id)
+        if scan_data is None:
+            raise HTTPException(status_code=404, detail="Scan not found")
+        if scan_data["status"] not in TERMINAL_STATES:
+            raise HTTPException(status_code=409, detail="Scan is running in another worker")
+        return await _stored_snapshot(scan_id)
+    if job.done:
+        return job.snapshot()
+    
+    await scan_jobs.cancel(scan_id)
+    # Statements started by background tasks of the scan (e.g. the duplicate check) are cancelled too
+    statements = await statement_manager.cancel_scan(scan_id)
+    return {**job.snapshot(), "cancelled_statements": statements}
+
+@app.get("/api/scan/{scan_id}")
+async def get_scan(scan_id: str):
+    """Get the status of a scan, including its DQ results once profiling has finished (analysis is null until it completes)."""
+    job = scan_jobs.get(scan_id)
+    if job is not None:
+        return job.snapshot(include_result=True)
+    
+    # Started by another worker, or finished before a restart
+    snapshot = await _stored_snapshot(scan_id, include_result=True)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    return snapshot
+
+@app.get("/api/scans")
+async def list_scans(source: str = None, since: float = None, limit: int = 50):
+    """Recent scan summaries (newest first), optionally for one table/path or after a Unix timestamp."""
+    limit = max(1, min(limit, 1000))
+    return {"scans": await asyncio.to_thread(scan_store.list, source=source, since=since, limit=limit)}
+
+@app.get("/api/scan/{scan_id}/events")
+async def stream_scan_events(scan_id: str):
+    """Stream scan progress as server-sent events."""
+    job = scan_jobs.get(scan_id)
+    if job is not None:
+        return StreamingResponse(scan_jobs.stream(job), media_type="text/event-stream")
+    if await asyncio.to_thread(scan_store.get, scan_id) is None:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    return StreamingResponse(scan_jobs.stream_stored(scan_id, _stored_snapshot), media_type="text/event-stream")
+
+def _is_planned(request):
+    """Whether a request is a push-down table scan, whose cost the planner can estimate."""
+    return request.type == "table" and request.path != "sample" and len(request.path.split(".")) == 3
+
+def _profile_cache_key(request, columns, version):
+    """Profile cache key of a push-down table scan at the Delta version it reads, or None."""
+    if not profile_cache.enabled or version is None:
+        # Without a version (e.g. not a Delta table) a cached profile could be stale
+        return None
+    settings = {
+        "profile_mode": request.profile_mode,
+        "relative_error": request.relative_error,
+        "sampling": request.sampling(),
+        "duplicate_mode": request.duplicate_mode,
+        "key_columns": request.key_columns
+    }
+    return ProfileCache.key(request.path, version, settings, columns)
+
+async def _plan_scan(request):
+    return await ScanPlanner.plan(
+        request.path,
+        profile_mode=request.profile_mode,
+        duplicate_mode=request.duplicate_mode,
+        sampling=request.sampling(),
+        incremental=request.incremental
+    )
+
+async def _stored_snapshot(scan_id, include_result=False):
+    """Builds a job-style snapshot of a scan from the scan store, or None if unknown."""
+    scan_data = await asyncio.to_thread(scan_store.get, scan_id, include_result)
+    if scan_data is None:
+        return None
+    snapshot = {key: scan_data.get(key) for key in ("scan_id", "status", "stage", "progress", "error", "created_at", "updated_at")}
+    if include_result and scan_data.get("dq_results") is not None:
+        snapshot["results"] = scan_data["dq_results"]
+        snapshot["analysis"] = scan_data["ai_analysis"]
+    return snapshot
+
+async def _load_sample_data():
+    return await asyncio.to_thread(pd.read_csv, "data/sample.csv")
+
+async def _load_table_rows(table_name, sampling=None):
+    """Fetches up to SQL_FALLBACK_ROWS rows of a table as a typed DataFrame, or None if that fails too."""
+    sql = f"SELECT * FROM {table_name}{DQChecks.sample_clause(sampling)} LIMIT {config['sql_fallback_rows']}"
+    result = await DatabricksCLI.run_sql(sql, result_format="arrow")
+    if "error" in result:
+        logger.warning(f"Row sample failed: {result['error']}")
+        return None
+    # Arrow results keep the table's types, so timestamps are profiled as timestamps
+    return await asyncio.to_thread(result["table"].to_pandas, split_blocks=True)
+
+def _local_file_path(path):
+    """Resolves a file (or Delta table directory) inside LOCAL_DATA_DIR, or None if there is none there."""
+    if path.startswith("file:"):
+        path = path[len("file:"):]
+    base = os.path.realpath(config["local_data_dir"])
+    full_path = os.path.realpath(path if os.path.isabs(path) else os.path.join(base, path))
+    if os.path.commonpath([base, full_path]) != base:
+        return None
+    if not os.path.isfile(full_path) and detect_format(full_path) != "delta":
+        return None
+    return full_path
+
+def _streaming_duplicate_mode(request):
+    # Files have no key to infer, so 'key' falls back to whole-row duplicates in the Bloom filter
+    return "approximate" if request.duplicate_mode == "key" else request.duplicate_mode
+
+def _profile_local_file(path, request):
+    """Profiles a local file with the chunked streaming profiler and builds DQ results."""
+    file_format = detect_format(path)
+    if file_format not in COLUMNAR_FORMATS:
+        profile = StreamingProfiler.profile_csv(path, duplicate_mode=_streaming_duplicate_mode(request))
+        return _streaming_results(profile, request)
+
+    mode = request.file_sample_mode or "full"
+    profile, file_sampling = ColumnarReader.profile(
+        path, file_format,
+        columns=request.columns,
+        mode=mode,
+        size=request.file_sample_size or (config["dbfs_sample_rows"] if mode == "head" else config["dbfs_sample_blocks"]),
+        duplicate_mode=_streaming_duplicate_mode(request)
+    )
+    if "error" in profile:
+        return profile
+    dq_results = _streaming_results(profile, request)
+    dq_results["file_sampling"] = file_sampling
+    return dq_results
+
+def _streaming_results(profile, request):
+    """Builds DQ results from a StreamingProfiler profile."""
+    dq_results = DQChecks.results_from_profile(profile)
+    dq_results["source"] = request.path
+    dq_results["source_type"] = request.type
+    # Distinct counts and quartiles come from sketches; flag them like an approximate profile
+    dq_results["profile_mode"] = "approximate"
+    dq_results["estimated_metrics"] = profile["estimated_metrics"]
+    dq_results["streaming"] = {"chunks": profile["chunks"]}
+    # Columnar files: metrics taken from Parquet footers, and columns left out of the projection
+    for key in ("footer_columns", "unread_columns"):
+        if profile.get(key):
+            dq_results[key] = profile[key]
+    return dq_results
+
+async def _execute_scan(job):
+    """Runs the scan pipeline for a background job and returns the final response body."""
+    # Tags every SQL statement this scan (and any task it starts) runs, so it can be cancelled
+    current_scan_id.set(job.scan_id)
+    request = job.request
+    scan_id = job.scan_id
     df = None
+    row_sample = None
+    scan_plan = None
+    ai_analysis = None
+    cache_key = None
+    pushdown_complete = False
     
-    try:
-        # For demo purposes, if path is 'sample', use local sample data
-        if request.path == "sample":
-            df = pd.read_csv("data/sample.csv")
-            logger.info("Using local sample.csv for scan")
-        elif request.type == "table":
-            # Use push-down SQL analysis - compute metrics directly on Databricks
-            logger.info(f"Running push-down SQL analysis on: {request.path}")
+    # For demo purposes, if path is 'sample', use local sample data
+    if request.path == "sample":
+        df = await _load_sample_data()
+        logger.info("Using local sample.csv for scan")
+    elif request.type == "table":
+        # Use push-down SQL analysis - compute metrics directly on Databricks
+        logger.info(f"Running push-down SQL analysis on: {request.path}")
+        
+        # Parse table name to get catalog, schema, table
+        parts = request.path.split(".")
+        if len(parts) != 3:
+            logger.warning(f"Invalid table path format: {request.path}. Expected catalog.schema.table")
+            df = await _load_sample_data()
+        else:
+            catalog, schema, table = parts
             
-            # Parse table name to get catalog, schema, table
-            parts = request.path.split(".")
-            if len(parts) != 3:
-                logger.warning(f"Invalid table path format: {request.path}. Expected catalog.schema.table")
-                df = pd.read_csv("data/sample.csv")
+            # Metadata-only cost estimate; an unconfirmed scan heavier than recommended (e.g. a
+            # table in a batch scan) runs with the recommended strategy instead
+            job.update(stage="Planning scan", progress=5)
+            scan_plan = await _plan_scan(request)
+            if scan_plan["requires_confirmation"] and not request.confirmed:
+                logger.warning(f"Unconfirmed heavy scan ({scan_plan['summary']}); using {scan_plan['recommended_options']}")
+                request = request.model_copy(update=scan_plan["recommended_options"])
+                scan_plan["applied"] = True
+            if request.sample_rows is not None:
+                # Ask for a random fraction of about that many rows; without a row count the scan
+                # stays a head sample, which DQChecks reports as such
+                percent = ScanPlanner.rows_to_percent(request.sample_rows, scan_plan["row_estimate"])
+                if percent is not None:
+                    logger.info(f"Sampling {request.sample_rows:,} rows of ~{scan_plan['row_estimate']:,} as TABLESAMPLE ({percent} PERCENT)")
+                    request = request.model_copy(update={"sample_percent": percent, "sample_rows": None})
+            
+            # Get table schema first
+            job.update(stage="Reading table metadata", progress=10)
+            table_info = await DatabricksCLI.get_table_info(catalog, schema, table)
+            
+            if "error" in table_info or table_info.get("mock"):
+                logger.warning(f"Could not get table info: {table_info.get('error', 'using mock')}. Falling back to sample data.")
+                df = await _load_sample_data()
             else:
-                catalog, schema, table = parts
-                
-                # Get table schema first
-                table_info = DatabricksCLI.get_table_info(catalog, schema, table)
-                
-                if "error" in table_info or table_info.get("mock"):
-                    logger.warning(f"Could not get table info: {table_info.get('error', 'using mock')}. Falling back to sample data.")
-                    df = pd.read_csv("data/sample.csv")
+                columns = table_info.get("columns", [])
+                version = None
+                if columns and not request.incremental:
+                    # Read from the table's metadata, so a cache hit does not touch the warehouse; the
+                    # profile below is pinned to this version so the cached result describes it
+                    version = (await DatabricksCLI.table_version(request.path)).get("version")
+                    cache_key = _profile_cache_key(request, columns, version)
+                cached = await asyncio.to_thread(profile_cache.get, cache_key) if cache_key else None
+                if not columns:
+                    logger.warning("No columns found in table info. Falling back to sample data.")
+                    df = await _load_sample_data()
+                elif cached is not None:
+                    # Same table version and scan settings as an earlier scan: reuse its results and analysis
+                    job.update(stage="Reusing cached profile", progress=60)
+                    dq_results = cached["dq_results"]
+                    if cached.get("ai_mode") == request.ai_mode:
+                        ai_analysis = cached["ai_analysis"]
+                    dq_results["profile_cache"] = {"hit": True, "version": cache_key[1], "scan_id": cached["scan_id"], "cached_at": cached["cached_at"]}
+                    cache_key = None
+                    logger.info(f"Reusing cached profile of {request.path} at version {dq_results['profile_cache']['version']}")
                 else:
-                    columns = table_info.get("columns", [])
-                    if not columns:
-                        logger.warning("No columns found in table info. Falling back to sample data.")
-                        df = pd.read_csv("data/sample.csv")
+                    duplicate_task = None
+                    incremental_state = None
+                    if request.incremental:
+                        # Profile only the Delta versions added since the stored profile
+                        job.update(stage="Running incremental profile on warehouse", progress=25)
+                        incremental_state = await IncrementalProfiler().run(
+                            request.path, columns,
+                            relative_error=request.relative_error,
+                            duplicates=request.duplicate_mode != "none",
+                            on_progress=lambda stage: job.update(stage=stage, progress=40)
+                        )
+                        if "error" in incremental_state:
+                            sql_result = incremental_state
+                        else:
+                            sql_result = IncrementalProfiler.to_sql_result(incremental_state, columns)
                     else:
-                        # Generate aggregation SQL
-                        analysis_sql = DQChecks.generate_sql_analysis(request.path, columns)
-                        logger.info(f"Executing push-down SQL:\n{analysis_sql[:500]}...")
-                        
-                        # Execute the SQL
-                        sql_result = DatabricksCLI.run_sql(analysis_sql)
+                        # Every profile batch and the duplicate statement read the version resolved above
+                        # Duplicate detection is its own statement, so start it alongside the profile
+                        # (key mode without an explicit key waits for the profile's inferred keys)
+                        if request.duplicate_mode != "none" and (request.duplicate_mode != "key" or request.key_columns):
+                            duplicate_task = asyncio.create_task(QueryPlanner.run_duplicate_check(
+                                request.path, columns,
+                                mode=request.duplicate_mode,
+                                key_columns=request.key_columns,
+                                relative_error=request.relative_error,
+                                sampling=request.sampling(),
+                                version=version
+                            ))
+                    
+                        # Run the aggregation SQL as cost-balanced column batches
+                        job.update(stage="Running push-down SQL on warehouse", progress=25)
+                        sql_result = await QueryPlanner.run_profile(
+                            request.path, columns,
+                            profile_mode=request.profile_mode,
+                            relative_error=request.relative_error,
+                            sampling=request.sampling(),
+                            on_progress=lambda done, total: job.update(
+                                stage=f"Running push-down SQL on warehouse ({done}/{total} batches)",
+                                progress=25 + int(35 * done / total)
+                            ),
+                            version=version
+                        )
+                    
+                    if "error" in sql_result:
+                        logger.warning(f"Push-down SQL failed: {sql_result['error']}. Falling back to a row sample.")
+                        job.update(stage="Fetching row sample from warehouse", progress=40)
+                        df = await _load_table_rows(request.path, request.sampling())
+                        if df is None:
+                            df = await _load_sample_data()
+                        else:
+                            row_sample = {"rows": len(df), "reason": sql_result["error"]}
+                    else:
+                        # Parse results using push-down parser
+                        dq_results = DQChecks.parse_sql_results(
+                            sql_result, columns, request.path,
+                            profile_mode=request.profile_mode,
+                            relative_error=request.relative_error,
+                            sampling=request.sampling()
+                        )
                         
-                        if "error" in sql_result:
-                            logger.warning(f"Push-down SQL failed: {sql_result['error']}. Falling back to sample data.")
-                            df = pd.read_csv("data/sample.csv")
+                        if "error" in dq_results:
+                            logger.warning(f"Failed to parse SQL results: {dq_results['error']}. Falling back to sample data.")
+                            df = await _load_sample_data()
+                        elif incremental_state is not None:
+                            IncrementalProfiler.apply_to_results(dq_results, incremental_state)
+                            df = None
+                            logger.info(f"Incremental analysis successful: {dq_results['row_count']:,} rows profiled")
                         else:
-                            # Parse results using push-down parser
-                            dq_results = DQChecks.parse_sql_results(sql_result, columns, request.path)
+                            if request.duplicate_mode != "none":
+                                if duplicate_task is None:
+                                    duplicate_task = asyncio.create_task(QueryPlanner.run_duplicate_check(
+                                        request.path, columns,
+                                        mode="key",
+                                        relative_error=request.relative_error,
+                                        sampling=request.sampling(),
+                                        potential_keys=dq_results.get("potential_keys"),
+                                        version=sql_result.get("version")
+                                    ))
+                                job.update(stage="Checking for duplicate rows", progress=62)
+                                DQChecks.apply_duplicate_results(dq_results, await duplicate_task)
+                                duplicate_task = None
                             
-                            if "error" in dq_results:
-                                logger.warning(f"Failed to parse SQL results: {dq_results['error']}. Falling back to sample data.")
-                                df = pd.read_csv("data/sample.csv")
-                            else:
-                                # Success! Skip the Pandas analysis path
-                                df = None  # Signal that we used push-down
-                                logger.info(f"Push-down analysis successful: {dq_results['row_count']:,} rows analyzed")
-        elif request.path.startswith("dbfs:"):
-            # Try to read from DBFS
-            logger.info(f"Attempting to read DBFS path: {request.path}")
-            head = DatabricksCLI.read_head(request.path)
-            if isinstance(head, dict) and "error" in head:
-                logger.warning(f"DBFS read failed: {head['error']}. Falling back to sample data.")
-                df = pd.read_csv("data/sample.csv")
-            else:
-                import io
-                df = pd.read_csv(io.StringIO(head))
-                logger.info(f"Successfully loaded from DBFS: {request.path}")
+                            # Success! Skip the Pandas analysis path
+                            df = None  # Signal that we used push-down
+                            pushdown_complete = True
+                            logger.info(f"Push-down analysis successful: {dq_results['row_count']:,} rows analyzed")
+                    
+                    if duplicate_task is not None:
+                        # The profile failed, so there are no results to attach the duplicate count to
+                        duplicate_task.cancel()
+    elif request.path.startswith("dbfs:") and DatabricksREST.is_configured() and config["api_backend"] != "cli":
+        # Ranged reads stream only the sampled part of the file into the chunked profiler
+        logger.info(f"Streaming DBFS path: {request.path}")
+        job.update(stage="Reading DBFS file", progress=10)
+        file_format = detect_format(request.path)
+        if file_format in COLUMNAR_FORMATS:
+            # Parquet/Arrow: fetch the footer, then only the row groups and columns needed
+            profile, file_sampling = await DBFSReader.profile_columnar(
+                request.path, file_format,
+                columns=request.columns,
+                mode=request.file_sample_mode,
+                size=request.file_sample_size,
+                duplicate_mode=_streaming_duplicate_mode(request)
+            )
         else:
-            # Default fallback to sample data
-            logger.info(f"Unknown path type '{request.path}', using sample data")
-            df = pd.read_csv("data/sample.csv")
-
-        # Run Checks - only if we didn't use push-down SQL
-        if df is not None:
-            dq_results = DQChecks.analyze_dataframe(df)
-            # Add source info to results
-            dq_results["source"] = request.path
-            dq_results["source_type"] = request.type
-        # else: dq_results was already set by push-down SQL path
-        
-        # Run AI Analysis
-        ai_analysis = AIAnalyzer.analyze_issues(dq_results)
-        
-        # Generate Report
-        report_path = ReportGenerator.generate_report(dq_results, ai_analysis)
-        
-        scans[scan_id] = {
-            "dq_results": dq_results,
-            "ai_analysis": ai_analysis,
-            "report_path": report_path
-        }
-        
-        return {"scan_id": scan_id, "status": "complete", "results": dq_results, "analysis": ai_analysis}
-        
-    except Exception as e:
-        logger.error(f"Scan failed: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+            profile, file_sampling = await DBFSReader.profile_csv(
+                request.path,
+                mode=request.file_sample_mode,
+                size=request.file_sample_size,
+                duplicate_mode=_streaming_duplicate_mode(request),
+                on_progress=lambda done, total: job.update(
+                    stage=f"Reading DBFS file ({done / 1e6:,.1f} MB)",
+                    progress=10 + int(30 * min(1.0, done / total)) if total else 10
+                )
+            )
+        if "error" in profile:
+            logger.warning(f"DBFS read failed: {profile['error']}. Falling back to sample data.")
+            df = await _load_sample_data()
+        else:
+            dq_results = _streaming_results(profile, request)
+            dq_results["file_sampling"] = file_sampling
+            df = None
+            logger.info(f"Successfully streamed from DBFS: {request.path}")
+    elif request.path.startswith("dbfs:"):
+        # Without REST access only 'databricks fs cat' is available, so profile the first rows
+        logger.info(f"Attempting to read DBFS path: {request.path}")
+        job.update(stage="Reading DBFS file", progress=10)
+        if detect_format(request.path) in COLUMNAR_FORMATS:
+            # Binary formats need ranged reads; 'fs cat' output cannot be parsed as text
+            head = {"error": "Parquet/Arrow files on DBFS need the REST API (DATABRICKS_API_BACKEND=rest or auto)"}
+        else:
+            head = await DatabricksCLI.read_head(request.path, lines=(request.file_sample_size or config["dbfs_sample_rows"]) + 1)
+        if isinstance(head, dict) and "error" in head:
+            logger.warning(f"DBFS read failed: {head['error']}. Falling back to sample data.")
+            df = await _load_sample_data()
+        else:
+            import io
+            # Parsing is CPU-bound, so keep it off the event loop like the other profiling calls
+            df = await asyncio.to_thread(pd.read_csv, io.StringIO(head))
+            logger.info(f"Successfully loaded from DBFS: {request.path}")
+    elif _local_file_path(request.path):
+        # Local files are streamed in chunks so their size is not bounded by memory
+        logger.info(f"Streaming local file: {request.path}")
+        job.update(stage="Streaming file through profiler", progress=15)
+        dq_results = await asyncio.to_thread(_profile_local_file, _local_file_path(request.path), request)
+        if "error" in dq_results:
+            logger.warning(f"Local file read failed: {dq_results['error']}. Falling back to sample data.")
+            df = await _load_sample_data()
+        else:
+            df = None
+    else:
+        # Default fallback to sample data
+        logger.info(f"Unknown path type '{request.path}', using sample data")
+        df = await _load_sample_data()
+
+    # Run Checks - only if we didn't use push-down SQL
+    if df is not None:
+        # Profiling is CPU-bound, so keep it off the event loop
+        job.update(stage="Profiling data", progress=40)
+        dq_results = await asyncio.to_thread(DQChecks.analyze_dataframe, df)
+        # Add source info to results
+        dq_results["source"] = request.path
+        dq_results["source_type"] = request.type
+        if row_sample is not None:
+            # Profiled locally from rows fetched off the warehouse, not aggregated there
+            dq_results["analysis_method"] = "row_sample"
+            dq_results["row_sample"] = row_sample
+    # else: dq_results was already set by push-down SQL path
+    if scan_plan is not None:
+        dq_results["scan_plan"] = scan_plan
+    
+    # The DQ results are complete; publish them so clients can render them while the analysis runs
+    job.result = {"scan_id": scan_id, "results": dq_results, "analysis": ai_analysis}
+    job.publish("results", job.result)
+    
+    # Run AI Analysis, streaming the completion to SSE subscribers as it is generated
+    if ai_analysis is None:
+        job.update(stage="Running AI analysis", progress=70)
+        ai_analysis = await AIAnalyzer.analyze_issues(
+            dq_results, on_token=lambda text: job.publish("analysis_token", {"text": text}), mode=request.ai_mode
+        )
+    
+    if pushdown_complete and cache_key is not None:
+        await asyncio.to_thread(profile_cache.set, cache_key, {
+            "dq_results": dq_results, "ai_analysis": ai_analysis, "ai_mode": request.ai_mode,
+            "scan_id": scan_id, "cached_at": time.time()
+        })
+    
+    # Generate Report
+    job.update(stage="Generating report", progress=90)
+    report_path = await asyncio.to_thread(ReportGenerator.generate_report, dq_results, ai_analysis)
+    
+    await asyncio.to_thread(
+        scan_store.save_result, scan_id, dq_results, ai_analysis,
+        report_path=report_path, request=request.model_dump()
+    )
+    
+    return {"scan_id": scan_id, "results": dq_results, "analysis": ai_analysis}
+
+async def _execute_batch(job):
+    """Runs a batch scan job: expands its target and scans each table as its own scan job."""
+    current_scan_id.set(job.scan_id)
+    request = job.request
+    job.update(stage=f"Listing tables in {request.path}", progress=2)
+    expanded = await expand_target(request.path, include_views=request.include_views)
+    if "error" in expanded:
+        raise ValueError(expanded["error"])
+    
+    template = ScanRequest(**(request.scan_options or {}), path=request.path, type="table")
+    _validate_scan_request(template)
+    batch = BatchScan(
+        job, expanded["tables"],
+        start_scan=lambda table: scan_jobs.submit(template.model_copy(update={"path": table}), _execute_scan),
+        priority=request.priority,
+        max_concurrent=request.max_concurrent_scans,
+        store=scan_store,
+        mock=expanded["mock"]
+    )
+    summary = await batch.run()
+    
+    await asyncio.to_thread(scan_store.save_result, job.scan_id, summary, None, request=request.model_dump())
+    return {"batch_id": job.scan_id, "results": summary}
 
 @app.post("/api/generate-fixit")
 async def generate_fixit(request: FixItRequest):
-    if request.scan_id not in scans:
+    scan_data = await asyncio.to_thread(scan_store.get, request.scan_id, True)
+    if scan_data is None or scan_data.get("dq_results") is None:
         raise HTTPException(status_code=404, detail="Scan not found")
         
-    scan_data = scans[request.scan_id]
     notebook_content = FixItGenerator.generate_notebook(scan_data["dq_results"], scan_data["ai_analysis"])
     
     # Save notebook locally
@@ -217,8 +768,7 @@ async def generate_fixit(request: FixItRequest):
         f.write(notebook_content)
     
     # Store local path for upload later
-    scans[request.scan_id]["notebook_local_path"] = local_path
-    scans[request.scan_id]["notebook_filename"] = filename
+    await asyncio.to_thread(scan_store.update, request.scan_id, notebook_local_path=local_path, notebook_filename=filename)
         
     return {"notebook_path": local_path, "content": notebook_content, "filename": filename}
 
@@ -229,12 +779,11 @@ class UploadNotebookRequest(BaseModel):
 @app.post("/api/upload-notebook")
 async def upload_notebook(request: UploadNotebookRequest):
     """Upload a generated Fix-It notebook to Databricks workspace."""
-    if request.scan_id not in scans:
+    scan_data = await asyncio.to_thread(scan_store.get, request.scan_id)
+    if scan_data is None:
         raise HTTPException(status_code=404, detail="Scan not found")
     
-    scan_data = scans[request.scan_id]
-    
-    if "notebook_local_path" not in scan_data:
+    if not scan_data.get("notebook_local_path"):
         raise HTTPException(status_code=400, detail="No notebook generated yet. Generate a Fix-It notebook first.")
     
     local_path = scan_data["notebook_local_path"]
@@ -247,7 +796,7 @@ async def upload_notebook(request: UploadNotebookRequest):
         workspace_path = request.workspace_path
     
     try:
-        result = DatabricksCLI.upload_notebook(local_path, workspace_path)
+        result = await DatabricksCLI.upload_notebook(local_path, workspace_path)
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
@@ -0,0 +1,231 @@
+import asyncio
+import fnmatch
+from collections import OrderedDict, deque
+from dbx_cli import DatabricksCLI
+from statement_manager import statement_manager
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+BATCH_PRIORITIES = ("size", "stale", "name")
+
+# Unity Catalog listings issued at once while expanding a batch target
+EXPAND_CONCURRENCY = 8
+
+# Scans running on each SQL warehouse across every batch, created on first use
+_warehouse_slots = {}
+
+
+def warehouse_slot(warehouse_id):
+    """Semaphore bounding how many batch table scans run on one warehouse at a time."""
+    slot = _warehouse_slots.get(warehouse_id)
+    if slot is None:
+        slot = asyncio.Semaphore(max(1, config["batch_max_concurrent_scans"]))
+        _warehouse_slots[warehouse_id] = slot
+    return slot
+
+
+def _is_glob(pattern):
+    return any(char in pattern for char in "*?[")
+
+
+async def _bounded_gather(calls):
+    semaphore = asyncio.Semaphore(EXPAND_CONCURRENCY)
+
+    async def bounded(call):
+        async with semaphore:
+            return await call()
+
+    return await asyncio.gather(*[bounded(call) for call in calls])
+
+
+async def expand_target(target, include_views=False):
+    """
+    Expands a catalog, schema or glob into the tables it covers.
+
+    Args:
+        target: 'catalog', 'catalog.schema' or a glob over catalog.schema.table
+                (e.g. 'main.sales_*' or '*.*.orders'); omitted levels match everything
+        include_views: Whether views are scanned too (they have no storage to size)
+
+    Returns:
+        dict with 'tables' (sorted full names) and 'mock', or {'error': ...}
+    """
+    parts = target.strip().split(".")
+    if not target.strip() or len(parts) > 3 or any(not part for part in parts):
+        return {"error": "Batch target must be catalog, catalog.schema or catalog.schema.table (globs allowed)"}
+    catalog_pattern, schema_pattern, table_pattern = parts + ["*"] * (3 - len(parts))
+    mock = False
+
+    if _is_glob(catalog_pattern):
+        listing = await DatabricksCLI.list_catalogs()
+        mock = mock or listing.get("mock", False)
+        catalogs = [c["name"] for c in listing.get("catalogs", []) if fnmatch.fnmatchcase(c["name"], catalog_pattern)]
+    else:
+        catalogs = [catalog_pattern]
+
+    if _is_glob(schema_pattern):
+        listings = await _bounded_gather([lambda c=c: DatabricksCLI.list_schemas(c) for c in catalogs])
+        schemas = []
+        for catalog, listing in zip(catalogs, listings):
+            mock = mock or listing.get("mock", False)
+            schemas.extend(
+                (catalog, s["name"]) for s in listing.get("schemas", [])
+                # information_schema holds system views, not data worth profiling
+                if s["name"] != "information_schema" and fnmatch.fnmatchcase(s["name"], schema_pattern)
+            )
+    else:
+        schemas = [(catalog, schema_pattern) for catalog in catalogs]
+
+    listings = await _bounded_gather([lambda c=c, s=s: DatabricksCLI.list_tables(c, s) for c, s in schemas])
+    tables = []
+    for (catalog, schema), listing in zip(schemas, listings):
+        mock = mock or listing.get("mock", False)
+        tables.extend(
+            f"{catalog}.{schema}.{t['name']}" for t in listing.get("tables", [])
+            if fnmatch.fnmatchcase(t["name"], table_pattern) and (include_views or t.get("table_type") != "VIEW")
+        )
+
+    if not tables:
+        return {"error": f"No tables match '{target}'"}
+    if len(tables) > config["batch_max_tables"]:
+        return {"error": f"'{target}' matches {len(tables)} tables; narrow it or raise BATCH_MAX_TABLES ({config['batch_max_tables']})"}
+    logger.info(f"Batch target '{target}' expanded to {len(tables)} tables")
+    return {"tables": sorted(tables), "mock": mock}
+
+
+class BatchScan:
+    """Scans many tables as individual push-down scans with bounded concurrency.
+
+    Tables are started in priority order: 'size' runs the smallest first (sizes
+    from DESCRIBE DETAIL; unknown sizes last), 'stale' the longest since their
+    last completed scan (never-scanned first), 'name' alphabetically. At most
+    max_concurrent tables of the batch run at once, and at most
+    BATCH_MAX_CONCURRENT_SCANS across all batches on the same warehouse. Each
+    table is a regular scan job, so its results and report are stored and
+    can be opened on their own.
+    """
+
+    def __init__(self, job, tables, start_scan, priority="size", max_concurrent=None, store=None, mock=False):
+        """
+        Args:
+            job: The batch's ScanJob, updated with aggregated progress
+            tables: Full names of the tables to scan
+            start_scan: Callable(table) starting a table scan and returning its ScanJob
+            priority: One of BATCH_PRIORITIES
+            max_concurrent: Tables of this batch scanned at once (defaults to BATCH_MAX_CONCURRENT_SCANS)
+            store: Scan store, used to look up last scan times for 'stale' ordering
+            mock: Whether the tables came from mock Unity Catalog listings
+        """
+        self.job = job
+        self.start_scan = start_scan
+        self.priority = priority
+        self.max_concurrent = max(1, max_concurrent or config["batch_max_concurrent_scans"])
+        self.store = store
+        self.mock = mock
+        self.warehouse_id = config["warehouse_id"]
+        self.tables = OrderedDict((table, {"table": table, "status": "queued", "scan_id": None}) for table in tables)
+        self.running = {}
+
+    async def run(self):
+        """Scans every table and returns the batch summary."""
+        self.job.update(stage=f"Ordering {len(self.tables)} tables by {self.priority}", progress=3)
+        queue = deque(await self._ordered())
+        # Report tables in the order they will be scanned
+        for table in queue:
+            self.tables.move_to_end(table)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(min(self.max_concurrent, len(queue)))]
+        self._publish()
+        try:
+            await asyncio.gather(*workers)
+        except asyncio.CancelledError:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.shield(self._cancel_running())
+            raise
+        return self.summary()
+
+    async def _ordered(self):
+        tables = list(self.tables)
+        if self.priority == "size":
+            details = await _bounded_gather([lambda t=t: DatabricksCLI.describe_detail(t) for t in tables])
+            for table, detail in zip(tables, details):
+                size = detail.get("sizeInBytes")
+                self.tables[table]["size_bytes"] = int(size) if size not in (None, "") else None
+            return sorted(tables, key=lambda t: (self.tables[t]["size_bytes"] is None, self.tables[t]["size_bytes"] or 0, t))
+        if self.priority == "stale" and self.store is not None:
+            last_scanned = await asyncio.to_thread(self.store.last_scanned, tables)
+            for table in tables:
+                self.tables[table]["last_scanned_at"] = last_scanned.get(table)
+            return sorted(tables, key=lambda t: (self.tables[t]["last_scanned_at"] or 0, t))
+        return tables
+
+    async def _worker(self, queue):
+        while queue:
+            table = queue.popleft()
+            async with warehouse_slot(self.warehouse_id):
+                child = self.start_scan(table)
+                self.running[table] = child
+                self.tables[table].update(status="running", scan_id=child.scan_id)
+                self._publish()
+                await asyncio.wait([child.task])
+                del self.running[table]
+            self._record(table, child)
+            self._publish()
+
+    def _record(self, table, child):
+        entry = self.tables[table]
+        entry["status"] = child.status
+        entry["error"] = child.error
+        results = (child.result or {}).get("results") or {}
+        entry["dq_score"] = results.get("dq_score")
+        entry["issue_count"] = len(results.get("issues", []))
+        entry["row_count"] = results.get("row_count")
+
+    async def _cancel_running(self):
+        """Cancels the table scans in flight and marks the tables not yet started as cancelled."""
+        children = list(self.running.items())
+        for table, child in children:
+            child.task.cancel()
+        if children:
+            await asyncio.wait([child.task for _, child in children], timeout=5)
+            await asyncio.gather(*[statement_manager.cancel_scan(child.scan_id) for _, child in children])
+        for entry in self.tables.values():
+            if entry["status"] in ("queued", "running"):
+                entry["status"] = "cancelled"
+        self.job.result = {"batch_id": self.job.scan_id, "results": self.summary()}
+
+    def _publish(self):
+        counts = self._counts()
+        done = counts["complete"] + counts["failed"] + counts["cancelled"]
+        # The live per-table state is served with the job's snapshot while the batch runs
+        self.job.result = {"batch_id": self.job.scan_id, "results": self.summary()}
+        self.job.update(
+            stage=f"{done}/{len(self.tables)} tables scanned ({counts['running']} running, {counts['failed']} failed)",
+            progress=5 + int(90 * done / len(self.tables))
+        )
+
+    def _counts(self):
+        counts = {"queued": 0, "running": 0, "complete": 0, "failed": 0, "cancelled": 0}
+        for entry in self.tables.values():
+            counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+        return counts
+
+    def summary(self):
+        """Aggregated batch results: per-table status and scores, plus batch totals."""
+        entries = [dict(entry) for entry in self.tables.values()]
+        scored = [entry["dq_score"] for entry in entries if entry.get("dq_score") is not None]
+        return {
+            "source": self.job.request.path,
+            "source_type": "batch",
+            "priority": self.priority,
+            "max_concurrent_scans": self.max_concurrent,
+            "table_count": len(entries),
+            **self._counts(),
+            "dq_score": round(sum(scored) / len(scored)) if scored else None,
+            "row_count": sum(entry.get("row_count") or 0 for entry in entries),
+            "issue_count": sum(entry.get("issue_count") or 0 for entry in entries),
+            "mock": self.mock,
+            "tables": entries
+        }
@@ -0,0 +1,155 @@
+"""Benchmarks DQChecks.analyze_dataframe against the original pandas implementation.
+
+Usage (from backend/):
+    python benchmarks/profile_benchmark.py --rows 5000000 --numeric 20 --text 5 --workers 1 8 32
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dq_checks import DQChecks, convert_to_native_types  # noqa: E402
+from profiler import config  # noqa: E402
+
+
+def legacy_analyze_dataframe(df: pd.DataFrame):
+    """analyze_dataframe as it was before the vectorized profiler, kept as the baseline."""
+    results = {
+        "row_count": int(len(df)),
+        "columns": list(df.columns),
+        "missing_values": {k: int(v) for k, v in df.isnull().sum().to_dict().items()},
+        "duplicates": int(df.duplicated().sum()),
+        "column_types": df.dtypes.astype(str).to_dict(),
+        "numeric_distribution": {},
+        "issues": []
+    }
+
+    for col, null_count in results["missing_values"].items():
+        null_ratio = null_count / len(df) if len(df) > 0 else 0
+        if null_ratio > 0.05:
+            results["issues"].append({
+                "type": "High Null Ratio",
+                "column": col,
+                "severity": "High" if null_ratio > 0.2 else "Medium",
+                "details": f"{null_ratio:.1%} of values are null."
+            })
+
+    if results["duplicates"] > 0:
+        results["issues"].append({
+            "type": "Duplicate Rows",
+            "column": "All",
+            "severity": "High",
+            "details": f"Found {results['duplicates']} duplicate rows."
+        })
+
+    numeric_cols = df.select_dtypes(include=[np.number]).columns
+    for col in numeric_cols:
+        desc = df[col].describe().to_dict()
+        desc = {k: float(v) if isinstance(v, (np.floating, np.float64)) else v for k, v in desc.items()}
+        results["numeric_distribution"][col] = desc
+        if desc.get("std", 0) == 0 and len(df) > 1:
+            results["issues"].append({
+                "type": "Zero Variance",
+                "column": col,
+                "severity": "Low",
+                "details": "Column has constant value."
+            })
+
+    time_cols = df.select_dtypes(include=['datetime', 'datetimetz']).columns
+    for col in time_cols:
+        if df[col].isnull().all():
+            continue
+        if (df[col] > pd.Timestamp.now()).any():
+            results["issues"].append({
+                "type": "Future Dates Detected",
+                "column": col,
+                "severity": "Medium",
+                "details": "Contains dates in the future."
+            })
+
+    score = 100 - (len(results["issues"]) * 5)
+    results["dq_score"] = max(0, score)
+    return convert_to_native_types(results)
+
+
+def make_frame(rows, numeric, text, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(numeric):
+        if i % 2:
+            values = rng.normal(100, 15, rows)
+            values[rng.random(rows) < 0.1] = np.nan
+        else:
+            values = rng.integers(0, 1000, rows)
+        data[f"num_{i}"] = values
+    for i in range(text):
+        data[f"text_{i}"] = pd.Series(rng.integers(0, 50, rows)).map(lambda v: f"cat_{v}")
+    data["event_time"] = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 10 ** 6, rows), unit="s")
+    df = pd.DataFrame(data)
+    return pd.concat([df, df.iloc[: max(1, rows // 100)]], ignore_index=True)
+
+
+def measure(fn, df):
+    """Times fn(df), then runs it again under tracemalloc (which slows it down) for peak memory."""
+    start = time.perf_counter()
+    result = fn(df)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def compare(legacy, current, tolerance=1e-9):
+    """Returns differences between the two outputs on the keys both produce."""
+    differences = []
+    for key in ("row_count", "columns", "missing_values", "duplicates", "column_types", "dq_score"):
+        if legacy[key] != current[key]:
+            differences.append(key)
+    for col, expected in legacy["numeric_distribution"].items():
+        actual = current["numeric_distribution"].get(col, {})
+        for stat, value in expected.items():
+            other = actual.get(stat)
+            if value is None or (isinstance(value, float) and np.isnan(value)):
+                if other is not None:
+                    differences.append(f"{col}.{stat}")
+            elif other is None or abs(value - other) > tolerance * max(1.0, abs(value)):
+                differences.append(f"{col}.{stat}")
+    if [i["type"] for i in legacy["issues"]] != [i["type"] for i in current["issues"]]:
+        differences.append("issues")
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--numeric", type=int, default=20)
+    parser.add_argument("--text", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1],
+                        help="Worker counts to benchmark the vectorized profiler with")
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.numeric, args.text)
+    print(f"Frame: {len(df):,} rows x {len(df.columns)} columns ({df.memory_usage(deep=True).sum() / 1e6:,.0f} MB)")
+
+    legacy, legacy_time, legacy_peak = measure(legacy_analyze_dataframe, df)
+    print(f"legacy               {legacy_time:8.2f}s  peak {legacy_peak / 1e6:8.0f} MB")
+
+    for workers in args.workers:
+        config["profiler_workers"] = workers
+        current, current_time, current_peak = measure(DQChecks.analyze_dataframe, df)
+        differences = compare(legacy, current)
+        print(f"vectorized x{workers:<3}     {current_time:8.2f}s  peak {current_peak / 1e6:8.0f} MB  "
+              f"speedup {legacy_time / current_time:5.1f}x  "
+              + ("outputs match" if not differences else f"outputs differ: {', '.join(differences)}"))
+
+
+if __name__ == "__main__":
+    main()
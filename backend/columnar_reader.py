@@ -0,0 +1,421 @@
+import glob
+import json
+import os
+from urllib.parse import unquote
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet as pq
+from streaming_profiler import StreamingProfiler
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+COLUMNAR_FORMATS = ("parquet", "delta", "arrow")
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+
+
+def detect_format(path):
+    """Returns 'parquet', 'delta', 'arrow' or 'csv' for a file path (or a local Delta table directory)."""
+    if os.path.isdir(os.path.join(path, "_delta_log")):
+        return "delta"
+    lower = path.lower()
+    if lower.endswith(PARQUET_EXTENSIONS):
+        return "parquet"
+    if lower.endswith(ARROW_EXTENSIONS):
+        return "arrow"
+    return "csv"
+
+
+def _select_units(sizes, mode, size):
+    """Indices of the row groups (or record batches) a sample reads.
+
+    'head' takes leading units until they hold `size` rows, 'blocks' takes
+    `size` evenly spaced units and 'full' takes them all.
+    """
+    if mode == "head":
+        cumulative = np.cumsum(sizes)
+        return list(range(int(np.searchsorted(cumulative, size)) + 1))[:len(sizes)]
+    if mode == "blocks" and size < len(sizes):
+        return sorted(set(int(i) for i in np.linspace(0, len(sizes) - 1, size)))
+    return list(range(len(sizes)))
+
+
+def _to_frame(batch, constants=None):
+    """Converts a record batch to pandas without consolidating columns into 2-D blocks.
+
+    Numeric columns without nulls are then views of the Arrow buffers, so
+    memory-mapped data is not copied before the profiler reads it.
+    """
+    df = pa.Table.from_batches([batch]).to_pandas(split_blocks=True)
+    for col, value in (constants or {}).items():
+        df[col] = value
+    return df
+
+
+def _is_future(value):
+    timestamp = pd.Timestamp(value)
+    now = pd.Timestamp.now(tz="UTC")
+    return timestamp > (now if timestamp.tzinfo is not None else now.tz_localize(None))
+
+
+class FooterStats:
+    """Row, null and min/max statistics collected from Parquet footers.
+
+    Writers record null_count and min/max per column chunk, so whole-file
+    null counts and value ranges are available without reading any data. A
+    column's totals are only used when every row group carried them.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.columns = {}
+
+    def _column(self, name):
+        return self.columns.setdefault(name, {"nulls": 0, "min": None, "max": None,
+                                              "nulls_complete": True, "range_complete": True})
+
+    def add_parquet(self, metadata, constants=None):
+        """Adds every row group of a file (partition `constants` count as nulls when None)."""
+        for rg in range(metadata.num_row_groups):
+            row_group = metadata.row_group(rg)
+            self.rows += row_group.num_rows
+            for i in range(row_group.num_columns):
+                chunk = row_group.column(i)
+                column = self._column(chunk.path_in_schema)
+                stats = chunk.statistics
+                if stats is None or not stats.has_null_count:
+                    column["nulls_complete"] = False
+                else:
+                    column["nulls"] += stats.null_count
+                if stats is None or not stats.has_min_max:
+                    column["range_complete"] = False
+                    continue
+                try:
+                    if column["min"] is None or stats.min < column["min"]:
+                        column["min"] = stats.min
+                    if column["max"] is None or stats.max > column["max"]:
+                        column["max"] = stats.max
+                except TypeError:
+                    column["range_complete"] = False
+            for name, value in (constants or {}).items():
+                column = self._column(name)
+                column["nulls"] += row_group.num_rows if value is None else 0
+                column["range_complete"] = False
+
+    def nulls(self, name):
+        column = self.columns.get(name)
+        return column["nulls"] if column and column["nulls_complete"] else None
+
+    def value_range(self, name):
+        column = self.columns.get(name)
+        if not column or not column["range_complete"] or column["max"] is None:
+            return None
+        return column["min"], column["max"]
+
+
+class ColumnarReader:
+    """Profiles Parquet files, Delta table snapshots and Arrow IPC files.
+
+    Data is read as typed Arrow record batches (so timestamps stay timestamps)
+    restricted to the requested columns, and streamed through the
+    StreamingProfiler. For Parquet and Delta the footers supply the row count
+    and, for every column including unread ones, exact null counts and
+    min/max; sampled scans read only a subset of row groups. Arrow IPC files
+    are memory-mapped rather than read into memory.
+    """
+
+    @staticmethod
+    def profile(source, file_format, columns=None, mode="full", size=None, duplicate_mode="approximate"):
+        """
+        Profiles a columnar file.
+
+        Args:
+            source: Local path, or a seekable file object (Parquet and Arrow only)
+            file_format: 'parquet', 'delta' or 'arrow'
+            columns: Columns to read; None reads all, [] reads none (footer metrics only)
+            mode: 'head' (first `size` rows), 'blocks' (`size` evenly spaced row
+                  groups or record batches) or 'full'
+            size: Rows for 'head', row groups/batches for 'blocks'
+            duplicate_mode: Passed to StreamingProfiler
+
+        Returns:
+            (profile dict, sampling info dict), or ({'error': ...}, None)
+        """
+        try:
+            if file_format == "delta":
+                snapshot = ColumnarReader.delta_snapshot(source)
+                files = [(os.path.join(source, unquote(add["path"])), add.get("partitionValues") or {})
+                         for add in snapshot["files"]]
+                profile, sampling = ColumnarReader._profile_parquet(files, columns, mode, size, duplicate_mode)
+                sampling["delta_version"] = snapshot["version"]
+            elif file_format == "parquet":
+                profile, sampling = ColumnarReader._profile_parquet([(source, {})], columns, mode, size, duplicate_mode)
+            elif file_format == "arrow":
+                profile, sampling = ColumnarReader._profile_arrow(source, columns, mode, size, duplicate_mode)
+            else:
+                return {"error": f"Unsupported columnar format: {file_format}"}, None
+        except (OSError, ValueError, pa.ArrowException) as e:
+            return {"error": f"Could not read {file_format} data: {e}"}, None
+
+        logger.info(f"Profiled {sampling['rows_read']:,} of {profile['row_count']:,} rows "
+                    f"from {file_format} ({sampling['mode']})")
+        return profile, sampling
+
+    @staticmethod
+    def delta_snapshot(table_dir):
+        """
+        Replays a Delta table's transaction log to find its current data files.
+
+        Starts from the last checkpoint (if any) and applies the JSON commits
+        after it; 'remove' actions drop files added earlier.
+
+        Tables whose files cannot be read as plain Parquet are refused: deletion
+        vectors mark rows of a file as deleted without rewriting it, and column
+        mapping stores columns under physical names. Both need a Delta reader, so
+        such tables are scanned through Unity Catalog on the warehouse instead.
+
+        Returns:
+            dict with 'version' and 'files' (the live 'add' actions)
+
+        Raises:
+            ValueError: if the log is missing or the table uses deletion vectors or column mapping
+        """
+        log_dir = os.path.join(table_dir, "_delta_log")
+        files = {}
+        configuration = {}
+        checkpoint_version = -1
+
+        last_checkpoint = os.path.join(log_dir, "_last_checkpoint")
+        if os.path.exists(last_checkpoint):
+            with open(last_checkpoint) as f:
+                checkpoint_version = json.load(f)["version"]
+            for part in sorted(glob.glob(os.path.join(log_dir, f"{checkpoint_version:020d}.checkpoint*.parquet"))):
+                names = pq.read_schema(part).names
+                table = pq.read_table(part, columns=[name for name in ("add", "metaData") if name in names])
+                if "add" in table.column_names:
+                    for action in table.column("add").to_pylist():
+                        if action is not None:
+                            files[action["path"]] = action
+                if "metaData" in table.column_names:
+                    for action in table.column("metaData").to_pylist():
+                        if action is not None:
+                            configuration = dict(action.get("configuration") or {})
+
+        version = checkpoint_version
+        commits = sorted(glob.glob(os.path.join(log_dir, "[0-9]" * 20 + ".json")))
+        for commit in commits:
+            commit_version = int(os.path.basename(commit).split(".")[0])
+            if commit_version <= checkpoint_version:
+                continue
+            with open(commit) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    action = json.loads(line)
+                    if "add" in action:
+                        files[action["add"]["path"]] = action["add"]
+                    elif "remove" in action:
+                        files.pop(action["remove"]["path"], None)
+                    elif "metaData" in action:
+                        configuration = action["metaData"].get("configuration") or {}
+            version = commit_version
+
+        if version < 0:
+            raise ValueError(f"No Delta log commits found in {log_dir}")
+
+        mapping_mode = configuration.get("delta.columnMapping.mode", "none")
+        if mapping_mode != "none":
+            raise ValueError(f"Delta table uses column mapping (mode '{mapping_mode}'), so its Parquet files do not carry "
+                             f"the table's column names; scan it through Unity Catalog instead")
+        with_deletions = sum(1 for add in files.values() if add.get("deletionVector"))
+        if with_deletions:
+            raise ValueError(f"Delta table has deletion vectors on {with_deletions} data file(s), so their Parquet rows "
+                             f"include deleted ones; scan it through Unity Catalog instead")
+        return {"version": version, "files": list(files.values())}
+
+    @staticmethod
+    def _projection(schema_names, columns):
+        if columns is None:
+            return list(schema_names)
+        unknown = [col for col in columns if col not in schema_names]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        # Read in schema order so the profile's column order does not depend on the request
+        return [name for name in schema_names if name in set(columns)]
+
+    @staticmethod
+    def _profile_parquet(files, columns, mode, size, duplicate_mode):
+        """Profiles one or more Parquet files (with optional partition constants) as a single dataset."""
+        footer = FooterStats()
+        opened = []
+        for source, constants in files:
+            parquet_file = pq.ParquetFile(source)
+            footer.add_parquet(parquet_file.metadata, constants)
+            opened.append((parquet_file, constants))
+        if not opened:
+            raise ValueError("Table has no data files")
+
+        schema = opened[0][0].schema_arrow
+        partition_columns = list(opened[0][1])
+        schema_names = schema.names + [col for col in partition_columns if col not in schema.names]
+        read_columns = ColumnarReader._projection(schema_names, columns)
+        data_columns = [col for col in read_columns if col in schema.names]
+        if len(read_columns) < len(schema_names):
+            # Rows that repeat in a few columns are not duplicate rows
+            duplicate_mode = "none"
+
+        # Row groups across all files, in file order
+        units = [(f, rg) for f, (parquet_file, _) in enumerate(opened) for rg in range(parquet_file.num_row_groups)]
+        sizes = [opened[f][0].metadata.row_group(rg).num_rows for f, rg in units]
+        selected = _select_units(sizes, mode, size) if read_columns else []
+        expected_rows = sum(sizes[i] for i in selected)
+        if mode == "head":
+            expected_rows = min(expected_rows, size)
+
+        profiler = StreamingProfiler(duplicate_mode=duplicate_mode, expected_rows=expected_rows)
+        chunk_rows = config["streaming_chunk_rows"]
+        for f, (parquet_file, constants) in enumerate(opened):
+            row_groups = [units[i][1] for i in selected if units[i][0] == f]
+            if not row_groups:
+                continue
+            file_constants = {col: constants.get(col) for col in read_columns if col in partition_columns}
+            for batch in parquet_file.iter_batches(batch_size=chunk_rows, row_groups=row_groups, columns=data_columns):
+                if mode == "head":
+                    batch = batch.slice(0, size - profiler.row_count)
+                profiler.update(_to_frame(batch, file_constants))
+                if mode == "head" and profiler.row_count >= size:
+                    break
+
+        types = schema.empty_table().to_pandas().dtypes.astype(str).to_dict()
+        types.update({col: "object" for col in partition_columns})
+        date_columns = [field.name for field in schema
+                        if pa.types.is_timestamp(field.type) or pa.types.is_date(field.type)]
+        # A footer-only scan (no columns read) still covers every row through the footers
+        sampled = bool(read_columns) and len(selected) < len(units)
+        profile = ColumnarReader._with_footer_stats(profiler, footer, schema_names, types, date_columns, sampled)
+        sampling = {
+            "mode": mode if sampled else "full",
+            "format": "parquet",
+            "file_rows": footer.rows,
+            "rows_read": profiler.row_count,
+            "row_groups": len(units),
+            "row_groups_read": len(selected),
+            "columns_read": read_columns
+        }
+        return profile, sampling
+
+    @staticmethod
+    def _with_footer_stats(profiler, footer, schema_names, types, date_columns, sampled):
+        """
+        Completes a streamed profile with footer statistics.
+
+        Unsampled scans take the row count and every column's null count and
+        min/max from the footers (for columns that were not read these are the
+        only metrics). Sampled scans describe the rows read, as other sampled
+        scans do; only the future-date check, which depends on the whole-file
+        maximum alone, still uses the footers.
+        """
+        profile = profiler.profile()
+        read_columns = profile["columns"]
+        future = set(profile["future_date_columns"])
+        for col in date_columns:
+            value_range = footer.value_range(col)
+            if value_range is not None and _is_future(value_range[1]):
+                future.add(col)
+        profile["future_date_columns"] = [col for col in schema_names if col in future]
+        if sampled:
+            return profile
+
+        missing_values = {}
+        numeric_distribution = dict(profile["numeric_distribution"])
+        footer_columns = []
+        for col in schema_names:
+            nulls = footer.nulls(col)
+            if nulls is not None:
+                missing_values[col] = int(nulls)
+                footer_columns.append(col)
+            elif col in profile["missing_values"]:
+                missing_values[col] = profile["missing_values"][col]
+
+            value_range = footer.value_range(col)
+            dtype = types.get(col, "object")
+            if value_range is None or nulls is None or not (pd.api.types.is_numeric_dtype(dtype)
+                                                            and not pd.api.types.is_bool_dtype(dtype)):
+                continue
+            describe = numeric_distribution.get(col) or {"count": 0.0, "mean": None, "std": None, "min": None,
+                                                         "25%": None, "50%": None, "75%": None, "max": None}
+            numeric_distribution[col] = dict(describe, count=float(footer.rows - nulls),
+                                             min=float(value_range[0]), max=float(value_range[1]))
+
+        profile.update({
+            "row_count": footer.rows,
+            "columns": schema_names,
+            "missing_values": missing_values,
+            "column_types": {col: profile["column_types"].get(col, types.get(col, "object")) for col in schema_names},
+            "numeric_distribution": {col: numeric_distribution[col] for col in schema_names if col in numeric_distribution},
+            "footer_columns": footer_columns,
+            "unread_columns": [col for col in schema_names if col not in read_columns]
+        })
+        return profile
+
+    @staticmethod
+    def _profile_arrow(source, columns, mode, size, duplicate_mode):
+        """Profiles an Arrow IPC file (random access) or stream, memory-mapping local files."""
+        if isinstance(source, str):
+            source = pa.memory_map(source, "r")
+        try:
+            reader = pa.ipc.open_file(source)
+            count = reader.num_record_batches
+            batches = (reader.get_batch(i) for i in range(count))
+        except pa.ArrowInvalid:
+            # Not the random-access file format: read it as a stream, front to back
+            source.seek(0)
+            reader = pa.ipc.open_stream(source)
+            count = None
+            batches = iter(reader)
+
+        schema = reader.schema
+        read_columns = ColumnarReader._projection(schema.names, columns)
+        if len(read_columns) < len(schema.names):
+            duplicate_mode = "none"
+        if count is not None and mode == "blocks":
+            # Batch lengths are in the file footer's metadata, so indices can be chosen up front
+            indices = _select_units([1] * count, mode, size)
+            batches = (reader.get_batch(i) for i in indices)
+
+        profiler = StreamingProfiler(duplicate_mode=duplicate_mode, expected_rows=size if mode == "head" else None)
+        batches_read = 0
+        if read_columns:
+            for batch in batches:
+                batch = batch.select(read_columns)
+                if mode == "head":
+                    batch = batch.slice(0, size - profiler.row_count)
+                profiler.update(_to_frame(batch))
+                batches_read += 1
+                if mode == "head" and profiler.row_count >= size:
+                    break
+
+        profile = profiler.profile()
+        if not read_columns:
+            types = schema.empty_table().to_pandas().dtypes.astype(str).to_dict()
+            profile.update({"columns": schema.names, "column_types": types, "missing_values": {}})
+        # IPC files carry no column statistics, so unread columns get no metrics
+        profile["unread_columns"] = [col for col in schema.names if col not in read_columns]
+        if count is not None:
+            sampled = batches_read < count
+        else:
+            sampled = mode == "head" and profiler.row_count >= size
+        sampling = {
+            "mode": mode if sampled else "full",
+            "format": "arrow",
+            "rows_read": profiler.row_count,
+            "record_batches_read": batches_read,
+            "columns_read": read_columns
+        }
+        if count is not None:
+            sampling["record_batches"] = count
+        return profile, sampling
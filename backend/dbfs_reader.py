@@ -0,0 +1,356 @@
+import asyncio
+import io
+import numpy as np
+import pandas as pd
+from columnar_reader import ColumnarReader
+from dbx_rest import DatabricksREST
+from streaming_profiler import StreamingProfiler
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+# The DBFS read API returns at most 1 MB per call
+DBFS_READ_MAX_BYTES = 1 << 20
+
+# 'head' profiles the first N rows, 'blocks' N evenly spaced blocks, 'full' the whole file
+DBFS_SAMPLE_MODES = ("head", "blocks", "full")
+
+
+class _LineBuffer:
+    """Collects streamed bytes and hands back only complete CSV lines."""
+
+    def __init__(self):
+        self.header = None
+        self._pending = b""
+
+    def feed(self, data):
+        data = self._pending + data
+        if self.header is None:
+            newline = data.find(b"\n")
+            if newline < 0:
+                self._pending = data
+                return b""
+            self.header, data = data[:newline], data[newline + 1:]
+        cut = data.rfind(b"\n")
+        if cut < 0:
+            self._pending = data
+            return b""
+        self._pending = data[cut + 1:]
+        return data[:cut + 1]
+
+    def flush(self):
+        rest, self._pending = self._pending, b""
+        return rest
+
+
+def _parse_lines(header, body):
+    """Parses complete CSV lines under the file's header row."""
+    return pd.read_csv(io.BytesIO(header + b"\n" + body))
+
+
+class DBFSFile(io.RawIOBase):
+    """Seekable, read-only file object over ranged DBFS reads.
+
+    Lets Parquet and Arrow readers fetch only the footer and the column chunks
+    they need. It is used from a worker thread: each read is scheduled on the
+    event loop that owns the HTTP client and waited for.
+    """
+
+    def __init__(self, path, size, loop):
+        self.path = path
+        self.size = size
+        self.loop = loop
+        self.position = 0
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def readinto(self, buffer):
+        length = min(len(buffer), self.size - self.position)
+        if length <= 0:
+            return 0
+        block = asyncio.run_coroutine_threadsafe(
+            DBFSReader.read_block(self.path, self.position, length), self.loop
+        ).result()
+        if "error" in block:
+            raise IOError(block["error"])
+        data = block["data"]
+        buffer[:len(data)] = data
+        self.position += len(data)
+        self.bytes_read += len(data)
+        return len(data)
+
+
+class DBFSReader:
+    """Ranged reads of DBFS files through /api/2.0/dbfs/read.
+
+    Files are fetched in blocks of at most 1 MB (several in flight at once) and
+    split on line boundaries, so only the bytes a sample needs are downloaded,
+    and complete lines are parsed in chunks into the streaming profiler.
+    Fields containing quoted newlines are not supported in 'blocks' mode, where
+    a block may start inside such a field.
+    """
+
+    @staticmethod
+    async def get_size(path):
+        status = await DatabricksREST.dbfs_get_status(path)
+        if "error" in status:
+            return status
+        if status.get("is_dir"):
+            return {"error": f"{path} is a directory"}
+        return int(status.get("file_size", 0))
+
+    @staticmethod
+    async def read_block(path, offset, length):
+        """Reads one range, issuing as many 1 MB API calls as it needs (concurrently)."""
+        offsets = range(offset, offset + length, DBFS_READ_MAX_BYTES)
+        parts = await asyncio.gather(*[
+            DatabricksREST.dbfs_read(path, start, min(DBFS_READ_MAX_BYTES, offset + length - start))
+            for start in offsets
+        ])
+        for part in parts:
+            if "error" in part:
+                return part
+        return {"data": b"".join(part["data"] for part in parts)}
+
+    @staticmethod
+    async def iter_blocks(path, file_size, block_size=None, prefetch=None):
+        """Yields the file's bytes in order, keeping up to `prefetch` block reads in flight.
+
+        Closing the generator early (e.g. once a head sample is complete) cancels
+        the reads that are still pending.
+        """
+        block_size = block_size or DBFS_READ_MAX_BYTES
+        prefetch = prefetch or config["dbfs_read_concurrency"]
+        offsets = iter(range(0, file_size, block_size))
+        pending = []
+        try:
+            while True:
+                while len(pending) < prefetch:
+                    offset = next(offsets, None)
+                    if offset is None:
+                        break
+                    length = min(block_size, file_size - offset)
+                    pending.append(asyncio.create_task(DBFSReader.read_block(path, offset, length)))
+                if not pending:
+                    return
+                block = await pending.pop(0)
+                if "error" in block:
+                    raise IOError(block["error"])
+                yield block["data"]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @staticmethod
+    async def read_head(path, lines=10):
+        """Reads the first `lines` lines of a file, downloading only the blocks that hold them.
+
+        Returns:
+            {'text': str} or {'error': ...}
+        """
+        size = await DBFSReader.get_size(path)
+        if isinstance(size, dict):
+            return size
+
+        chunks = []
+        newlines = 0
+        try:
+            async for data in DBFSReader.iter_blocks(path, size, prefetch=1):
+                chunks.append(data)
+                newlines += data.count(b"\n")
+                if newlines >= lines:
+                    break
+        except IOError as e:
+            return {"error": str(e)}
+        text = b"".join(chunks).decode("utf-8", errors="replace")
+        return {"text": "\n".join(text.split("\n")[:lines])}
+
+    @staticmethod
+    async def profile_csv(path, mode=None, size=None, duplicate_mode="approximate", on_progress=None):
+        """
+        Streams (part of) a DBFS CSV file through the StreamingProfiler.
+
+        Args:
+            path: dbfs:/ path of the file
+            mode: 'head' (first `size` rows), 'blocks' (`size` evenly spaced blocks)
+                  or 'full'; defaults to DBFS_SAMPLE_MODE
+            size: Rows for 'head', blocks for 'blocks'; defaults from config
+            duplicate_mode: Passed to StreamingProfiler
+            on_progress: Optional callback(bytes_read, bytes_planned)
+
+        Returns:
+            (profile dict, sampling info dict), or ({'error': ...}, None)
+        """
+        mode = mode or config["dbfs_sample_mode"]
+        file_size = await DBFSReader.get_size(path)
+        if isinstance(file_size, dict):
+            return file_size, None
+
+        block_bytes = config["dbfs_sample_block_bytes"]
+        if mode == "blocks":
+            size = size or config["dbfs_sample_blocks"]
+            if size * block_bytes >= file_size:
+                # The sampled blocks would cover the whole file anyway
+                mode = "full"
+        elif mode == "head":
+            size = size or config["dbfs_sample_rows"]
+
+        profiler = StreamingProfiler(duplicate_mode=duplicate_mode, expected_rows=size if mode == "head" else None)
+        progress = on_progress or (lambda done, total: None)
+        try:
+            if mode == "blocks":
+                bytes_read = await DBFSReader._profile_blocks(path, file_size, size, block_bytes, profiler, progress)
+            else:
+                bytes_read = await DBFSReader._profile_stream(
+                    path, file_size, size if mode == "head" else None, profiler, progress
+                )
+        except (IOError, pd.errors.ParserError, UnicodeDecodeError) as e:
+            return {"error": f"Could not read {path}: {e}"}, None
+
+        sampling = {
+            "mode": mode,
+            "file_size": file_size,
+            "bytes_read": bytes_read,
+            "rows_read": profiler.row_count
+        }
+        if mode == "blocks":
+            sampling["blocks"] = size
+            sampling["block_bytes"] = block_bytes
+        elif mode == "head":
+            sampling["rows"] = size
+        logger.info(f"Profiled {profiler.row_count:,} rows of {path} ({mode}, {bytes_read:,} of {file_size:,} bytes)")
+        return profiler.profile(), sampling
+
+    @staticmethod
+    async def profile_columnar(path, file_format, columns=None, mode=None, size=None, duplicate_mode="approximate"):
+        """
+        Profiles a Parquet or Arrow IPC file on DBFS through ColumnarReader.
+
+        Only the footer and the row groups (or record batches) and columns the
+        sample needs are downloaded. 'blocks' mode reads `size` evenly spaced
+        row groups rather than byte ranges.
+
+        Returns:
+            (profile dict, sampling info dict), or ({'error': ...}, None)
+        """
+        mode = mode or config["dbfs_sample_mode"]
+        if mode == "head":
+            size = size or config["dbfs_sample_rows"]
+        elif mode == "blocks":
+            size = size or config["dbfs_sample_blocks"]
+
+        file_size = await DBFSReader.get_size(path)
+        if isinstance(file_size, dict):
+            return file_size, None
+
+        source = DBFSFile(path, file_size, asyncio.get_running_loop())
+        profile, sampling = await asyncio.to_thread(
+            ColumnarReader.profile, source, file_format,
+            columns=columns, mode=mode, size=size, duplicate_mode=duplicate_mode
+        )
+        if sampling is not None:
+            sampling.update(file_size=file_size, bytes_read=source.bytes_read)
+            logger.info(f"Read {source.bytes_read:,} of {file_size:,} bytes of {path}")
+        return profile, sampling
+
+    @staticmethod
+    async def _profile_stream(path, file_size, max_rows, profiler, progress):
+        """Profiles the file from the start, stopping after max_rows rows (None for the whole file)."""
+        buffer = _LineBuffer()
+        parse_bytes = config["dbfs_parse_bytes"]
+        pending = []
+        pending_size = 0
+        pending_rows = 0
+        bytes_read = 0
+
+        async def parse(body):
+            df = await asyncio.to_thread(_parse_lines, buffer.header, body)
+            if max_rows is not None:
+                df = df.iloc[:max_rows - profiler.row_count]
+            await asyncio.to_thread(profiler.update, df)
+
+        def enough_rows():
+            return max_rows is not None and profiler.row_count >= max_rows
+
+        blocks = DBFSReader.iter_blocks(path, file_size)
+        try:
+            async for data in blocks:
+                bytes_read += len(data)
+                progress(bytes_read, file_size)
+                lines = buffer.feed(data)
+                if not lines:
+                    continue
+                pending.append(lines)
+                pending_size += len(lines)
+                pending_rows += lines.count(b"\n")
+                # Parse in larger chunks, except in head mode where we stop as soon as we have the rows
+                if pending_size >= parse_bytes or (max_rows is not None and profiler.row_count + pending_rows >= max_rows):
+                    await parse(b"".join(pending))
+                    pending, pending_size, pending_rows = [], 0, 0
+                    if enough_rows():
+                        break
+        finally:
+            await blocks.aclose()
+
+        if not enough_rows():
+            tail = b"".join(pending) + buffer.flush()
+            if buffer.header is not None and tail.strip():
+                await parse(tail)
+        return bytes_read
+
+    @staticmethod
+    async def _profile_blocks(path, file_size, blocks, block_bytes, profiler, progress):
+        """Profiles `blocks` evenly spaced ranges of the file, trimmed to whole lines."""
+        header_block = await DBFSReader.read_block(path, 0, min(block_bytes, file_size))
+        if "error" in header_block:
+            raise IOError(header_block["error"])
+        newline = header_block["data"].find(b"\n")
+        if newline < 0:
+            raise IOError("Header row is longer than one block")
+        header = header_block["data"][:newline]
+
+        offsets = [int(o) for o in np.linspace(0, file_size - block_bytes, blocks)]
+        semaphore = asyncio.Semaphore(config["dbfs_read_concurrency"])
+        bytes_read = 0
+
+        async def fetch(offset):
+            nonlocal bytes_read
+            if offset == 0:
+                block = header_block
+            else:
+                async with semaphore:
+                    block = await DBFSReader.read_block(path, offset, block_bytes)
+            if "error" in block:
+                raise IOError(block["error"])
+            bytes_read += len(block["data"])
+            progress(bytes_read, blocks * block_bytes)
+            return block["data"]
+
+        datas = await asyncio.gather(*[fetch(offset) for offset in offsets])
+        # Update the profiler in file order so the result does not depend on read timing
+        for offset, data in zip(offsets, datas):
+            # Drop the partial first line (or the header) and the partial last line
+            start = data.find(b"\n") + 1
+            end = data.rfind(b"\n") + 1 if offset + len(data) < file_size else len(data)
+            body = data[start:end]
+            if body.strip():
+                df = await asyncio.to_thread(_parse_lines, header, body)
+                await asyncio.to_thread(profiler.update, df)
+        return bytes_read
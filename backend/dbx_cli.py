@@ -1,78 +1,146 @@
-import subprocess
+import asyncio
+import functools
 import json
+import re
 import shutil
 import os
+from dbx_rest import DatabricksREST
+from dbfs_reader import DBFSReader
+from statement_manager import statement_manager
+from statement_results import StatementResults, RESULT_ERRORS
+from metadata_cache import metadata_cache
 from utils import get_logger, get_config
 
 logger = get_logger(__name__)
 config = get_config()
 
+@functools.lru_cache(maxsize=1)
+def _find_cli():
+    """Locates the databricks executable once instead of on every command."""
+    return shutil.which("databricks")
+
+def _parse_fs_ls(output):
+    """Parses 'databricks fs ls' text output into the DBFS list API structure."""
+    # 'databricks fs ls' output format: 'dbfs:/path/file 123'
+    files = []
+    for line in output.strip().split("\n"):
+        if line:
+            parts = line.split()
+            if len(parts) >= 1:
+                files.append({"path": parts[0], "is_dir": parts[0].endswith("/")})
+    return {"files": files}
+
 class DatabricksCLI:
     @staticmethod
-    def run_command(args):
-        """Runs a databricks CLI command and returns output."""
+    async def run_command(args):
+        """Runs a databricks CLI command without blocking the event loop and returns output."""
         try:
             # Ensure databricks CLI is available
-            if not shutil.which("databricks"):
+            cli_path = _find_cli()
+            if not cli_path:
                 return {"error": "Databricks CLI not found. Please install it."}
 
             # Construct command
-            cmd = ["databricks"] + args
+            cmd = [cli_path] + args
             
-            # Run command
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True,
+            # Run command as an asyncio subprocess so other requests keep being served
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
                 env={**os.environ, "DATABRICKS_HOST": config["host"] or "", "DATABRICKS_TOKEN": config["token"] or ""}
             )
+            stdout, stderr = await process.communicate()
+            stdout = stdout.decode("utf-8", errors="replace")
+            stderr = stderr.decode("utf-8", errors="replace")
             
-            if result.returncode != 0:
-                logger.error(f"Command failed: {cmd}, Error: {result.stderr}")
-                return {"error": result.stderr}
+            if process.returncode != 0:
+                logger.error(f"Command failed: {cmd}, Error: {stderr}")
+                return {"error": stderr}
             
-            return {"output": result.stdout}
+            return {"output": stdout}
         except Exception as e:
             logger.error(f"Exception running command: {e}")
             return {"error": str(e)}
 
     @staticmethod
-    def list_path(path):
+    async def _call(rest_call, cli_args, parse_cli=json.loads):
+        """Runs an operation through the REST backend, or the CLI subprocess as a fallback.
+        
+        DATABRICKS_API_BACKEND selects 'rest', 'cli' or 'auto' (REST first, CLI if REST fails).
+        
+        Args:
+            rest_call: Zero-argument coroutine function performing the REST call
+            cli_args: Equivalent databricks CLI arguments
+            parse_cli: Converts CLI stdout into the REST response structure
+        
+        Returns:
+            Parsed response dict, or a dict with an 'error' key
+        """
+        backend = config["api_backend"]
+        if backend != "cli":
+            if DatabricksREST.is_configured():
+                res = await rest_call()
+                if "error" not in res or backend == "rest":
+                    return res
+                logger.warning(f"REST call failed: {res['error']}. Falling back to databricks CLI.")
+            elif backend == "rest":
+                return {"error": "Databricks host or token not configured"}
+        
+        res = await DatabricksCLI.run_command(cli_args)
+        if "error" in res:
+            return res
+        try:
+            return parse_cli(res["output"])
+        except ValueError:
+            return {"error": f"Could not parse output of: databricks {' '.join(cli_args)}"}
+
+    @staticmethod
+    async def list_path(path):
         """Lists files in a DBFS path."""
         logger.info(f"Listing path: {path}")
-        res = DatabricksCLI.run_command(["fs", "ls", path])
+        res = await DatabricksCLI._call(
+            lambda: DatabricksREST.dbfs_list(path),
+            ["fs", "ls", path],
+            parse_cli=_parse_fs_ls
+        )
         if "error" in res:
             return res
         
-        # Parse output (simple parsing assuming 'path size' format or similar)
-        # 'databricks fs ls' output format: 'dbfs:/path/file 123'
-        files = []
-        for line in res["output"].strip().split("\n"):
-            if line:
-                parts = line.split()
-                if len(parts) >= 1:
-                    files.append({"path": parts[0], "is_dir": parts[0].endswith("/")})
-        return files
+        return [
+            {"path": f["path"], "is_dir": f.get("is_dir", False), "file_size": f.get("file_size")}
+            for f in res.get("files", [])
+        ]
 
     @staticmethod
-    def read_head(path, lines=10):
+    async def read_head(path, lines=10):
         """Reads the first N lines of a file."""
         logger.info(f"Reading head of: {path}")
-        # Copy to local tmp first as 'fs head' might not be standard or reliable for all file types
-        # But 'databricks fs cat' exists. Let's use cat and limit output.
-        res = DatabricksCLI.run_command(["fs", "cat", path])
+        # The REST backend reads only the leading blocks; 'fs cat' has to download the whole file
+        res = await DatabricksCLI._call(
+            lambda: DBFSReader.read_head(path, lines),
+            ["fs", "cat", path],
+            parse_cli=lambda output: {"text": "\n".join(output.split("\n")[:lines])}
+        )
         if "error" in res:
             return res
-        
-        content = res["output"]
-        return "\n".join(content.split("\n")[:lines])
+        return res["text"]
 
     @staticmethod
-    def run_sql(query):
-        """Runs a SQL query using the Warehouse via REST API."""
-        import requests
-        import time
-        
+    async def run_sql(query, result_format="json", timeout=None):
+        """
+        Runs a SQL query using the Warehouse via REST API.
+
+        Args:
+            query: SQL statement
+            result_format: 'json' returns every row as 'data_array' (values are the
+                           strings the API sends); 'arrow' returns a typed pyarrow.Table
+                           as 'table', downloaded as ARROW_STREAM chunks from external links
+            timeout: Seconds before the statement is cancelled (defaults to SQL_STATEMENT_TIMEOUT_SECONDS)
+
+        Returns:
+            dict with 'manifest', 'row_count' and 'data_array' or 'table', or {'error': ...}
+        """
         warehouse_id = config["warehouse_id"]
         host = config["host"]
         token = config["token"]
@@ -84,50 +152,44 @@ class DatabricksCLI:
         
         logger.info(f"Running SQL: {query}")
         
-        # Use the SQL Statement Execution API
-        url = f"{host}/api/2.0/sql/statements"
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
+        # Use the SQL Statement Execution API through the shared connection pool
         payload = {
             "warehouse_id": warehouse_id,
             "statement": query,
             "wait_timeout": "30s",  # Wait up to 30 seconds for results
             "on_wait_timeout": "CONTINUE"  # Continue if query takes longer
         }
+        if result_format == "arrow":
+            # Large results come back as pre-signed links to Arrow IPC chunks instead of inline JSON
+            payload.update(format="ARROW_STREAM", disposition="EXTERNAL_LINKS")
         
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
-            response.raise_for_status()
-            result = response.json()
-            
-            # Check if we need to poll for results
+            # Polls until the statement finishes, cancelling it on timeout or if this scan is cancelled
+            result = await statement_manager.execute(payload, timeout=timeout)
+            if "error" in result:
+                return result
             status = result.get("status", {}).get("state", "")
             statement_id = result.get("statement_id", "")
             
-            # Poll for completion if still running
-            poll_count = 0
-            while status in ["PENDING", "RUNNING"] and poll_count < 30:
-                time.sleep(2)
-                poll_url = f"{host}/api/2.0/sql/statements/{statement_id}"
-                poll_response = requests.get(poll_url, headers=headers, timeout=30)
-                poll_response.raise_for_status()
-                result = poll_response.json()
-                status = result.get("status", {}).get("state", "")
-                poll_count += 1
-                logger.info(f"SQL query status: {status} (poll {poll_count})")
-            
             if status == "FAILED":
                 error_msg = result.get("status", {}).get("error", {}).get("message", "Unknown error")
-                return {"error": f"SQL query failed: {error_msg}"}
+                # The SQLSTATE tells a statement the warehouse rejected (e.g. a bad column) from one it failed to run
+                sql_state = re.search(r"SQLSTATE: (\w{5})", error_msg)
+                return {"error": f"SQL query failed: {error_msg}", "sql_state": sql_state.group(1) if sql_state else None}
             
             if status != "SUCCEEDED":
                 return {"error": f"SQL query did not complete. Status: {status}"}
             
-            # Extract the data
+            # Extract the data, following the result's remaining chunks
             manifest = result.get("manifest", {})
-            data_array = result.get("result", {}).get("data_array", [])
+            if result_format == "arrow":
+                table = await StatementResults.fetch_arrow(statement_id, result.get("result", {}), manifest)
+                return {
+                    "manifest": manifest,
+                    "table": table,
+                    "row_count": table.num_rows
+                }
+            data_array = await StatementResults.fetch_json(statement_id, result.get("result", {}), manifest)
             
             return {
                 "manifest": manifest,
@@ -135,17 +197,21 @@ class DatabricksCLI:
                 "row_count": len(data_array)
             }
             
-        except requests.exceptions.RequestException as e:
+        except RESULT_ERRORS as e:
             logger.error(f"SQL API request failed: {e}")
             return {"error": str(e)}
 
     @staticmethod
-    def check_connection():
+    async def check_connection():
         """Checks connection by listing workspace root."""
-        return DatabricksCLI.run_command(["workspace", "ls", "/"])
+        return await DatabricksCLI._call(
+            lambda: DatabricksREST.workspace_list("/"),
+            ["workspace", "ls", "/"],
+            parse_cli=lambda output: {"output": output}
+        )
 
     @staticmethod
-    def upload_notebook(local_path, workspace_path):
+    async def upload_notebook(local_path, workspace_path):
         """Uploads a notebook to Databricks workspace.
         
         Args:
@@ -163,18 +229,26 @@ class DatabricksCLI:
         # Create parent directory if it doesn't exist
         parent_dir = os_module.path.dirname(workspace_path)
         if parent_dir:
-            DatabricksCLI.run_command(["workspace", "mkdirs", parent_dir])
+            await DatabricksCLI._call(
+                lambda: DatabricksREST.workspace_mkdirs(parent_dir),
+                ["workspace", "mkdirs", parent_dir],
+                parse_cli=lambda output: {}
+            )
         
-        # Use 'workspace import' command
+        # Workspace import API, or 'workspace import' command as fallback
         # -l PYTHON for language, -f SOURCE for format, -o for overwrite
-        res = DatabricksCLI.run_command([
-            "workspace", "import",
-            "-l", "PYTHON",
-            "-f", "SOURCE",
-            "-o",
-            abs_local_path,
-            workspace_path
-        ])
+        res = await DatabricksCLI._call(
+            lambda: DatabricksREST.workspace_import(abs_local_path, workspace_path),
+            [
+                "workspace", "import",
+                "-l", "PYTHON",
+                "-f", "SOURCE",
+                "-o",
+                abs_local_path,
+                workspace_path
+            ],
+            parse_cli=lambda output: {}
+        )
         
         if "error" in res:
             return res
@@ -186,11 +260,18 @@ class DatabricksCLI:
     # ==========================================
     
     @staticmethod
-    def list_catalogs():
+    async def list_catalogs():
         """Lists all catalogs in Unity Catalog."""
+        cached = metadata_cache.get("catalogs")
+        if cached is not None:
+            return cached
+        
         logger.info("Listing Unity Catalog catalogs...")
-        # Legacy CLI (v0.18) outputs JSON by default
-        res = DatabricksCLI.run_command(["unity-catalog", "catalogs", "list"])
+        # Legacy CLI (v0.18) outputs JSON by default, matching the REST response
+        res = await DatabricksCLI._call(
+            DatabricksREST.list_catalogs,
+            ["unity-catalog", "catalogs", "list"]
+        )
         
         if "error" in res:
             # Fall back to mock data for demo
@@ -204,20 +285,22 @@ class DatabricksCLI:
                 "mock": True
             }
         
-        try:
-            data = json.loads(res["output"])
-            return {"catalogs": data.get("catalogs", []), "mock": False}
-        except json.JSONDecodeError:
-            return {"catalogs": [], "error": "Could not parse catalog list"}
+        result = {"catalogs": res.get("catalogs", []), "mock": False}
+        metadata_cache.set("catalogs", "", result)
+        return result
 
     @staticmethod
-    def list_schemas(catalog_name):
+    async def list_schemas(catalog_name):
         """Lists schemas in a catalog."""
+        cached = metadata_cache.get("schemas", catalog_name)
+        if cached is not None:
+            return cached
+        
         logger.info(f"Listing schemas in catalog: {catalog_name}")
-        res = DatabricksCLI.run_command([
-            "unity-catalog", "schemas", "list",
-            "--catalog-name", catalog_name
-        ])
+        res = await DatabricksCLI._call(
+            lambda: DatabricksREST.list_schemas(catalog_name),
+            ["unity-catalog", "schemas", "list", "--catalog-name", catalog_name]
+        )
         
         if "error" in res:
             # Fall back to mock data
@@ -239,21 +322,26 @@ class DatabricksCLI:
             }
             return {"schemas": mock_schemas.get(catalog_name, []), "mock": True}
         
-        try:
-            data = json.loads(res["output"])
-            return {"schemas": data.get("schemas", []), "mock": False}
-        except json.JSONDecodeError:
-            return {"schemas": [], "error": "Could not parse schema list"}
+        result = {"schemas": res.get("schemas", []), "mock": False}
+        metadata_cache.set("schemas", catalog_name, result)
+        return result
 
     @staticmethod
-    def list_tables(catalog_name, schema_name):
+    async def list_tables(catalog_name, schema_name):
         """Lists tables in a schema."""
+        cached = metadata_cache.get("tables", f"{catalog_name}.{schema_name}")
+        if cached is not None:
+            return cached
+        
         logger.info(f"Listing tables in {catalog_name}.{schema_name}")
-        res = DatabricksCLI.run_command([
-            "unity-catalog", "tables", "list",
-            "--catalog-name", catalog_name,
-            "--schema-name", schema_name
-        ])
+        res = await DatabricksCLI._call(
+            lambda: DatabricksREST.list_tables(catalog_name, schema_name),
+            [
+                "unity-catalog", "tables", "list",
+                "--catalog-name", catalog_name,
+                "--schema-name", schema_name
+            ]
+        )
         
         if "error" in res:
             # Fall back to mock data
@@ -288,23 +376,25 @@ class DatabricksCLI:
             key = f"{catalog_name}.{schema_name}"
             return {"tables": mock_tables.get(key, []), "mock": True}
         
-        try:
-            data = json.loads(res["output"])
-            return {"tables": data.get("tables", []), "mock": False}
-        except json.JSONDecodeError:
-            return {"tables": [], "error": "Could not parse table list"}
+        result = {"tables": res.get("tables", []), "mock": False}
+        metadata_cache.set("tables", f"{catalog_name}.{schema_name}", result)
+        return result
 
     @staticmethod
-    def get_table_info(catalog_name, schema_name, table_name):
+    async def get_table_info(catalog_name, schema_name, table_name):
         """Gets detailed information about a table including columns."""
         full_name = f"{catalog_name}.{schema_name}.{table_name}"
+        cached = metadata_cache.get("table", full_name)
+        if cached is not None:
+            return cached
+        
         logger.info(f"Getting table info for: {full_name}")
         
         # Legacy CLI requires --full-name flag
-        res = DatabricksCLI.run_command([
-            "unity-catalog", "tables", "get",
-            "--full-name", full_name
-        ])
+        res = await DatabricksCLI._call(
+            lambda: DatabricksREST.get_table(full_name),
+            ["unity-catalog", "tables", "get", "--full-name", full_name]
+        )
         
         if "error" in res:
             # Fall back to mock data
@@ -333,9 +423,84 @@ class DatabricksCLI:
                 "mock": True
             }
         
-        try:
-            data = json.loads(res["output"])
-            data["mock"] = False
-            return data
-        except json.JSONDecodeError:
-            return {"error": "Could not parse table info"}
+        res["mock"] = False
+        metadata_cache.set("table", full_name, res)
+        version = DatabricksCLI._properties_version(res)
+        if version is not None:
+            metadata_cache.set("version", full_name, version, ttl_seconds=config["profile_cache_version_ttl_seconds"])
+        return res
+
+    @staticmethod
+    def _properties_version(table_info):
+        """Delta version recorded in a Unity Catalog table's properties, or None."""
+        properties = table_info.get("properties") or {}
+        if properties.get("delta.lastUpdateVersion") is None:
+            return None
+        return {"version": int(properties["delta.lastUpdateVersion"]), "timestamp": properties.get("delta.lastCommitTimestamp")}
+
+    @staticmethod
+    async def describe_detail(full_name):
+        """
+        Gets a Delta table's storage details (DESCRIBE DETAIL) from the warehouse.
+
+        Returns:
+            dict of the detail columns (e.g. 'sizeInBytes', 'numFiles', 'lastModified',
+            as the strings the API returns), or {'error': ...}
+        """
+        cached = metadata_cache.get("detail", full_name)
+        if cached is not None:
+            return cached
+        
+        result = await DatabricksCLI.run_sql(f"DESCRIBE DETAIL {full_name}")
+        if "error" in result:
+            logger.warning(f"DESCRIBE DETAIL {full_name} failed: {result['error']}")
+            return result
+        if not result["data_array"]:
+            return {"error": f"DESCRIBE DETAIL {full_name} returned no rows"}
+        
+        names = [col["name"] for col in result["manifest"].get("schema", {}).get("columns", [])]
+        detail = dict(zip(names, result["data_array"][0]))
+        metadata_cache.set("detail", full_name, detail)
+        return detail
+
+    @staticmethod
+    async def table_version(full_name, use_cache=True):
+        """
+        Gets a Delta table's current version.
+
+        Unity Catalog records it in the table's properties, so it is normally read without
+        a warehouse statement; DESCRIBE HISTORY is the fallback when the property is missing.
+
+        Args:
+            full_name: Fully qualified table name
+            use_cache: Reuse a version read within PROFILE_CACHE_VERSION_TTL_SECONDS
+
+        Returns:
+            dict with 'version' (int) and 'timestamp', or {'error': ...}
+        """
+        if use_cache:
+            cached = metadata_cache.get("version", full_name)
+            if cached is not None:
+                return cached
+        
+        res = await DatabricksCLI._call(
+            lambda: DatabricksREST.get_table(full_name),
+            ["unity-catalog", "tables", "get", "--full-name", full_name]
+        )
+        version = DatabricksCLI._properties_version(res) if "error" not in res else None
+        if version is not None:
+            metadata_cache.set("version", full_name, version, ttl_seconds=config["profile_cache_version_ttl_seconds"])
+            return version
+        
+        result = await DatabricksCLI.run_sql(f"DESCRIBE HISTORY {full_name} LIMIT 1")
+        if "error" in result:
+            return result
+        names = [col["name"] for col in result.get("manifest", {}).get("schema", {}).get("columns", [])]
+        rows = result.get("data_array", [])
+        if not rows or "version" not in names:
+            return {"error": f"Could not read Delta version of {full_name}"}
+        
+        row = dict(zip(names, rows[0]))
+        version = {"version": int(row["version"]), "timestamp": row.get("timestamp")}
+        metadata_cache.set("version", full_name, version, ttl_seconds=config["profile_cache_version_ttl_seconds"])
+        return version
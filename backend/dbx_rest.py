@@ -0,0 +1,153 @@
+import base64
+import httpx
+from http_client import DatabricksHTTP
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+
+class DatabricksREST:
+    """Native REST backend for Unity Catalog, DBFS and Workspace operations.
+
+    Each method returns the same JSON structure the legacy `databricks` CLI prints
+    (e.g. {"catalogs": [...]}) or a dict with an 'error' key, so DatabricksCLI can
+    use either backend interchangeably.
+    """
+
+    @staticmethod
+    def is_configured():
+        return bool(config["host"] and config["token"])
+
+    @staticmethod
+    async def _request(method, path, **kwargs):
+        """Sends a request through the shared pool and returns parsed JSON or {'error': ...}."""
+        try:
+            response = await DatabricksHTTP.request(method, path, **kwargs)
+            if response.status_code >= 400:
+                try:
+                    message = response.json().get("message", response.text)
+                except ValueError:
+                    message = response.text
+                return {"error": f"{method} {path} failed ({response.status_code}): {message}"}
+            return response.json() if response.content else {}
+        except httpx.HTTPError as e:
+            logger.error(f"REST request {method} {path} failed: {e}")
+            return {"error": str(e)}
+
+    @staticmethod
+    async def _list_all(path, key, params):
+        """Follows next_page_token until every page of a Unity Catalog listing is read."""
+        items = []
+        params = dict(params)
+        while True:
+            data = await DatabricksREST._request("GET", path, params=params)
+            if "error" in data:
+                return data
+            items.extend(data.get(key, []))
+            next_token = data.get("next_page_token")
+            if not next_token:
+                return {key: items}
+            params["page_token"] = next_token
+
+    # ==========================================
+    # Unity Catalog
+    # ==========================================
+
+    @staticmethod
+    async def list_catalogs():
+        return await DatabricksREST._list_all("/api/2.1/unity-catalog/catalogs", "catalogs", {})
+
+    @staticmethod
+    async def list_schemas(catalog_name):
+        return await DatabricksREST._list_all(
+            "/api/2.1/unity-catalog/schemas", "schemas",
+            {"catalog_name": catalog_name}
+        )
+
+    @staticmethod
+    async def list_tables(catalog_name, schema_name):
+        # Columns are fetched separately by get_table, so keep the listing payload small
+        return await DatabricksREST._list_all(
+            "/api/2.1/unity-catalog/tables", "tables",
+            {"catalog_name": catalog_name, "schema_name": schema_name, "omit_columns": "true"}
+        )
+
+    @staticmethod
+    async def get_table(full_name):
+        return await DatabricksREST._request("GET", f"/api/2.1/unity-catalog/tables/{full_name}")
+
+    # ==========================================
+    # DBFS
+    # ==========================================
+
+    @staticmethod
+    def _dbfs_api_path(path):
+        """Converts 'dbfs:/mnt/x' to the '/mnt/x' form the DBFS API expects."""
+        if path.startswith("dbfs:"):
+            path = path[len("dbfs:"):]
+        return path or "/"
+
+    @staticmethod
+    async def dbfs_list(path):
+        data = await DatabricksREST._request(
+            "GET", "/api/2.0/dbfs/list",
+            params={"path": DatabricksREST._dbfs_api_path(path)}
+        )
+        if "error" in data:
+            return data
+        # Report paths in the same dbfs:/ form the CLI prints
+        files = []
+        for f in data.get("files", []):
+            f = dict(f)
+            f["path"] = f"dbfs:{f['path']}"
+            files.append(f)
+        return {"files": files}
+
+    @staticmethod
+    async def dbfs_get_status(path):
+        """Returns {'path', 'is_dir', 'file_size', ...} for a DBFS file or directory."""
+        return await DatabricksREST._request(
+            "GET", "/api/2.0/dbfs/get-status",
+            params={"path": DatabricksREST._dbfs_api_path(path)}
+        )
+
+    @staticmethod
+    async def dbfs_read(path, offset, length):
+        """Reads up to `length` bytes (the API caps this at 1 MB) starting at `offset`.
+
+        Returns:
+            {'bytes_read': int, 'data': bytes} or {'error': ...}
+        """
+        data = await DatabricksREST._request(
+            "GET", "/api/2.0/dbfs/read",
+            params={"path": DatabricksREST._dbfs_api_path(path), "offset": offset, "length": length}
+        )
+        if "error" in data:
+            return data
+        return {"bytes_read": data.get("bytes_read", 0), "data": base64.b64decode(data.get("data", ""))}
+
+    # ==========================================
+    # Workspace
+    # ==========================================
+
+    @staticmethod
+    async def workspace_list(path):
+        return await DatabricksREST._request("GET", "/api/2.0/workspace/list", params={"path": path})
+
+    @staticmethod
+    async def workspace_mkdirs(path):
+        return await DatabricksREST._request("POST", "/api/2.0/workspace/mkdirs", json={"path": path})
+
+    @staticmethod
+    async def workspace_import(local_path, workspace_path, language="PYTHON"):
+        """Imports a local SOURCE-format file into the workspace, overwriting any existing one."""
+        with open(local_path, "rb") as f:
+            content = base64.b64encode(f.read()).decode("ascii")
+        return await DatabricksREST._request("POST", "/api/2.0/workspace/import", json={
+            "path": workspace_path,
+            "format": "SOURCE",
+            "language": language,
+            "content": content,
+            "overwrite": True
+        })
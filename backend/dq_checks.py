@@ -1,9 +1,28 @@
+import json
+import math
 import pandas as pd
 import numpy as np
+from profiler import ColumnProfiler
 from utils import get_logger
 
 logger = get_logger(__name__)
 
+PROFILE_MODES = ("exact", "approximate")
+
+# Metrics that are sketch-based estimates when profile_mode is 'approximate'
+APPROXIMATE_METRICS = ["distinct_count", "quartiles"]
+
+# 'exact' counts distinct row hashes, 'approximate' uses an HLL sketch over them,
+# 'key' counts repeated key values, 'none' skips the check
+DUPLICATE_MODES = ("exact", "approximate", "key", "none")
+
+# Spark's hash functions reject MAP columns and skip NULLs nested in arrays and structs,
+# so row hashes take these columns as JSON
+JSON_HASHED_TYPES = ["MAP", "ARRAY", "STRUCT"]
+
+# Bumped whenever row_hash_sql changes, so stored row-hash sketches are rebuilt
+ROW_HASH_VERSION = 2
+
 def convert_to_native_types(obj):
     """Convert numpy/pandas types to native Python types for JSON serialization."""
     if isinstance(obj, (np.integer, np.int64)):
@@ -18,25 +37,60 @@ def convert_to_native_types(obj):
         return [convert_to_native_types(item) for item in obj]
     return obj
 
+def _wilson_interval(count, n, z=1.96):
+    """Wilson score confidence interval for a proportion observed in a sample."""
+    if n <= 0:
+        return 0.0, 1.0
+    p = count / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+def _parse_array(value):
+    """Parses an ARRAY result value, which JSON_ARRAY results deliver as a JSON string."""
+    if value is None or isinstance(value, list):
+        return value
+    try:
+        return json.loads(value)
+    except (TypeError, ValueError):
+        return None
+
 class DQChecks:
     @staticmethod
     def analyze_dataframe(df: pd.DataFrame):
         """Runs comprehensive DQ checks on a pandas DataFrame."""
         logger.info("Starting DQ analysis...")
+        results = DQChecks.results_from_profile(ColumnProfiler.profile(df))
+        logger.info("DQ analysis complete.")
+        return results
+
+    @staticmethod
+    def results_from_profile(profile: dict) -> dict:
+        """
+        Turns raw column metrics (see ColumnProfiler.profile) into DQ results with issues and a score.
+        
+        Args:
+            profile: Metrics dict with native Python values
         
+        Returns:
+            Results dict in the shape analyze_dataframe has always returned
+        """
+        row_count = profile["row_count"]
         results = {
-            "row_count": int(len(df)),
-            "columns": list(df.columns),
-            "missing_values": {k: int(v) for k, v in df.isnull().sum().to_dict().items()},
-            "duplicates": int(df.duplicated().sum()),
-            "column_types": df.dtypes.astype(str).to_dict(),
-            "numeric_distribution": {},
+            "row_count": row_count,
+            "columns": profile["columns"],
+            "missing_values": profile["missing_values"],
+            "duplicates": profile["duplicates"],
+            "column_types": profile["column_types"],
+            "numeric_distribution": profile["numeric_distribution"],
+            "distinct_counts": profile.get("distinct_counts", {}),
             "issues": []
         }
         
         # Null Analysis
         for col, null_count in results["missing_values"].items():
-            null_ratio = null_count / len(df) if len(df) > 0 else 0
+            null_ratio = null_count / row_count if row_count > 0 else 0
             if null_ratio > 0.05:
                 results["issues"].append({
                     "type": "High Null Ratio",
@@ -45,8 +99,9 @@ class DQChecks:
                     "details": f"{null_ratio:.1%} of values are null."
                 })
 
-        # Duplicate Analysis
-        if results["duplicates"] > 0:
+        # Duplicate Analysis; estimated counts (see apply_duplicate_results) are gated on their error bound
+        duplicate_check = profile.get("duplicate_check")
+        if duplicate_check is None and results["duplicates"] > 0:
             results["issues"].append({
                 "type": "Duplicate Rows",
                 "column": "All",
@@ -54,17 +109,9 @@ class DQChecks:
                 "details": f"Found {results['duplicates']} duplicate rows."
             })
 
-        # Distribution Checks (Numeric)
-        numeric_cols = df.select_dtypes(include=[np.number]).columns
-        for col in numeric_cols:
-            desc = df[col].describe().to_dict()
-            # Convert to native types
-            desc = {k: float(v) if isinstance(v, (np.floating, np.float64)) else v for k, v in desc.items()}
-            results["numeric_distribution"][col] = desc
-            
-            # Simple anomaly detection (Z-score heuristic or similar could go here)
-            # For now, check for 0 variance
-            if desc.get("std", 0) == 0 and len(df) > 1:
+        # Distribution Checks (Numeric): flag constant columns
+        for col, desc in results["numeric_distribution"].items():
+            if desc.get("std") == 0 and row_count > 1:
                 results["issues"].append({
                     "type": "Zero Variance",
                     "column": col,
@@ -73,30 +120,51 @@ class DQChecks:
                 })
 
         # Timestamp Checks
-        time_cols = df.select_dtypes(include=['datetime', 'datetimetz']).columns
-        for col in time_cols:
-            if df[col].isnull().all():
-                continue
-            
-            # Check for future dates (sanity check)
-            if (df[col] > pd.Timestamp.now()).any():
-                results["issues"].append({
-                    "type": "Future Dates Detected",
-                    "column": col,
-                    "severity": "Medium",
-                    "details": "Contains dates in the future."
-                })
+        for col in profile.get("future_date_columns", []):
+            results["issues"].append({
+                "type": "Future Dates Detected",
+                "column": col,
+                "severity": "Medium",
+                "details": "Contains dates in the future."
+            })
+
+        # Cardinality check (potential unique ID detection), as in the push-down path
+        for col, distinct in results["distinct_counts"].items():
+            if row_count > 100 and distinct / row_count > 0.99:
+                results.setdefault("potential_keys", []).append(col)
+
+        if duplicate_check is not None:
+            return DQChecks.apply_duplicate_results(results, duplicate_check)
 
         score = 100 - (len(results["issues"]) * 5)
         results["dq_score"] = max(0, score)
         
-        logger.info("DQ analysis complete.")
+        return results
+
+    @staticmethod
+    def sample_clause(sampling: dict = None) -> str:
+        """
+        Builds a TABLESAMPLE clause for a sampled scan.
+        
+        Args:
+            sampling: None for a full scan, or a dict with 'method' ('percent' or 'rows'),
+                      'value' and an optional 'seed' for deterministic REPEATABLE sampling
+                      (ROWS is a LIMIT on Databricks, not a random sample, so it takes no seed)
         
-        # Convert all numpy types to native Python types
-        return convert_to_native_types(results)
+        Returns:
+            Clause to append after the table name (empty string for a full scan)
+        """
+        if not sampling:
+            return ""
+        if sampling["method"] != "percent":
+            return f" TABLESAMPLE ({sampling['value']} ROWS)"
+        clause = f" TABLESAMPLE ({sampling['value']} PERCENT)"
+        if sampling.get("seed") is not None:
+            clause += f" REPEATABLE ({int(sampling['seed'])})"
+        return clause
 
     @staticmethod
-    def generate_sql_analysis(table_name: str, columns: list) -> str:
+    def generate_sql_analysis(table_name: str, columns: list, profile_mode: str = "exact", relative_error: float = 0.05, sampling: dict = None) -> str:
         """
         Generates a SQL query to compute data quality metrics directly on Databricks.
         This enables analysis of billion-row tables without moving data.
@@ -104,11 +172,18 @@ class DQChecks:
         Args:
             table_name: Fully qualified table name (catalog.schema.table)
             columns: List of column dicts with 'name' and 'type_name' keys
+            profile_mode: 'exact' uses COUNT(DISTINCT); 'approximate' uses approx_count_distinct
+                          and also computes approx_percentile quartiles for numeric columns
+            relative_error: Target relative error for the approximate sketches
+            sampling: Optional TABLESAMPLE settings (see sample_clause) for a fast sampled scan
         
         Returns:
             SQL query string
         """
-        logger.info(f"Generating push-down SQL for {table_name} with {len(columns)} columns")
+        logger.info(f"Generating {profile_mode} push-down SQL for {table_name} with {len(columns)} columns")
+        approximate = profile_mode == "approximate"
+        # approx_percentile's accuracy parameter is the inverse of its relative error
+        percentile_accuracy = max(1, int(round(1 / relative_error)))
         
         select_parts = ["COUNT(*) as total_rows"]
         
@@ -122,23 +197,28 @@ class DQChecks:
             
             # Cardinality for string/categorical columns (skip for very wide types)
             if col_type in ["STRING", "INT", "LONG", "SHORT", "BYTE"]:
-                select_parts.append(f"COUNT(DISTINCT `{col_name}`) as `{safe_name}_distinct`")
+                if approximate:
+                    select_parts.append(f"approx_count_distinct(`{col_name}`, {relative_error}) as `{safe_name}_distinct`")
+                else:
+                    select_parts.append(f"COUNT(DISTINCT `{col_name}`) as `{safe_name}_distinct`")
             
             # Min/Max/Avg for numeric columns
             if col_type in ["INT", "LONG", "SHORT", "BYTE", "FLOAT", "DOUBLE", "DECIMAL"]:
                 select_parts.append(f"MIN(`{col_name}`) as `{safe_name}_min`")
                 select_parts.append(f"MAX(`{col_name}`) as `{safe_name}_max`")
                 select_parts.append(f"AVG(`{col_name}`) as `{safe_name}_avg`")
+                if approximate:
+                    select_parts.append(f"approx_percentile(`{col_name}`, array(0.25, 0.5, 0.75), {percentile_accuracy}) as `{safe_name}_quartiles`")
             
             # Future date check for timestamps
             if col_type in ["TIMESTAMP", "DATE"]:
                 select_parts.append(f"MAX(CASE WHEN `{col_name}` > current_timestamp() THEN 1 ELSE 0 END) as `{safe_name}_has_future`")
         
-        query = f"SELECT\n  " + ",\n  ".join(select_parts) + f"\nFROM {table_name}"
+        query = f"SELECT\n  " + ",\n  ".join(select_parts) + f"\nFROM {table_name}{DQChecks.sample_clause(sampling)}"
         return query
 
     @staticmethod
-    def parse_sql_results(sql_result: dict, columns: list, table_name: str) -> dict:
+    def parse_sql_results(sql_result: dict, columns: list, table_name: str, profile_mode: str = "exact", relative_error: float = None, sampling: dict = None) -> dict:
         """
         Parses the SQL aggregation results into the standard DQ results format.
         
@@ -146,6 +226,10 @@ class DQChecks:
             sql_result: Result from DatabricksCLI.run_sql() with 'data_array' and 'manifest'
             columns: Original column metadata list
             table_name: Source table name
+            profile_mode: Mode the query was generated with, recorded in the results
+            relative_error: Relative error used for approximate metrics
+            sampling: TABLESAMPLE settings the query ran with; null ratios are then
+                      judged against 95% confidence intervals instead of point estimates
         
         Returns:
             dict: Same structure as analyze_dataframe() returns
@@ -175,19 +259,36 @@ class DQChecks:
             "columns": [c["name"] for c in columns],
             "column_types": {c["name"]: c.get("type_name", "UNKNOWN") for c in columns},
             "missing_values": {},
-            "duplicates": 0,  # Can't easily detect exact duplicates via aggregation
+            "duplicates": 0,  # Filled in by the separate duplicate statement (see generate_duplicate_sql)
             "numeric_distribution": {},
             "issues": [],
             "source": table_name,
             "source_type": "table",
-            "analysis_method": "push_down_sql"  # Flag to indicate this was server-side analysis
+            "analysis_method": "push_down_sql",  # Flag to indicate this was server-side analysis
+            "profile_mode": profile_mode,
+            "estimated_metrics": list(APPROXIMATE_METRICS) if profile_mode == "approximate" else []
         }
+        if profile_mode == "approximate":
+            results["relative_error"] = relative_error
+        # Columns whose batch could not be profiled (see QueryPlanner) are reported, not scored
+        failed_columns = {f["column"]: f["error"] for f in sql_result.get("failed_columns", [])}
+        if failed_columns:
+            results["skipped_columns"] = [{"column": name, "error": error} for name, error in failed_columns.items()]
+        if sampling and sampling["method"] == "percent":
+            results["sampling"] = {**sampling, "sampled_rows": total_rows, "random": True, "confidence_level": 0.95}
+            if sampling["value"] > 0:
+                results["sampling"]["estimated_total_rows"] = int(round(total_rows * 100 / sampling["value"]))
+        elif sampling:
+            # TABLESAMPLE ROWS reads the first rows of the first files, so confidence bounds would not hold
+            results["sampling"] = {**sampling, "seed": None, "sampled_rows": total_rows, "random": False}
         
         # Process each column's metrics
         for col in columns:
             col_name = col["name"]
             col_type = col.get("type_name", "STRING").upper()
             safe_name = col_name.replace(" ", "_").replace("-", "_")
+            if col_name in failed_columns:
+                continue
             
             # Calculate nulls from non_null count
             non_null = int(metrics.get(f"{safe_name}_non_null", 0) or 0)
@@ -197,7 +298,14 @@ class DQChecks:
             # Check for high null ratio
             if total_rows > 0:
                 null_ratio = null_count / total_rows
-                if null_ratio > 0.05:
+                if sampling:
+                    if sampling["method"] == "percent":
+                        issue = DQChecks._sampled_null_issue(col_name, null_count, total_rows)
+                    else:
+                        issue = DQChecks._head_sample_null_issue(col_name, null_count, total_rows)
+                    if issue:
+                        results["issues"].append(issue)
+                elif null_ratio > 0.05:
                     results["issues"].append({
                         "type": "High Null Ratio",
                         "column": col_name,
@@ -219,6 +327,12 @@ class DQChecks:
                         "count": non_null
                     }
                     
+                    # Approximate quartiles, keyed like pandas describe()
+                    quartiles = _parse_array(metrics.get(f"{safe_name}_quartiles"))
+                    if quartiles and len(quartiles) == 3:
+                        for label, value in zip(["25%", "50%", "75%"], quartiles):
+                            results["numeric_distribution"][col_name][label] = float(value) if value is not None else None
+                    
                     # Check for zero variance (constant value)
                     # Only flag if: value is non-zero (0-0 is common for sparse data) AND enough data exists
                     try:
@@ -247,6 +361,8 @@ class DQChecks:
             
             # Cardinality check (potential unique ID detection)
             distinct = metrics.get(f"{safe_name}_distinct")
+            if distinct is not None:
+                results.setdefault("distinct_counts", {})[col_name] = int(distinct)
             if distinct is not None and total_rows > 0:
                 cardinality_ratio = int(distinct) / total_rows
                 if cardinality_ratio > 0.99 and total_rows > 100:
@@ -260,3 +376,181 @@ class DQChecks:
         logger.info(f"Push-down analysis complete: {total_rows:,} rows, {len(results['issues'])} issues, score={results['dq_score']}")
         
         return results
+
+    @staticmethod
+    def _sampled_null_issue(col_name: str, null_count: int, sampled_rows: int):
+        """
+        Evaluates the null ratio threshold against a 95% Wilson interval from a sampled scan.
+        
+        Only a lower bound above the threshold is reported as a confirmed issue; an interval
+        that straddles it is reported as Low severity so the user can upgrade to a full scan.
+        """
+        null_ratio = null_count / sampled_rows
+        low, high = _wilson_interval(null_count, sampled_rows)
+        interval = f"95% CI {low:.1%}-{high:.1%}"
+        
+        if low > 0.05:
+            return {
+                "type": "High Null Ratio",
+                "column": col_name,
+                "severity": "High" if low > 0.2 else "Medium",
+                "details": f"{null_ratio:.1%} of sampled values are null ({interval}, {null_count:,} of {sampled_rows:,} sampled rows).",
+                "confidence_interval": [low, high]
+            }
+        if null_ratio > 0.05:
+            return {
+                "type": "High Null Ratio",
+                "column": col_name,
+                "severity": "Low",
+                "details": f"{null_ratio:.1%} of sampled values are null ({interval}); inconclusive at this sample size, run a full scan to confirm.",
+                "confidence_interval": [low, high]
+            }
+        return None
+
+    @staticmethod
+    def _head_sample_null_issue(col_name: str, null_count: int, sampled_rows: int):
+        """
+        Evaluates the null ratio threshold on a TABLESAMPLE ROWS (head) sample.
+        
+        The rows are not a random sample, so no interval is computed and a ratio over the
+        threshold is only reported as Low severity until a full or percent-sampled scan confirms it.
+        """
+        null_ratio = null_count / sampled_rows
+        if null_ratio <= 0.05:
+            return None
+        return {
+            "type": "High Null Ratio",
+            "column": col_name,
+            "severity": "Low",
+            "details": f"{null_ratio:.1%} of the first {sampled_rows:,} rows are null; a head sample is not random, "
+                       f"run a full or percent-sampled scan to confirm.",
+            "head_sample": True
+        }
+
+    @staticmethod
+    def row_hash_sql(columns: list) -> str:
+        """
+        64-bit hash of whole rows that tells NULLs apart by position.
+
+        xxhash64 skips NULL arguments, so (NULL, 'a') and ('a', NULL) would hash alike;
+        each column is followed by its IS NULL flag, which is never NULL itself.
+        """
+        parts = []
+        for c in columns:
+            name = f"`{c['name']}`"
+            value = f"to_json({name})" if c.get("type_name", "STRING").upper() in JSON_HASHED_TYPES else name
+            parts.append(f"{value}, {name} IS NULL")
+        return f"xxhash64({', '.join(parts)})"
+
+    @staticmethod
+    def duplicate_error_bound(total_rows: int, relative_error: float) -> int:
+        """Rows an HLL duplicate estimate (total rows minus estimated distinct rows) can be off by."""
+        return int(math.ceil(relative_error * total_rows))
+
+    @staticmethod
+    def generate_duplicate_sql(table_name: str, columns: list, mode: str = "exact", key_columns: list = None,
+                               relative_error: float = 0.05, sampling: dict = None) -> str:
+        """
+        Generates a standalone SQL statement that counts duplicate rows on Databricks.
+        
+        Runs separately from the main profile query so it can be scheduled independently.
+        
+        Args:
+            table_name: Fully qualified table name
+            columns: Column metadata list
+            mode: 'exact' (COUNT(DISTINCT row_hash_sql(all columns))), 'approximate'
+                  (approx_count_distinct over the same row hash) or 'key' (repeated key values)
+            key_columns: Key column names for 'key' mode
+            relative_error: Relative error for 'approximate' mode
+            sampling: Optional TABLESAMPLE settings (see sample_clause)
+        
+        Returns:
+            SQL query string producing total_rows and distinct_rows
+        """
+        if mode == "key":
+            if not key_columns:
+                raise ValueError("key_columns are required for key-based duplicate detection")
+            # struct() keeps rows with NULL key parts, which COUNT(DISTINCT a, b) would drop
+            keys = ", ".join(f"`{name}`" for name in key_columns)
+            distinct_expr = f"COUNT(DISTINCT struct({keys}))"
+        else:
+            row_hash = DQChecks.row_hash_sql(columns)
+            if mode == "approximate":
+                distinct_expr = f"approx_count_distinct({row_hash}, {relative_error})"
+            else:
+                distinct_expr = f"COUNT(DISTINCT {row_hash})"
+        
+        logger.info(f"Generating {mode} duplicate-check SQL for {table_name}")
+        return (f"SELECT\n  COUNT(*) as total_rows,\n  {distinct_expr} as distinct_rows"
+                f"\nFROM {table_name}{DQChecks.sample_clause(sampling)}")
+
+    @staticmethod
+    def parse_duplicate_results(sql_result: dict, mode: str, key_columns: list = None, relative_error: float = 0.05) -> dict:
+        """
+        Parses the duplicate-check statement result.
+        
+        Returns:
+            dict with 'duplicates', 'mode', 'key_columns', 'estimated', 'total_rows' and,
+            for estimates, 'error_bound'; or {'error': ...}
+        """
+        data_array = sql_result.get("data_array", [])
+        if not data_array:
+            return {"error": "Empty duplicate-check results", "mode": mode}
+        
+        total_rows = int(data_array[0][0] or 0)
+        distinct_rows = int(data_array[0][1] or 0)
+        duplicate_check = {
+            # approx_count_distinct can overshoot the row count slightly
+            "duplicates": max(0, total_rows - distinct_rows),
+            "mode": mode,
+            "key_columns": key_columns or [],
+            "estimated": mode == "approximate",
+            "total_rows": total_rows
+        }
+        if mode == "approximate":
+            duplicate_check["error_bound"] = DQChecks.duplicate_error_bound(total_rows, relative_error)
+        return duplicate_check
+
+    @staticmethod
+    def apply_duplicate_results(results: dict, duplicate_check: dict) -> dict:
+        """Merges a duplicate-check outcome into push-down results and rescores them.
+
+        An estimate (HLL, or a streamed Bloom filter) no larger than its error bound
+        is sketch noise as much as duplicates, so it is reported as an inconclusive
+        Low issue (and marked 'inconclusive' in the duplicate check) rather than a
+        High one.
+        """
+        results["duplicate_check"] = duplicate_check
+        if "error" in duplicate_check:
+            return results
+        
+        duplicates = duplicate_check["duplicates"]
+        results["duplicates"] = duplicates
+        if duplicates > 0:
+            severity = "High"
+            if duplicate_check["mode"] == "key":
+                details = f"Found {duplicates:,} rows repeating key ({', '.join(duplicate_check['key_columns'])})."
+            elif duplicate_check["estimated"]:
+                bound = duplicate_check.get("error_bound", 0)
+                method = duplicate_check.get("method", "HyperLogLog")
+                details = f"Found approximately {duplicates:,} duplicate rows ({method} estimate, ±{bound:,} rows)."
+                if duplicate_check.get("switched_from_exact"):
+                    details += f" Exact up to {duplicate_check['exact_max_rows']:,} rows, estimated beyond."
+                if duplicates <= bound:
+                    severity = "Low"
+                    duplicate_check["inconclusive"] = True
+                    details += " Inconclusive: within the estimate's error bound, run an exact duplicate check to confirm."
+            else:
+                details = f"Found {duplicates:,} duplicate rows."
+            if results.get("sampling"):
+                details += " Counted within the sampled rows."
+            results["issues"].append({
+                "type": "Duplicate Rows",
+                "column": "All" if duplicate_check["mode"] != "key" else ", ".join(duplicate_check["key_columns"]),
+                "severity": severity,
+                "details": details
+            })
+        
+        score = 100 - (len(results["issues"]) * 5)
+        results["dq_score"] = max(0, score)
+        return results
@@ -0,0 +1,178 @@
+import asyncio
+import random
+from contextlib import asynccontextmanager
+import httpx
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+# Status codes Databricks returns when a request should simply be tried again later
+RETRY_STATUS_CODES = (429, 503)
+
+# A 503 may come back after a POST was already acted on (e.g. a statement submitted), so
+# non-idempotent requests are only retried when the server certainly rejected them
+NON_IDEMPOTENT_RETRY_STATUS_CODES = (429,)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+# Errors raised before the request reached the server, so any method can be sent again
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _retry_statuses(method):
+    return RETRY_STATUS_CODES if method.upper() in IDEMPOTENT_METHODS else NON_IDEMPOTENT_RETRY_STATUS_CODES
+
+
+class DatabricksHTTP:
+    """Shared, connection-pooled async HTTP client for all Databricks REST traffic.
+
+    A single httpx.AsyncClient keeps TLS connections to the workspace alive across
+    the initial statement POST, every poll, and the serving-endpoint calls, instead
+    of paying a fresh handshake per request.
+    """
+
+    _client = None
+    _download_client = None
+
+    @staticmethod
+    def get_client():
+        """Returns the shared client, creating it on first use."""
+        if DatabricksHTTP._client is None or DatabricksHTTP._client.is_closed:
+            pool_size = config["http_pool_size"]
+            DatabricksHTTP._client = httpx.AsyncClient(
+                base_url=config["host"] or "",
+                headers={
+                    "Authorization": f"Bearer {config['token']}",
+                    "Content-Type": "application/json"
+                },
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                    keepalive_expiry=config["http_keepalive_seconds"]
+                ),
+                timeout=config["http_timeout_seconds"]
+            )
+            logger.info(f"Created Databricks HTTP pool (size={pool_size})")
+        return DatabricksHTTP._client
+
+    @staticmethod
+    def get_download_client():
+        """Returns the client for pre-signed result links, which must not be sent the workspace token."""
+        if DatabricksHTTP._download_client is None or DatabricksHTTP._download_client.is_closed:
+            pool_size = config["http_pool_size"]
+            DatabricksHTTP._download_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                    keepalive_expiry=config["http_keepalive_seconds"]
+                ),
+                timeout=config["http_timeout_seconds"]
+            )
+        return DatabricksHTTP._download_client
+
+    @staticmethod
+    async def request(method, path, max_retries=None, max_retry_delay=None, **kwargs):
+        """Sends a request through the shared pool, retrying throttled requests with exponential backoff.
+
+        Idempotent methods are retried on 429/503; POST/PATCH only on 429, since a 503 does not
+        prove the server ignored the request. Connection failures are retried for every method.
+
+        Args:
+            method: HTTP method
+            path: Path relative to DATABRICKS_HOST (e.g. /api/2.0/sql/statements)
+            max_retries: Overrides DATABRICKS_HTTP_MAX_RETRIES for this call
+            max_retry_delay: Caps the wait before a retry below DATABRICKS_HTTP_MAX_RETRY_DELAY_SECONDS
+                             (e.g. to the time left before a deadline)
+            **kwargs: Passed through to httpx (json, params, timeout, ...)
+
+        Returns:
+            httpx.Response (the last one received if retries were exhausted)
+        """
+        return await DatabricksHTTP._send(DatabricksHTTP.get_client(), method, path, max_retries, max_retry_delay, **kwargs)
+
+    @staticmethod
+    @asynccontextmanager
+    async def stream(method, path, max_retries=None, **kwargs):
+        """Like request(), but yields the response before its body is read so it can be consumed incrementally.
+
+        Usage:
+            async with DatabricksHTTP.stream("POST", path, json=payload) as response:
+                async for line in response.aiter_lines():
+                    ...
+        """
+        client = DatabricksHTTP.get_client()
+        retries = config["http_max_retries"] if max_retries is None else max_retries
+
+        attempt = 0
+        while True:
+            yielded = False
+            try:
+                async with client.stream(method, path, **kwargs) as response:
+                    if response.status_code not in _retry_statuses(method) or attempt >= retries:
+                        yielded = True
+                        yield response
+                        return
+                    delay = DatabricksHTTP._retry_delay(response, attempt)
+                    reason = response.status_code
+            except UNSENT_ERRORS as e:
+                # Errors raised by the caller while consuming the response are not ours to retry
+                if yielded or attempt >= retries:
+                    raise
+                delay, reason = DatabricksHTTP._retry_delay(None, attempt), type(e).__name__
+            logger.warning(f"{method} {path.split('?')[0]} failed ({reason}), retrying in {delay:.1f}s (attempt {attempt + 1}/{retries})")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    async def download(url, max_retries=None):
+        """GETs a pre-signed external link (e.g. a SQL result chunk) without the Authorization header."""
+        return await DatabricksHTTP._send(DatabricksHTTP.get_download_client(), "GET", url, max_retries)
+
+    @staticmethod
+    async def _send(client, method, path, max_retries=None, max_retry_delay=None, **kwargs):
+        retries = config["http_max_retries"] if max_retries is None else max_retries
+
+        attempt = 0
+        while True:
+            try:
+                response = await client.request(method, path, **kwargs)
+            except UNSENT_ERRORS as e:
+                if attempt >= retries:
+                    raise
+                delay = DatabricksHTTP._retry_delay(None, attempt, max_retry_delay)
+                logger.warning(f"{method} {path.split('?')[0]} could not be sent ({type(e).__name__}), retrying in {delay:.1f}s (attempt {attempt + 1}/{retries})")
+            else:
+                if response.status_code not in _retry_statuses(method) or attempt >= retries:
+                    return response
+                delay = DatabricksHTTP._retry_delay(response, attempt, max_retry_delay)
+                logger.warning(f"{method} {path.split('?')[0]} returned {response.status_code}, retrying in {delay:.1f}s (attempt {attempt + 1}/{retries})")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _retry_delay(response, attempt, max_delay=None):
+        """Honours Retry-After when present, otherwise exponential backoff with jitter.
+
+        Either is capped at DATABRICKS_HTTP_MAX_RETRY_DELAY_SECONDS (and max_delay if given), so a
+        bad or hostile Retry-After cannot stall a caller, or every LLM request behind a shared pause.
+        """
+        limit = config["http_max_retry_delay_seconds"]
+        if max_delay is not None:
+            limit = min(limit, max_delay)
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(max(0.0, float(retry_after)), max(0.0, limit))
+            except ValueError:
+                pass
+        backoff = config["http_backoff_seconds"] * (2 ** attempt)
+        return min(backoff + random.uniform(0, backoff / 2), max(0.0, limit))
+
+    @staticmethod
+    async def close():
+        if DatabricksHTTP._client is not None:
+            await DatabricksHTTP._client.aclose()
+            DatabricksHTTP._client = None
+        if DatabricksHTTP._download_client is not None:
+            await DatabricksHTTP._download_client.aclose()
+            DatabricksHTTP._download_client = None
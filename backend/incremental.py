@@ -0,0 +1,354 @@
+import json
+import math
+import os
+import re
+from datetime import datetime
+import pandas as pd
+from dbx_cli import DatabricksCLI
+from dq_checks import DQChecks, ROW_HASH_VERSION
+from query_planner import DISTINCT_TYPES, NUMERIC_TYPES, TIME_TYPES
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+# Change Data Feed rows that rewrite existing data; min/max/sketches cannot absorb these
+NON_APPEND_CHANGE_TYPES = ("delete", "update_preimage", "update_postimage")
+
+INTEGER_TYPES = ["INT", "LONG", "SHORT", "BYTE"]
+
+
+def _safe_name(col_name):
+    return col_name.replace(" ", "_").replace("-", "_")
+
+
+def _timestamp(value):
+    """Parses a warehouse timestamp/date, treating naive values as UTC so they compare safely."""
+    ts = pd.Timestamp(value)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts
+
+
+def _lg_config_k(relative_error):
+    """HLL register count (log2) giving roughly the requested relative standard error."""
+    k = math.ceil(math.log2((1.04 / relative_error) ** 2))
+    return min(21, max(4, k))
+
+
+class ProfileStateStore:
+    """Persists the mergeable profile of each table between incremental scans (one JSON file per table)."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or config["profile_state_dir"]
+
+    def _path(self, table_name):
+        filename = re.sub(r"[^A-Za-z0-9_.-]", "_", table_name)
+        return os.path.join(self.directory, f"{filename}.json")
+
+    def load(self, table_name):
+        path = self._path(table_name)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable profile state for {table_name}: {e}")
+            return None
+
+    def save(self, state):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(state["table"])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+
+class IncrementalProfiler:
+    """Profiles only the Delta versions added since the last scan and merges them into the stored profile.
+
+    The stored profile keeps only mergeable aggregates: row and non-null counts,
+    min/max, sums (for averages), the latest timestamp per time column, and HLL
+    sketches for distinct counts and duplicate rows. New rows come from
+    table_changes() (Change Data Feed); if the table has no CDF, the stored
+    profile is for a different schema, or the new versions contain updates or
+    deletes, the table is re-profiled in full at its current version.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or ProfileStateStore()
+
+    async def run(self, table_name, columns, relative_error=0.05, duplicates=True, on_progress=None):
+        """
+        Brings the stored profile of a Delta table up to date and returns it.
+
+        Args:
+            table_name: Fully qualified table name
+            columns: Column metadata from get_table_info
+            relative_error: Target relative error for the HLL sketches
+            duplicates: Whether to maintain the row-hash sketch for duplicate detection
+            on_progress: Optional callback(stage_text)
+
+        Returns:
+            Profile state dict (see _new_state), or {'error': ...}
+        """
+        progress = on_progress or (lambda stage: None)
+
+        progress("Reading Delta table version")
+        version = await self._current_version(table_name)
+        if isinstance(version, dict):
+            return version
+
+        state = self.store.load(table_name)
+        signature = [[c["name"], c.get("type_name", "STRING").upper()] for c in columns]
+        if state and (state.get("columns") != signature or state.get("relative_error") != relative_error
+                      or state.get("duplicates") != duplicates
+                      or (duplicates and state.get("row_hash_version") != ROW_HASH_VERSION)):
+            logger.info(f"Stored profile for {table_name} no longer matches the requested profile; rebuilding")
+            state = None
+
+        if state and state["version"] == version:
+            logger.info(f"{table_name} unchanged since version {version}; reusing stored profile")
+            state["mode"] = "unchanged"
+            state["rows_added"] = 0
+            return state
+
+        if state and state["version"] < version:
+            progress(f"Profiling changes in versions {state['version'] + 1}-{version}")
+            merged = await self._profile_changes(table_name, columns, state, version)
+            if merged is not None:
+                self.store.save(merged)
+                return merged
+
+        progress(f"Profiling full table at version {version}")
+        state = await self._profile_full(table_name, columns, version, relative_error, duplicates)
+        if "error" not in state:
+            self.store.save(state)
+        return state
+
+    async def _current_version(self, table_name):
+        # Always read afresh: a cached version could hide the newest commits
+        result = await DatabricksCLI.table_version(table_name, use_cache=False)
+        if "error" in result:
+            return result
+        return result["version"]
+
+    async def _profile_full(self, table_name, columns, version, relative_error, duplicates):
+        state = IncrementalProfiler._new_state(table_name, columns, version, relative_error, duplicates)
+        sql = IncrementalProfiler.generate_mergeable_sql(
+            f"{table_name} VERSION AS OF {version}", columns, state
+        )
+        result = await DatabricksCLI.run_sql(sql)
+        if "error" in result:
+            return result
+        metrics = IncrementalProfiler._row_metrics(result)
+        state["metrics"] = IncrementalProfiler._merge_metrics(state, None, metrics)
+        state["mode"] = "full"
+        state["rows_added"] = state["metrics"].get("total_rows", 0)
+        return state
+
+    async def _profile_changes(self, table_name, columns, state, version):
+        """Profiles inserted rows since state['version']; returns None if a full rescan is needed."""
+        start = state["version"] + 1
+        sql = IncrementalProfiler.generate_mergeable_sql(
+            f"table_changes('{table_name}', {start}, {version})", columns, state, changes_only=True
+        )
+        result = await DatabricksCLI.run_sql(sql)
+        if "error" in result:
+            logger.warning(f"Could not read Change Data Feed for {table_name} ({result['error']}); profiling in full")
+            return None
+
+        metrics = IncrementalProfiler._row_metrics(result)
+        if int(metrics.pop("non_append_changes", 0) or 0) > 0:
+            logger.info(f"{table_name} has updates/deletes in versions {start}-{version}; profiling in full")
+            return None
+
+        merged = dict(state)
+        merged["metrics"] = IncrementalProfiler._merge_metrics(state, state["metrics"], metrics)
+        merged["previous_version"] = state["version"]
+        merged["version"] = version
+        merged["mode"] = "incremental"
+        merged["rows_added"] = int(metrics.get("total_rows", 0) or 0)
+        merged["updated_at"] = datetime.now().isoformat()
+        logger.info(f"Merged {merged['rows_added']:,} new rows of {table_name} (versions {start}-{version})")
+        return merged
+
+    @staticmethod
+    def _new_state(table_name, columns, version, relative_error, duplicates):
+        return {
+            "table": table_name,
+            "version": version,
+            "columns": [[c["name"], c.get("type_name", "STRING").upper()] for c in columns],
+            "relative_error": relative_error,
+            "lg_config_k": _lg_config_k(relative_error),
+            "duplicates": duplicates,
+            "row_hash_version": ROW_HASH_VERSION,
+            "metrics": {},
+            "updated_at": datetime.now().isoformat()
+        }
+
+    @staticmethod
+    def generate_mergeable_sql(source, columns, state, changes_only=False):
+        """
+        Generates the aggregate query for mergeable metrics.
+
+        HLL sketches are unioned with the stored ones inside the query, so the
+        returned *_hll values and *_distinct estimates already cover all versions.
+
+        Args:
+            source: FROM target (a time-travel table reference or a table_changes() call)
+            columns: Column metadata list
+            state: Current profile state (supplies lgConfigK and previous sketches)
+            changes_only: True when reading table_changes(); only inserts are aggregated
+                          and non-append changes are counted so the caller can bail out
+        """
+        previous = state.get("metrics", {})
+        k = state["lg_config_k"]
+        insert_filter = " FILTER (WHERE _change_type = 'insert')" if changes_only else ""
+
+        def sketch(expr, name):
+            agg = f"hll_sketch_agg({expr}, {k}){insert_filter}"
+            if previous.get(name):
+                agg = f"hll_union({agg}, unbase64('{previous[name]}'), true)"
+            return agg
+
+        select_parts = [f"COUNT(*){insert_filter} as total_rows"]
+        if changes_only:
+            types = ", ".join(f"'{t}'" for t in NON_APPEND_CHANGE_TYPES)
+            select_parts.append(f"COUNT_IF(_change_type IN ({types})) as non_append_changes")
+
+        for col in columns:
+            col_name = col["name"]
+            col_type = col.get("type_name", "STRING").upper()
+            safe_name = _safe_name(col_name)
+
+            select_parts.append(f"COUNT(`{col_name}`){insert_filter} as `{safe_name}_non_null`")
+
+            if col_type in DISTINCT_TYPES:
+                expr = f"CAST(`{col_name}` AS BIGINT)" if col_type in INTEGER_TYPES else f"`{col_name}`"
+                union = sketch(expr, f"{safe_name}_hll")
+                select_parts.append(f"base64({union}) as `{safe_name}_hll`")
+                select_parts.append(f"hll_sketch_estimate({union}) as `{safe_name}_distinct`")
+
+            if col_type in NUMERIC_TYPES:
+                select_parts.append(f"MIN(`{col_name}`){insert_filter} as `{safe_name}_min`")
+                select_parts.append(f"MAX(`{col_name}`){insert_filter} as `{safe_name}_max`")
+                select_parts.append(f"SUM(CAST(`{col_name}` AS DOUBLE)){insert_filter} as `{safe_name}_sum`")
+
+            if col_type in TIME_TYPES:
+                select_parts.append(f"MAX(`{col_name}`){insert_filter} as `{safe_name}_latest`")
+
+        if state.get("duplicates"):
+            union = sketch(DQChecks.row_hash_sql(columns), "row_hll")
+            select_parts.append(f"base64({union}) as row_hll")
+            select_parts.append(f"hll_sketch_estimate({union}) as distinct_rows")
+
+        return "SELECT\n  " + ",\n  ".join(select_parts) + f"\nFROM {source}"
+
+    @staticmethod
+    def _row_metrics(sql_result):
+        manifest_cols = sql_result.get("manifest", {}).get("schema", {}).get("columns", [])
+        data_array = sql_result.get("data_array", [])
+        row = data_array[0] if data_array else []
+        return {col["name"]: (row[i] if i < len(row) else None) for i, col in enumerate(manifest_cols)}
+
+    @staticmethod
+    def _merge_metrics(state, previous, new):
+        """Combines stored aggregates with those of the newly profiled rows."""
+        if previous is None:
+            previous = {}
+        merged = {}
+
+        def number(value):
+            return float(value) if value is not None else None
+
+        for name, value in new.items():
+            old = previous.get(name)
+            if name.endswith("_hll") or name in ("distinct_rows",) or name.endswith("_distinct"):
+                # Already unioned with the stored sketch inside the query
+                merged[name] = value
+            elif name == "total_rows" or name.endswith("_non_null"):
+                merged[name] = int(old or 0) + int(value or 0)
+            elif name.endswith("_sum"):
+                parts = [v for v in (number(old), number(value)) if v is not None]
+                merged[name] = sum(parts) if parts else None
+            elif name.endswith("_min"):
+                parts = [v for v in (number(old), number(value)) if v is not None]
+                merged[name] = min(parts) if parts else None
+            elif name.endswith("_max"):
+                parts = [v for v in (number(old), number(value)) if v is not None]
+                merged[name] = max(parts) if parts else None
+            elif name.endswith("_latest"):
+                parts = [_timestamp(v) for v in (old, value) if v is not None]
+                merged[name] = max(parts).isoformat() if parts else None
+            else:
+                merged[name] = value
+        return merged
+
+    @staticmethod
+    def to_sql_result(state, columns):
+        """
+        Renders the stored aggregates in the run_sql() shape parse_sql_results expects,
+        deriving averages from sums and the future-date flag from the latest timestamp.
+        """
+        metrics = state["metrics"]
+        now = pd.Timestamp.now(tz="UTC")
+        values = {"total_rows": metrics.get("total_rows", 0)}
+
+        for col in columns:
+            col_type = col.get("type_name", "STRING").upper()
+            safe_name = _safe_name(col["name"])
+            non_null = int(metrics.get(f"{safe_name}_non_null", 0) or 0)
+            values[f"{safe_name}_non_null"] = non_null
+            if col_type in DISTINCT_TYPES:
+                values[f"{safe_name}_distinct"] = metrics.get(f"{safe_name}_distinct")
+            if col_type in NUMERIC_TYPES:
+                values[f"{safe_name}_min"] = metrics.get(f"{safe_name}_min")
+                values[f"{safe_name}_max"] = metrics.get(f"{safe_name}_max")
+                total = metrics.get(f"{safe_name}_sum")
+                values[f"{safe_name}_avg"] = total / non_null if total is not None and non_null else None
+            if col_type in TIME_TYPES:
+                latest = metrics.get(f"{safe_name}_latest")
+                if latest is not None:
+                    values[f"{safe_name}_has_future"] = 1 if _timestamp(latest) > now else 0
+
+        return {
+            "manifest": {"schema": {"columns": [{"name": name} for name in values]}},
+            "data_array": [list(values.values())],
+            "row_count": 1
+        }
+
+    @staticmethod
+    def duplicate_check(state):
+        """Approximate duplicate count from the merged row-hash sketch, or None if not tracked."""
+        if not state.get("duplicates") or state["metrics"].get("distinct_rows") is None:
+            return None
+        total_rows = int(state["metrics"].get("total_rows", 0) or 0)
+        distinct_rows = int(state["metrics"]["distinct_rows"] or 0)
+        return {
+            "duplicates": max(0, total_rows - distinct_rows),
+            "mode": "approximate",
+            "key_columns": [],
+            "estimated": True,
+            "total_rows": total_rows,
+            "error_bound": DQChecks.duplicate_error_bound(total_rows, state["relative_error"])
+        }
+
+    @staticmethod
+    def apply_to_results(results, state):
+        """Annotates parsed push-down results with how the incremental profile was produced."""
+        # Distinct counts always come from the merged HLL sketches; quartiles are not mergeable
+        results["profile_mode"] = "approximate"
+        results["estimated_metrics"] = ["distinct_count"]
+        results["relative_error"] = state["relative_error"]
+        results["incremental"] = {
+            "mode": state["mode"],
+            "version": state["version"],
+            "previous_version": state.get("previous_version"),
+            "rows_added": state.get("rows_added", 0),
+            "updated_at": state["updated_at"]
+        }
+        duplicate_check = IncrementalProfiler.duplicate_check(state)
+        if duplicate_check is not None:
+            DQChecks.apply_duplicate_results(results, duplicate_check)
+        return results
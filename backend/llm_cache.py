@@ -0,0 +1,183 @@
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+# Parts of the DQ results the analysis depends on; row-level statistics and scan bookkeeping are left out
+ISSUE_FIELDS = ("source", "source_type", "columns", "column_types", "dq_score")
+
+
+class LLMCache:
+    """Content-addressed cache of LLM analyses with single-flight deduplication.
+
+    Responses are keyed by a canonical hash of the issue-relevant parts of the
+    DQ results plus the serving endpoint, so a scan whose issues match an
+    earlier one reuses its analysis. Entries expire after ttl_seconds, the
+    newest max_entries are kept in memory, and with a directory each entry is
+    also written there as JSON so it survives restarts. Concurrent identical
+    requests share one in-flight call instead of each paying for a round trip.
+    """
+
+    def __init__(self, ttl_seconds=86400, max_entries=1000, directory=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()  # key -> (created_at, value)
+        self._inflight = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.shared = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(dq_results, endpoint):
+        """Canonical hash of the issue-relevant parts of dq_results and the endpoint."""
+        canonical = {field: dq_results.get(field) for field in ISSUE_FIELDS}
+        canonical["issues"] = sorted(
+            (json.dumps(issue, sort_keys=True, default=str) for issue in dq_results.get("issues", []))
+        )
+        canonical["endpoint"] = endpoint
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    async def get_or_call(self, key, call):
+        """
+        Returns the cached response for key, or awaits call() once for all concurrent callers.
+
+        Args:
+            key: Cache key from LLMCache.key()
+            call: Async callable producing the response; only successful responses are cached
+
+        Returns:
+            The response (callers may modify it; the cached copy is not affected)
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+            logger.info(f"Joining in-flight LLM request {key[:12]}")
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        # Shielded so a cancelled caller does not cancel the request the others are waiting on
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def get(self, key):
+        """Returns a copy of a live cached response (memory, else disk), or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._read_disk(key)
+            if entry is None:
+                return None
+            self._store(key, *entry)
+            self.disk_hits += 1
+        elif entry[0] + self.ttl_seconds < time.time():
+            del self._entries[key]
+            return None
+        else:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        logger.info(f"Reusing cached LLM analysis {key[:12]}")
+        return copy.deepcopy(entry[1])
+
+    def set(self, key, value):
+        created_at = time.time()
+        self._store(key, created_at, copy.deepcopy(value))
+        self._write_disk(key, created_at, value)
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.shared + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "disk_dir": self.directory,
+            "in_flight": len(self._inflight),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "shared": self.shared,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits + self.disk_hits + self.shared) / lookups, 4) if lookups else 0.0
+        }
+
+    def _finish(self, key, task):
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.set(key, task.result())
+
+    def _store(self, key, created_at, value):
+        self._entries[key] = (created_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), "r") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable LLM cache entry {key[:12]}: {e}")
+            return None
+        if entry["created_at"] + self.ttl_seconds < time.time():
+            self._unlink(self._path(key))
+            return None
+        return entry["created_at"], entry["value"]
+
+    def _write_disk(self, key, created_at, value):
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"created_at": created_at, "value": value}, f, default=str)
+            os.replace(tmp_path, path)
+            self._trim_disk()
+        except OSError as e:
+            logger.warning(f"Could not write LLM cache entry {key[:12]}: {e}")
+
+    def _trim_disk(self):
+        """Removes expired files, then the oldest beyond max_entries."""
+        files = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".json"):
+                path = os.path.join(self.directory, filename)
+                files.append((os.path.getmtime(path), path))
+        files.sort(reverse=True)
+        cutoff = time.time() - self.ttl_seconds
+        for index, (mtime, path) in enumerate(files):
+            if index >= self.max_entries or mtime < cutoff:
+                self._unlink(path)
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+llm_cache = LLMCache(
+    ttl_seconds=config["llm_cache_ttl_seconds"],
+    max_entries=config["llm_cache_max_entries"],
+    directory=config["llm_cache_dir"] or None
+)
@@ -0,0 +1,97 @@
+import copy
+import time
+from collections import OrderedDict
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+
+class MetadataCache:
+    """Bounded TTL + LRU cache for Unity Catalog metadata lookups.
+
+    Entries are keyed by (kind, full_name), e.g. ("tables", "main.sales") for a
+    table listing or ("table", "main.sales.orders") for a table's details, so a
+    whole subtree can be invalidated by name prefix.
+    """
+
+    def __init__(self, max_entries=2048, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, kind, full_name=""):
+        """Returns a copy of the cached value, or None if missing or expired."""
+        key = (kind, full_name)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        # Callers may annotate what they get back, so never hand out the cached object itself
+        return copy.deepcopy(value)
+
+    def set(self, kind, full_name, value, ttl_seconds=None):
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        key = (kind, full_name)
+        self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, full_name=None):
+        """Drops entries for a name and everything beneath it, or the whole cache.
+
+        Args:
+            full_name: Catalog, schema or table name (e.g. 'main' or 'main.sales.orders').
+                       None clears every entry.
+
+        Returns:
+            Number of entries removed
+        """
+        if not full_name:
+            removed = len(self._entries)
+            self._entries.clear()
+        else:
+            prefix = f"{full_name}."
+            keys = [
+                key for key in self._entries
+                if key[1] == full_name or key[1].startswith(prefix)
+            ]
+            for key in keys:
+                del self._entries[key]
+            removed = len(keys)
+        logger.info(f"Invalidated {removed} metadata cache entries ({full_name or 'all'})")
+        return removed
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+metadata_cache = MetadataCache(
+    max_entries=config["metadata_cache_max_entries"],
+    ttl_seconds=config["metadata_cache_ttl_seconds"]
+)
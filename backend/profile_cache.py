@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, default=str).encode("utf-8"), 1)
+
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def _safe_name(table_name):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", table_name)
+
+
+class ProfileCache:
+    """Size-bounded LRU cache of finished push-down scan results, with an optional disk tier.
+
+    Entries are keyed by the table, its Delta version and every setting that
+    changes the profile (mode, relative error, sampling, duplicate detection,
+    column set), so a new table version simply never matches older entries;
+    those are dropped as soon as the new version is cached. Values are kept
+    compressed, and max_bytes bounds their total size. With a disk directory,
+    entries are also written there and survive restarts (bounded by
+    disk_max_bytes, oldest files removed first).
+    """
+
+    def __init__(self, max_bytes=64 << 20, ttl_seconds=86400, directory=None, disk_max_bytes=1 << 30):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()  # key -> (created_at, packed value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(table_name, version, settings, columns):
+        """
+        Builds the cache key of a table profile.
+
+        Args:
+            table_name: Fully qualified table name
+            version: Delta version the profile was computed at
+            settings: dict of scan settings that change the result (profile_mode, sampling, ...)
+            columns: Column metadata from get_table_info (names and types are part of the key)
+
+        Returns:
+            (table_name, version, digest) tuple
+        """
+        signature = json.dumps({
+            "settings": settings,
+            "columns": [(col.get("name"), col.get("type_name")) for col in columns]
+        }, sort_keys=True, default=str)
+        return table_name, int(version), hashlib.sha256(signature.encode("utf-8")).hexdigest()[:32]
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 or bool(self.directory)
+
+    def get(self, key):
+        """Returns the cached value for a key (from memory, else disk), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] + self.ttl_seconds >= time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _unpack(entry[1])
+            if entry is not None:
+                self._remove(key)
+
+        packed = self._read_disk(key)
+        if packed is None:
+            self.misses += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self._store(key, packed, time.time())
+        return _unpack(packed)
+
+    def set(self, key, value):
+        table_name, version, _ = key
+        packed = _pack(value)
+        with self._lock:
+            # Profiles of older versions can never match again
+            for stale in [k for k in self._entries if k[0] == table_name and k[1] < version]:
+                self._remove(stale)
+            self._store(key, packed, time.time())
+        self._write_disk(key, packed)
+
+    def invalidate(self, full_name=None):
+        """Drops cached profiles of a table, or of every table in a catalog/schema, or everything.
+
+        Returns:
+            Number of entries removed from memory
+        """
+        def matches(table_name, name):
+            return not name or table_name == name or table_name.startswith(f"{name}.")
+
+        with self._lock:
+            keys = [key for key in self._entries if matches(key[0], full_name)]
+            for key in keys:
+                self._remove(key)
+        for path, file_table, _ in self._disk_files():
+            if matches(file_table, full_name and _safe_name(full_name)):
+                self._unlink(path)
+        logger.info(f"Invalidated {len(keys)} cached profiles ({full_name or 'all'})")
+        return len(keys)
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "disk_dir": self.directory,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+        }
+
+    def _store(self, key, packed, created_at):
+        if len(packed) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (created_at, packed)
+        self._bytes += len(packed)
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry[1])
+
+    def _path(self, key):
+        # Table name and version lead the file name so files can be matched without opening them
+        table_name, version, digest = key
+        return os.path.join(self.directory, f"{_safe_name(table_name)}__{version}__{digest}.bin")
+
+    def _disk_files(self):
+        """Yields (path, table_name, version) of every disk tier file."""
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".bin"):
+                table_name, version, _ = filename.rsplit("__", 2)
+                yield os.path.join(self.directory, filename), table_name, int(version)
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl_seconds < time.time():
+                self._unlink(path)
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, key, packed):
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for stale_path, file_table, version in list(self._disk_files()):
+                if file_table == _safe_name(key[0]) and version < key[1]:
+                    self._unlink(stale_path)
+            path = self._path(key)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(packed)
+            os.replace(tmp_path, path)
+            self._trim_disk()
+        except OSError as e:
+            logger.warning(f"Could not write profile cache file for {key[0]}: {e}")
+
+    def _trim_disk(self):
+        files = []
+        for path, _, _ in self._disk_files():
+            stat = os.stat(path)
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            self._unlink(path)
+            total -= size
+
+    @staticmethod
+    def _unlink(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+profile_cache = ProfileCache(
+    max_bytes=config["profile_cache_max_bytes"],
+    ttl_seconds=config["profile_cache_ttl_seconds"],
+    directory=config["profile_cache_dir"] or None,
+    disk_max_bytes=config["profile_cache_disk_max_bytes"]
+)
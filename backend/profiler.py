@@ -0,0 +1,309 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+# Numeric columns are profiled this many at a time, bounding the float64 copy to rows x 32
+BLOCK_COLUMNS = 32
+
+# Smaller frames are profiled serially; pool start-up would cost more than it saves
+PARALLEL_MIN_ROWS = 100000
+
+QUANTILES = (("25%", 0.25), ("50%", 0.5), ("75%", 0.75))
+
+# Integers beyond this magnitude do not survive the float64 copy (neighbouring IDs collapse)
+FLOAT64_EXACT_INTEGER = 2 ** 53
+
+
+def _optional(value):
+    """Converts a numpy scalar to float, mapping NaN/inf results of empty columns to None."""
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _sort_columns(block):
+    """Sorts each column of a rows x columns float64 block; returns columns x rows (NaNs last)."""
+    return np.sort(np.ascontiguousarray(block.T), axis=1)
+
+
+def _hash_rows(frame):
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def _row_ranges(rows, shards):
+    bounds = np.linspace(0, rows, shards + 1).astype(int)
+    return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+class ColumnProfiler:
+    """Vectorized column profiler behind DQChecks.analyze_dataframe.
+
+    Numeric columns are profiled in blocks: each block is converted to one
+    float64 matrix and sorted once per column, which yields null counts,
+    min/max, quartiles and exact distinct counts, with mean and std computed
+    from the same sorted values. Integer columns with values beyond 2**53,
+    which float64 cannot tell apart, are sorted in their own dtype instead
+    (see profile_integer_column). Large frames are sharded by column block and
+    row range across PROFILER_WORKERS workers. The profile holds native Python
+    values only (NaN becomes None), so no conversion pass is needed before the
+    results are serialized.
+    """
+
+    @staticmethod
+    def profile(df: pd.DataFrame, workers: int = None) -> dict:
+        """
+        Computes the raw metrics for a DataFrame.
+
+        Args:
+            df: Frame to profile
+            workers: Parallel workers (defaults to PROFILER_WORKERS; 1 profiles serially)
+
+        Returns:
+            dict with row_count, columns, column_types, missing_values, duplicates,
+            numeric_distribution (pandas describe() keys), distinct_counts and
+            future_date_columns
+        """
+        row_count = int(len(df))
+        numeric_cols = list(df.select_dtypes(include=[np.number]).columns)
+        numeric_set = set(numeric_cols)
+        wide_cols = ColumnProfiler.wide_integer_columns(df, numeric_cols)
+        float_cols = [col for col in numeric_cols if col not in wide_cols]
+        workers = ColumnProfiler.resolve_workers(workers)
+        if row_count < PARALLEL_MIN_ROWS:
+            workers = 1
+
+        missing_values = {}
+        numeric_distribution = {}
+        distinct_counts = {}
+
+        if workers > 1:
+            blocks, duplicates = ColumnProfiler._profile_parallel(df, float_cols, workers)
+        else:
+            blocks = []
+            for start in range(0, len(float_cols), BLOCK_COLUMNS):
+                cols = float_cols[start:start + BLOCK_COLUMNS]
+                block = df[cols].to_numpy(dtype=np.float64, na_value=np.nan)
+                blocks.append((cols, ColumnProfiler.profile_numeric_block(block)))
+            duplicates = ColumnProfiler.count_duplicates(df)
+        blocks.extend(([col], ColumnProfiler.profile_integer_column(df[col])) for col in wide_cols)
+
+        for cols, stats in blocks:
+            for i, col in enumerate(cols):
+                missing_values[col] = stats["nulls"][i]
+                distinct_counts[col] = stats["distinct"][i]
+                numeric_distribution[col] = stats["describe"][i]
+        # Keep the DataFrame's column order for the wide integer columns profiled last
+        distinct_counts = {col: distinct_counts[col] for col in numeric_cols}
+        numeric_distribution = {col: numeric_distribution[col] for col in numeric_cols}
+
+        other_cols = [col for col in df.columns if col not in numeric_set]
+        if other_cols:
+            other_nulls = df[other_cols].isna().sum()
+            for col in other_cols:
+                missing_values[col] = int(other_nulls[col])
+
+        return {
+            "row_count": row_count,
+            "columns": list(df.columns),
+            # Keep the DataFrame's column order, as df.isnull().sum() would
+            "missing_values": {col: missing_values[col] for col in df.columns},
+            "duplicates": duplicates,
+            "column_types": df.dtypes.astype(str).to_dict(),
+            "numeric_distribution": numeric_distribution,
+            "distinct_counts": distinct_counts,
+            "future_date_columns": ColumnProfiler.future_date_columns(df)
+        }
+
+    @staticmethod
+    def profile_numeric_block(block: np.ndarray) -> dict:
+        """
+        Profiles every column of a 2-D float64 array (rows x columns) at once.
+
+        Returns:
+            dict of per-column lists: 'nulls', 'distinct' and 'describe' (count, mean,
+            std, min, 25%, 50%, 75%, max like pandas describe(), None where undefined)
+        """
+        return ColumnProfiler.describe_sorted(_sort_columns(block))
+
+    @staticmethod
+    def describe_sorted(ordered: np.ndarray) -> dict:
+        """Per-column metrics from a columns x rows array whose rows are sorted with NaNs last."""
+        width, rows = ordered.shape
+        counts = rows - np.isnan(ordered).sum(axis=1) if rows else np.zeros(width, dtype=np.int64)
+
+        nulls = []
+        distinct = []
+        describe = []
+        for j in range(width):
+            count = int(counts[j])
+            values = ordered[j, :count]
+            nulls.append(rows - count)
+            if count == 0:
+                distinct.append(0)
+                describe.append({"count": 0.0, "mean": None, "std": None, "min": None,
+                                 "25%": None, "50%": None, "75%": None, "max": None})
+                continue
+
+            distinct.append(int(np.count_nonzero(values[1:] != values[:-1])) + 1)
+            mean = values.sum() / count
+            deviations = values - mean
+            stats = {
+                "count": float(count),
+                "mean": _optional(mean),
+                "std": _optional(np.sqrt(np.dot(deviations, deviations) / (count - 1))) if count > 1 else None,
+                "min": _optional(values[0])
+            }
+            for label, q in QUANTILES:
+                # Linear interpolation between order statistics, as pandas/numpy quantile do
+                position = q * (count - 1)
+                lower = int(np.floor(position))
+                upper = min(lower + 1, count - 1)
+                stats[label] = _optional(values[lower] + (values[upper] - values[lower]) * (position - lower))
+            stats["max"] = _optional(values[-1])
+            describe.append(stats)
+
+        return {"nulls": nulls, "distinct": distinct, "describe": describe}
+
+    @staticmethod
+    def wide_integer_columns(df: pd.DataFrame, numeric_cols: list) -> set:
+        """Integer columns holding values float64 cannot represent exactly (beyond +/-2**53)."""
+        wide = set()
+        for col in numeric_cols:
+            dtype = df[col].dtype
+            if dtype.kind not in "iu" or dtype.itemsize < 8:
+                continue
+            low, high = df[col].min(), df[col].max()
+            if pd.notna(high) and (int(high) > FLOAT64_EXACT_INTEGER or int(low) < -FLOAT64_EXACT_INTEGER):
+                wide.add(col)
+        return wide
+
+    @staticmethod
+    def profile_integer_column(series: pd.Series) -> dict:
+        """
+        Profiles one 64-bit integer column without converting its values to float64.
+
+        Values are sorted in their own dtype, so distinct counts and min/max are exact.
+        Mean, std and quartiles are computed on offsets from the minimum, which are
+        exact integers, so a column of distinct large IDs never looks constant.
+
+        Returns:
+            dict shaped like profile_numeric_block's for a single column
+        """
+        rows = len(series)
+        # Nullable Int64/UInt64 columns hold the same values as their numpy dtype once nulls are dropped
+        dtype = getattr(series.dtype, "numpy_dtype", series.dtype)
+        values = np.sort(series.dropna().to_numpy(dtype=dtype))
+        count = len(values)
+        if count == 0:
+            return ColumnProfiler.describe_sorted(np.full((1, rows), np.nan))
+
+        # Unsigned wrap-around gives the exact difference even across the whole int64 range
+        offsets = (values.astype(np.uint64) - np.uint64(values[0].astype(np.uint64))).astype(np.float64)
+        base = float(values[0])
+        mean = offsets.sum() / count
+        deviations = offsets - mean
+        stats = {
+            "count": float(count),
+            "mean": _optional(base + mean),
+            "std": _optional(np.sqrt(np.dot(deviations, deviations) / (count - 1))) if count > 1 else None,
+            "min": _optional(values[0])
+        }
+        for label, q in QUANTILES:
+            position = q * (count - 1)
+            lower = int(np.floor(position))
+            upper = min(lower + 1, count - 1)
+            stats[label] = _optional(base + offsets[lower] + (offsets[upper] - offsets[lower]) * (position - lower))
+        stats["max"] = _optional(values[-1])
+        return {
+            "nulls": [rows - count],
+            "distinct": [int(np.count_nonzero(values[1:] != values[:-1])) + 1],
+            "describe": [stats]
+        }
+
+    @staticmethod
+    def resolve_workers(workers: int = None) -> int:
+        """Worker count to use: the argument, else PROFILER_WORKERS, where 0 means one per CPU core."""
+        if workers is None:
+            workers = config["profiler_workers"]
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        return workers
+
+    @staticmethod
+    def _profile_parallel(df: pd.DataFrame, numeric_cols: list, workers: int):
+        """
+        Profiles numeric columns and row hashes on a worker pool.
+
+        Numeric columns are sharded into column blocks, and further into row
+        ranges when there are fewer blocks than workers. Each shard is sorted
+        independently; the sorted runs of a block are then merged with a stable
+        sort (which only has to merge the runs), so the merged order, and every
+        metric derived from it, is identical to the serial profile whatever the
+        worker count. Row hashes for duplicate detection are computed per row
+        range and concatenated in order.
+
+        Returns:
+            (list of (columns, block stats), duplicate count)
+        """
+        block_columns = max(1, min(BLOCK_COLUMNS, math.ceil(len(numeric_cols) / workers)))
+        column_blocks = [numeric_cols[i:i + block_columns] for i in range(0, len(numeric_cols), block_columns)]
+        row_shards = max(1, math.ceil(workers / max(1, len(column_blocks))))
+        ranges = _row_ranges(len(df), row_shards)
+
+        executor_class = ProcessPoolExecutor if config["profiler_executor"] == "process" else ThreadPoolExecutor
+        with executor_class(max_workers=workers) as executor:
+            # Submit everything first so sorting and hashing overlap
+            sort_futures = [
+                [executor.submit(_sort_columns, df[cols].iloc[start:end].to_numpy(dtype=np.float64, na_value=np.nan))
+                 for start, end in ranges]
+                for cols in column_blocks
+            ]
+            hash_futures = [
+                executor.submit(_hash_rows, df.iloc[start:end])
+                for start, end in _row_ranges(len(df), workers)
+            ] if not df.empty else []
+
+            blocks = []
+            for cols, futures in zip(column_blocks, sort_futures):
+                runs = [future.result() for future in futures]
+                ordered = runs[0] if len(runs) == 1 else np.sort(np.concatenate(runs, axis=1), axis=1, kind="stable")
+                blocks.append((cols, ColumnProfiler.describe_sorted(ordered)))
+
+            try:
+                hashes = [future.result() for future in hash_futures]
+                duplicates = int(pd.Series(np.concatenate(hashes)).duplicated().sum()) if hashes else 0
+            except TypeError:
+                duplicates = int(df.duplicated().sum())
+
+        logger.info(f"Profiled {len(numeric_cols)} numeric columns on {workers} workers "
+                    f"({len(column_blocks)} column block(s) x {len(ranges)} row range(s))")
+        return blocks, duplicates
+
+    @staticmethod
+    def count_duplicates(df: pd.DataFrame) -> int:
+        """Counts repeated rows by hashing each row to 64 bits instead of comparing full rows."""
+        if df.empty:
+            return 0
+        try:
+            hashes = pd.util.hash_pandas_object(df, index=False)
+        except TypeError:
+            # Unhashable cell values (lists, dicts) need pandas' own row comparison
+            return int(df.duplicated().sum())
+        return int(hashes.duplicated().sum())
+
+    @staticmethod
+    def future_date_columns(df: pd.DataFrame) -> list:
+        """Datetime columns whose latest value is in the future."""
+        columns = []
+        for col in df.select_dtypes(include=["datetime", "datetimetz"]).columns:
+            latest = df[col].max()
+            if pd.isna(latest):
+                continue
+            if latest > pd.Timestamp.now(tz=latest.tz):
+                columns.append(col)
+        return columns
@@ -0,0 +1,199 @@
+import math
+from collections import Counter
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+SEVERITY_RANK = {"High": 3, "Medium": 2, "Low": 1}
+
+# Share of the budget left after the fixed parts that issue lines may use; column profiles get the rest
+ISSUE_BUDGET_SHARE = 0.6
+
+# Rough characters per token for English text and identifiers; avoids depending on a tokenizer
+CHARS_PER_TOKEN = 4
+
+INSTRUCTIONS = """You are a Data Quality Expert for Databricks. Analyze the data quality issues below and provide:
+1. Root cause analysis.
+2. A pipeline reliability score (0-100).
+3. Recommended SQL fixes.
+4. Recommended Python fixes.
+5. Delta Lake optimization suggestions.
+
+Return the response as valid JSON with keys:
+root_cause_analysis, pipeline_health, recommended_sql_fixes, recommended_python_fixes, delta_optimizations, summary.
+
+Data Quality Report (compact: one line per issue as severity|type|column|details, then profiles of the
+affected columns as name:type with null ratio, distinct count and range; healthy columns are summarized):
+"""
+
+BATCH_INSTRUCTIONS = """You are a Data Quality Expert for Databricks. Below are data quality reports for several tables.
+For each table, provide root cause analysis, a pipeline reliability score (0-100), recommended SQL and Python
+fixes, and Delta Lake optimization suggestions.
+
+Return the response as one valid JSON object with a key per table label (table_1, table_2, ...), each mapping to
+an object with keys: root_cause_analysis, pipeline_health, recommended_sql_fixes, recommended_python_fixes,
+delta_optimizations, summary.
+
+Each report is compact: one line per issue as severity|type|column|details, then profiles of the affected columns
+as name:type with null ratio, distinct count and range; healthy columns are summarized.
+"""
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _number(value):
+    if value is None:
+        return "?"
+    if isinstance(value, float) and not value.is_integer():
+        return f"{value:.4g}"
+    return f"{int(value):,}" if abs(value) < 1e15 else f"{value:.3g}"
+
+
+class PromptBuilder:
+    """Compiles DQ results into a compact LLM prompt that fits a token budget.
+
+    Wide tables would otherwise put every column's statistics into the prompt.
+    Instead, issues are listed one line each from most to least severe,
+    followed by short profiles of the columns they affect, while columns
+    without issues are summarized in aggregate (count by type, worst null
+    ratio). Lines are added in priority order until PROMPT_TOKEN_BUDGET is
+    reached, with issues taking at most ISSUE_BUDGET_SHARE of it. Whatever does
+    not fit is counted in an 'omitted' line, so the prompt size stays flat
+    however wide the table is.
+    """
+
+    @staticmethod
+    def build(dq_results, token_budget=None, instructions=INSTRUCTIONS):
+        """
+        Builds the analysis prompt for a set of DQ results.
+
+        Args:
+            dq_results: Results from DQChecks
+            token_budget: Maximum estimated prompt tokens (defaults to PROMPT_TOKEN_BUDGET)
+            instructions: Text the prompt opens with; None builds just the report, for build_batch()
+
+        Returns:
+            (prompt, stats) where stats holds 'estimated_tokens', 'token_budget', and the
+            issues and columns included or omitted
+        """
+        token_budget = token_budget or config["prompt_token_budget"]
+        row_count = dq_results.get("row_count") or 0
+        issues = sorted(
+            dq_results.get("issues", []),
+            key=lambda issue: (-SEVERITY_RANK.get(issue.get("severity"), 0), issue.get("type", ""), str(issue.get("column")))
+        )
+        columns = list(dq_results.get("columns") or dq_results.get("column_types", {}))
+        worst = {}
+        for issue in issues:
+            column = issue.get("column")
+            if column in columns:
+                worst[column] = max(worst.get(column, 0), SEVERITY_RANK.get(issue.get("severity"), 0))
+        issue_columns = sorted(worst, key=lambda col: (-worst[col], -PromptBuilder._null_ratio(dq_results, col, row_count)))
+        healthy = [col for col in columns if col not in worst]
+
+        # Always included: instructions, the table header and the healthy-column aggregate
+        header = PromptBuilder._header(dq_results, len(columns))
+        healthy_line = PromptBuilder._healthy_summary(dq_results, healthy, row_count)
+        used = estimate_tokens((instructions or "") + header + healthy_line) + 20  # room for section titles and omitted counts
+
+        def take(lines, limit):
+            nonlocal used
+            kept = []
+            for line in lines:
+                cost = estimate_tokens(line) + 1
+                if used + cost > limit:
+                    break
+                kept.append(line)
+                used += cost
+            return kept
+
+        # Issues may not crowd out the profiles of the columns they affect
+        issue_lines = take(
+            (f"{issue.get('severity', '?')[0]}|{issue.get('type')}|{issue.get('column')}|{issue.get('details', '')}"
+             for issue in issues),
+            used + ISSUE_BUDGET_SHARE * max(0, token_budget - used)
+        )
+        column_lines = take((PromptBuilder._column_profile(dq_results, col, row_count) for col in issue_columns), token_budget)
+        name_lines = take([f"healthy column names: {', '.join(healthy)}"], token_budget) if healthy else []
+
+        parts = ([instructions] if instructions else []) + [header, "ISSUES:"]
+        parts.extend(issue_lines or ["none"])
+        if len(issue_lines) < len(issues):
+            parts.append(f"... {len(issues) - len(issue_lines)} more issues of equal or lower severity omitted")
+        if issue_columns:
+            parts.append("AFFECTED COLUMNS:")
+            parts.extend(column_lines)
+            if len(column_lines) < len(issue_columns):
+                parts.append(f"... {len(issue_columns) - len(column_lines)} more affected columns omitted")
+        parts.append(healthy_line)
+        parts.extend(name_lines)
+        prompt = "\n".join(parts)
+
+        stats = {
+            "estimated_tokens": estimate_tokens(prompt),
+            "token_budget": token_budget,
+            "issues_included": len(issue_lines),
+            "issues_omitted": len(issues) - len(issue_lines),
+            "columns_detailed": len(column_lines),
+            "columns_summarized": len(healthy) + len(issue_columns) - len(column_lines)
+        }
+        logger.info(f"Built analysis prompt: ~{stats['estimated_tokens']} tokens for {len(columns)} columns and {len(issues)} issues")
+        return prompt, stats
+
+    @staticmethod
+    def build_batch(reports):
+        """
+        Combines several tables' reports (built with instructions=None) into one prompt.
+
+        Returns:
+            (prompt, labels) where labels[i] is the key the response uses for reports[i]
+        """
+        labels = [f"table_{index + 1}" for index in range(len(reports))]
+        parts = [BATCH_INSTRUCTIONS]
+        for label, report in zip(labels, reports):
+            parts.append(f"=== {label} ===\n{report}")
+        return "\n\n".join(parts), labels
+
+    @staticmethod
+    def _header(dq_results, column_count):
+        fields = [
+            f"TABLE {dq_results.get('source', 'unknown')}",
+            f"rows={_number(dq_results.get('row_count'))}",
+            f"columns={column_count}",
+            f"dq_score={dq_results.get('dq_score')}",
+            f"duplicates={_number(dq_results.get('duplicates'))}"
+        ]
+        if dq_results.get("profile_mode") == "approximate":
+            fields.append("profile=approximate")
+        if dq_results.get("sampling"):
+            fields.append(f"sampled={dq_results['sampling'].get('value')}{'%' if dq_results['sampling'].get('method') == 'percent' else ' head rows'}")
+        return " | ".join(fields)
+
+    @staticmethod
+    def _null_ratio(dq_results, col, row_count):
+        nulls = dq_results.get("missing_values", {}).get(col) or 0
+        return nulls / row_count if row_count else 0.0
+
+    @staticmethod
+    def _column_profile(dq_results, col, row_count):
+        col_type = dq_results.get("column_types", {}).get(col, "?")
+        line = f"{col}:{col_type} nulls={PromptBuilder._null_ratio(dq_results, col, row_count):.1%}"
+        distinct = dq_results.get("distinct_counts", {}).get(col)
+        if distinct is not None:
+            line += f" distinct={_number(distinct)}"
+        dist = dq_results.get("numeric_distribution", {}).get(col)
+        if dist:
+            line += f" range=[{_number(dist.get('min'))},{_number(dist.get('max'))}] mean={_number(dist.get('mean'))}"
+        return line
+
+    @staticmethod
+    def _healthy_summary(dq_results, healthy, row_count):
+        if not healthy:
+            return "HEALTHY COLUMNS: none"
+        types = Counter(str(dq_results.get("column_types", {}).get(col, "?")) for col in healthy)
+        max_nulls = max(PromptBuilder._null_ratio(dq_results, col, row_count) for col in healthy)
+        type_counts = ", ".join(f"{count} {col_type}" for col_type, count in types.most_common())
+        return f"HEALTHY COLUMNS ({len(healthy)}): {type_counts}; max nulls {max_nulls:.1%}"
@@ -0,0 +1,253 @@
+import asyncio
+import heapq
+import math
+from dbx_cli import DatabricksCLI
+from dq_checks import DQChecks
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+DISTINCT_TYPES = ["STRING", "INT", "LONG", "SHORT", "BYTE"]
+NUMERIC_TYPES = ["INT", "LONG", "SHORT", "BYTE", "FLOAT", "DOUBLE", "DECIMAL"]
+TIME_TYPES = ["TIMESTAMP", "DATE"]
+
+# SQLSTATE classes of errors caused by the statement itself (42: analysis, e.g. an unsupported
+# type; 22: data, e.g. a cast overflow), which bisecting can pin on a column
+COLUMN_ERROR_SQLSTATE_CLASSES = ("42", "22")
+
+
+class QueryPlanner:
+    """Splits wide push-down profiles into cost-balanced column batches.
+
+    Each batch is an independent statement built by DQChecks.generate_sql_analysis,
+    so batches can run concurrently on the warehouse and a failing batch can be
+    retried (and bisected down to the offending column) without redoing the rest.
+    Every batch reads the same Delta version, so their counts agree even if the
+    table is written to while the profile runs.
+    """
+
+    @staticmethod
+    def column_cost(col: dict, profile_mode: str = "exact") -> int:
+        """Relative aggregation cost of profiling one column."""
+        col_type = col.get("type_name", "STRING").upper()
+        cost = 1  # COUNT(col)
+        if col_type in DISTINCT_TYPES:
+            # Exact distinct needs a full shuffle of the column; the HLL sketch does not
+            cost += 10 if profile_mode == "exact" else 2
+        if col_type in NUMERIC_TYPES:
+            cost += 3  # MIN / MAX / AVG
+            if profile_mode == "approximate":
+                cost += 4  # approx_percentile digest
+        if col_type in TIME_TYPES:
+            cost += 1
+        return cost
+
+    @staticmethod
+    def plan_batches(columns: list, profile_mode: str = "exact", max_batch_cost: int = None) -> list:
+        """
+        Packs columns into batches whose total cost stays under max_batch_cost.
+
+        Uses longest-processing-time-first assignment so batches end up with similar
+        cost, then restores the table's column order within each batch.
+
+        Returns:
+            List of column lists (a single batch for narrow tables)
+        """
+        max_batch_cost = max_batch_cost or config["pushdown_batch_max_cost"]
+        costs = [QueryPlanner.column_cost(col, profile_mode) for col in columns]
+        batch_count = max(1, math.ceil(sum(costs) / max_batch_cost))
+        if batch_count == 1:
+            return [list(columns)]
+
+        # Min-heap of (batch_cost, batch_index)
+        heap = [(0, i) for i in range(batch_count)]
+        assignments = [[] for _ in range(batch_count)]
+        for index in sorted(range(len(columns)), key=lambda i: costs[i], reverse=True):
+            batch_cost, batch_index = heapq.heappop(heap)
+            assignments[batch_index].append(index)
+            heapq.heappush(heap, (batch_cost + costs[index], batch_index))
+
+        return [[columns[i] for i in sorted(indices)] for indices in assignments if indices]
+
+    @staticmethod
+    async def run_profile(table_name: str, columns: list, profile_mode: str = "exact", relative_error: float = 0.05,
+                          sampling: dict = None, on_progress=None, version: int = None) -> dict:
+        """
+        Runs the push-down profile as concurrent column batches and merges the results.
+
+        Args:
+            table_name: Fully qualified table name
+            columns: Column metadata from get_table_info
+            profile_mode, relative_error, sampling: Passed through to generate_sql_analysis
+            on_progress: Optional callback(completed_batches, total_batches)
+            version: Delta version to read; resolved from the table's history if not given
+
+        Returns:
+            dict shaped like DatabricksCLI.run_sql() output (manifest + single data row),
+            plus 'batches', 'failed_columns' and 'version' (None if the table has no Delta
+            version to pin); or {'error': ...} if every batch failed
+        """
+        if version is None:
+            resolved = await DatabricksCLI.table_version(table_name)
+            version = resolved.get("version")
+        source = QueryPlanner.versioned(table_name, version)
+        batches = QueryPlanner.plan_batches(columns, profile_mode)
+        logger.info(f"Profiling {source}: {len(columns)} columns in {len(batches)} batch(es)")
+
+        semaphore = asyncio.Semaphore(config["pushdown_max_concurrent_statements"])
+        completed = 0
+
+        async def run_sql(batch):
+            sql = DQChecks.generate_sql_analysis(
+                source, batch,
+                profile_mode=profile_mode,
+                relative_error=relative_error,
+                sampling=sampling
+            )
+            async with semaphore:
+                return await DatabricksCLI.run_sql(sql)
+
+        async def run_batch(batch):
+            nonlocal completed
+            result = await QueryPlanner._run_with_retry(run_sql, batch)
+            completed += 1
+            if on_progress:
+                on_progress(completed, len(batches))
+            return result
+
+        results = await asyncio.gather(*[run_batch(batch) for batch in batches])
+
+        # If nothing succeeded the table itself is unreadable; don't bisect every batch down to columns
+        if all("error" in result for result in results):
+            return {"error": results[0]["error"]}
+
+        partials = await asyncio.gather(*[
+            QueryPlanner._isolate_failures(run_sql, batch, result)
+            for batch, result in zip(batches, results)
+        ])
+        merged = QueryPlanner.merge_results(partials)
+        if "error" not in merged:
+            merged["version"] = version
+        return merged
+
+    @staticmethod
+    def versioned(table_name: str, version: int = None) -> str:
+        """Table reference pinned to a Delta version (the bare name if there is none)."""
+        return table_name if version is None else f"{table_name} VERSION AS OF {version}"
+
+    @staticmethod
+    def is_column_error(result: dict) -> bool:
+        """Whether a failed statement was rejected for its content rather than failing to run (timeout, warehouse error)."""
+        return (result.get("sql_state") or "")[:2] in COLUMN_ERROR_SQLSTATE_CLASSES
+
+    @staticmethod
+    async def _run_with_retry(run_sql, batch):
+        """Runs one batch statement, retrying it if it failed to run."""
+        result = None
+        for attempt in range(config["pushdown_batch_retries"] + 1):
+            result = await run_sql(batch)
+            if "error" not in result:
+                return result
+            logger.warning(f"Batch of {len(batch)} column(s) failed (attempt {attempt + 1}): {result['error']}")
+            if QueryPlanner.is_column_error(result):
+                # Running the same statement again would fail the same way
+                break
+        return result
+
+    @staticmethod
+    async def _isolate_failures(run_sql, batch, result):
+        """Bisects a batch the warehouse rejected so one bad column does not drop its neighbours.
+
+        A batch that timed out or hit a warehouse error is reported as failed as a whole:
+        splitting it would only run more statements into the same problem.
+
+        Returns:
+            List of (sql_result, failed_columns) tuples
+        """
+        if "error" not in result:
+            return [(result, [])]
+        if len(batch) == 1 or not QueryPlanner.is_column_error(result):
+            return [(None, [{"column": col["name"], "error": result["error"]} for col in batch])]
+
+        middle = len(batch) // 2
+        halves = [batch[:middle], batch[middle:]]
+        half_results = await asyncio.gather(*[QueryPlanner._run_with_retry(run_sql, half) for half in halves])
+        parts = await asyncio.gather(*[
+            QueryPlanner._isolate_failures(run_sql, half, half_result)
+            for half, half_result in zip(halves, half_results)
+        ])
+        return parts[0] + parts[1]
+
+    @staticmethod
+    def merge_results(partials: list) -> dict:
+        """Merges per-batch single-row results into one run_sql-style result."""
+        manifest_columns = []
+        row = []
+        failed_columns = []
+        errors = []
+        seen = set()
+
+        for batch_results in partials:
+            for sql_result, failed in batch_results:
+                failed_columns.extend(failed)
+                errors.extend(f["error"] for f in failed)
+                if sql_result is None:
+                    continue
+                data_array = sql_result.get("data_array", [])
+                columns = sql_result.get("manifest", {}).get("schema", {}).get("columns", [])
+                values = data_array[0] if data_array else []
+                for i, col in enumerate(columns):
+                    # Every batch repeats COUNT(*) of the same version as total_rows; keep the first one
+                    if col["name"] in seen:
+                        continue
+                    seen.add(col["name"])
+                    manifest_columns.append(col)
+                    row.append(values[i] if i < len(values) else None)
+
+        if not manifest_columns:
+            return {"error": errors[0] if errors else "Push-down profile returned no results"}
+
+        return {
+            "manifest": {"schema": {"columns": manifest_columns}},
+            "data_array": [row],
+            "row_count": 1,
+            "batches": sum(len(batch_results) for batch_results in partials),
+            "failed_columns": failed_columns
+        }
+
+    @staticmethod
+    async def run_duplicate_check(table_name: str, columns: list, mode: str = "exact", key_columns: list = None,
+                                  relative_error: float = 0.05, sampling: dict = None, potential_keys: list = None,
+                                  version: int = None) -> dict:
+        """
+        Runs the duplicate-row statement on its own, independently of the profile batches.
+
+        Pass the version the profile read so both describe the same rows.
+
+        In 'key' mode without explicit key_columns, the first inferred potential key
+        is used; if none was inferred the check falls back to an exact row-hash count.
+
+        Returns:
+            Parsed duplicate check (see DQChecks.parse_duplicate_results) or {'error': ...}
+        """
+        if mode == "key" and not key_columns:
+            if potential_keys:
+                key_columns = potential_keys[:1]
+                logger.info(f"Using inferred key {key_columns} for duplicate detection on {table_name}")
+            else:
+                logger.info(f"No key inferred for {table_name}; using exact row-hash duplicate detection")
+                mode = "exact"
+
+        sql = DQChecks.generate_duplicate_sql(
+            QueryPlanner.versioned(table_name, version), columns,
+            mode=mode,
+            key_columns=key_columns,
+            relative_error=relative_error,
+            sampling=sampling
+        )
+        result = await DatabricksCLI.run_sql(sql)
+        if "error" in result:
+            logger.warning(f"Duplicate check failed for {table_name}: {result['error']}")
+            return {"error": result["error"], "mode": mode}
+        return DQChecks.parse_duplicate_results(result, mode, key_columns, relative_error)
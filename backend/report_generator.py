@@ -5,10 +5,79 @@ from utils import get_logger
 logger = get_logger(__name__)
 
 class ReportGenerator:
+    @staticmethod
+    def _profile_mode_line(dq_results):
+        """Describes how the metrics were computed, calling out estimated ones."""
+        if dq_results.get("profile_mode") != "approximate":
+            return ""
+        estimated = ", ".join(m.replace("_", " ") for m in dq_results.get("estimated_metrics", []))
+        error = dq_results.get("relative_error")
+        error_text = f" (±{error:.0%} relative error)" if error else ""
+        return f"**Profile Mode:** Approximate{error_text} — estimated metrics: {estimated}\n"
+
+    @staticmethod
+    def _sampling_line(dq_results):
+        sampling = dq_results.get("sampling")
+        if not sampling:
+            return ""
+        if sampling["method"] != "percent":
+            return (f"**Sampled Scan:** TABLESAMPLE {sampling['value']:,} rows, a non-random head sample "
+                    f"({sampling.get('sampled_rows', 0):,} rows profiled); null ratios are not confirmed\n")
+        return (f"**Sampled Scan:** TABLESAMPLE {sampling['value']}% (seed {sampling.get('seed')}), "
+                f"{sampling.get('sampled_rows', 0):,} rows profiled; null ratios judged at 95% confidence\n")
+
+    @staticmethod
+    def _incremental_line(dq_results):
+        incremental = dq_results.get("incremental")
+        if not incremental:
+            return ""
+        if incremental["mode"] == "incremental":
+            detail = (f"merged {incremental['rows_added']:,} rows added since version "
+                      f"{incremental['previous_version']}")
+        elif incremental["mode"] == "unchanged":
+            detail = "table unchanged since the stored profile"
+        else:
+            detail = "full profile (no usable stored profile or Change Data Feed)"
+        return f"**Incremental Scan:** Delta version {incremental['version']} — {detail}\n"
+
+    @staticmethod
+    def _row_sample_line(dq_results):
+        row_sample = dq_results.get("row_sample")
+        if not row_sample:
+            return ""
+        return (f"**Row Sample:** push-down profiling failed ({row_sample['reason']}), so "
+                f"{row_sample['rows']:,} rows fetched from the warehouse were profiled\n")
+
+    @staticmethod
+    def _plan_line(dq_results):
+        scan_plan = dq_results.get("scan_plan")
+        if not scan_plan or scan_plan.get("size_bytes") is None:
+            return ""
+        line = f"**Scan Plan:** {scan_plan['summary']}"
+        if scan_plan.get("applied"):
+            line += " (applied automatically because the scan was not confirmed)"
+        return line + "\n"
+
+    @staticmethod
+    def _file_line(dq_results):
+        """Describes how much of a file was read and which metrics came from Parquet footers."""
+        file_sampling = dq_results.get("file_sampling")
+        if not file_sampling:
+            return ""
+        line = f"**File Scan:** {file_sampling.get('format', 'csv')}, {file_sampling['mode']} read, {file_sampling['rows_read']:,} rows profiled"
+        if file_sampling.get("bytes_read") is not None:
+            line += f" ({file_sampling['bytes_read']:,} of {file_sampling['file_size']:,} bytes downloaded)"
+        if dq_results.get("footer_columns"):
+            line += f"; null counts and min/max for {len(dq_results['footer_columns'])} columns from Parquet footers"
+        if dq_results.get("unread_columns"):
+            line += f"; not read: {', '.join(dq_results['unread_columns'])}"
+        return line + "\n"
+
     @staticmethod
     def generate_report(dq_results, ai_analysis, output_dir="../outputs/reports"):
         """Generates a Markdown report and saves it."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Microseconds keep reports of concurrent scans (e.g. a batch) from overwriting each other
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         filename = f"dq_report_{timestamp}.md"
         filepath = os.path.join(output_dir, filename)
         
@@ -17,7 +86,7 @@ class ReportGenerator:
         content = f"""# Data Quality Assessment Report
 **Date:** {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 **DQ Score:** {dq_results.get('dq_score')}
-
+{ReportGenerator._plan_line(dq_results)}{ReportGenerator._profile_mode_line(dq_results)}{ReportGenerator._sampling_line(dq_results)}{ReportGenerator._incremental_line(dq_results)}{ReportGenerator._file_line(dq_results)}{ReportGenerator._row_sample_line(dq_results)}
 ## Executive Summary
 {ai_analysis.get('summary')}
 
@@ -28,6 +97,15 @@ class ReportGenerator:
 """
         for issue in dq_results.get("issues", []):
             content += f"- **{issue['type']}** ({issue['severity']}): {issue['details']} (Column: {issue['column']})\n"
+        
+        duplicate_check = dq_results.get("duplicate_check")
+        if duplicate_check and "error" in duplicate_check:
+            content += f"- **Duplicate Check Failed** ({duplicate_check.get('mode')}): {duplicate_check['error']}\n"
+        
+        if dq_results.get("skipped_columns"):
+            content += "\n### Columns Not Profiled\n"
+            for skipped in dq_results["skipped_columns"]:
+                content += f"- `{skipped['column']}`: {skipped['error']}\n"
             
         content += f"""
 ## Root Cause Analysis
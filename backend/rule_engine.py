@@ -0,0 +1,490 @@
+import re
+from collections import Counter
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+SEVERITY_RANK = {"High": 3, "Medium": 2, "Low": 1}
+
+# Low-cardinality string columns are treated as categories, which take a sentinel value instead of staying null
+CATEGORY_MAX_DISTINCT = 50
+
+# Column names that usually hold an identifier
+KEY_NAME = re.compile(r"(^id$|_id$|_key$|[a-z]Id$|^key$)")
+
+# Timestamp column names that tell which copy of a record is the latest, best first
+RECENCY_NAMES = (
+    re.compile(r"(updated|modified|changed)", re.IGNORECASE),
+    re.compile(r"(ingest|load|commit|event_?time|_ts$|timestamp)", re.IGNORECASE),
+    re.compile(r"(created|inserted)", re.IGNORECASE)
+)
+
+# Delta files below this average size make scans slower than they need to be
+SMALL_FILE_BYTES = 32 << 20
+SMALL_FILE_MIN_FILES = 50
+
+
+def _type_family(col_type):
+    """Maps a pandas, Arrow or Spark SQL type name to 'numeric', 'temporal', 'boolean', 'string' or 'other'."""
+    name = str(col_type or "").lower()
+    if any(token in name for token in ("array", "map", "struct", "binary", "variant")):
+        return "other"
+    if any(token in name for token in ("timestamp", "date", "time")):
+        return "temporal"
+    if "bool" in name:
+        return "boolean"
+    if any(token in name for token in ("int", "long", "short", "byte", "float", "double", "decimal", "numeric", "real")):
+        return "numeric"
+    if any(token in name for token in ("str", "char", "object", "category")):
+        return "string"
+    return "other"
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return f"{value:.6g}" if isinstance(value, float) else str(value)
+
+
+def _null_count(ctx):
+    return (
+        f"SELECT COUNT_IF({ctx['col']} IS NULL) AS null_rows, COUNT(*) AS total_rows FROM {ctx['table']};"
+    )
+
+
+# Each rule takes an issue's context and returns a finding, or None if it does not apply.
+# A finding has the likely 'cause', 'sql' and 'python' fixes, and 'delta' recommendations;
+# 'rewrites' marks fixes that rewrite data files (worth a VACUUM afterwards).
+
+def _null_inconclusive(ctx):
+    if ctx["severity"] != "Low":
+        return None
+    if ctx["issue"].get("head_sample"):
+        cause = ("The null ratio comes from the first rows of the table (TABLESAMPLE ROWS), which are not a random "
+                 "sample; it may not hold for the rest of the table.")
+    elif "confidence_interval" in ctx["issue"]:
+        low, high = ctx["issue"]["confidence_interval"]
+        cause = (f"The sampled null ratio ({low:.1%}-{high:.1%} at 95% confidence) straddles the 5% threshold; "
+                 f"it may be sampling noise rather than a pipeline problem.")
+    else:
+        return None
+    return {
+        "cause": cause,
+        "sql": f"-- Confirm on the full table before fixing anything\n{_null_count(ctx)}",
+        "python": f"df.select(F.count_if(F.col({ctx['name']!r}).isNull()).alias('null_rows'), F.count('*').alias('total_rows')).show()",
+        "delta": []
+    }
+
+
+def _null_mostly_empty(ctx):
+    if ctx["null_ratio"] < 0.95:
+        return None
+    return {
+        "cause": f"{ctx['null_ratio']:.1%} of values are null, so the column is effectively unpopulated: it was likely "
+                 f"deprecated in the source, or a rename upstream broke the mapping that fills it.",
+        "sql": f"-- Either repair the source mapping, or drop the column (needs column mapping, see Delta recommendations)\n"
+               f"ALTER TABLE {ctx['table']} DROP COLUMN {ctx['col']};",
+        "python": f"df = df.drop({ctx['name']!r})",
+        "delta": [
+            f"Enable column mapping so columns can be dropped without rewriting data: ALTER TABLE {ctx['table']} SET TBLPROPERTIES "
+            f"('delta.columnMapping.mode' = 'name', 'delta.minReaderVersion' = '2', 'delta.minWriterVersion' = '5')"
+        ]
+    }
+
+
+def _null_key_column(ctx):
+    if not ctx["is_key"]:
+        return None
+    quarantine = f"{ctx['table']}_quarantine"
+    return {
+        "cause": f"{ctx['null_ratio']:.1%} of rows have no {ctx['name']}, which looks like an identifier: records are "
+                 f"loaded without their key, typically from a lookup or join that found no match upstream, or a source "
+                 f"that omits the field on some records.",
+        "sql": f"{_null_count(ctx)}\n"
+               f"CREATE TABLE IF NOT EXISTS {quarantine} AS SELECT * FROM {ctx['table']} WHERE false;\n"
+               f"INSERT INTO {quarantine} SELECT * FROM {ctx['table']} WHERE {ctx['col']} IS NULL;\n"
+               f"-- Deletes rows: run only once the quarantined rows match the count above and have been reviewed\n"
+               f"-- DELETE FROM {ctx['table']} WHERE {ctx['col']} IS NULL;\n"
+               f"-- ALTER TABLE {ctx['table']} ALTER COLUMN {ctx['col']} SET NOT NULL;",
+        "python": f"quarantine = df.filter(F.col({ctx['name']!r}).isNull())\n"
+                  f"df = df.filter(F.col({ctx['name']!r}).isNotNull())",
+        "delta": [
+            f"Keep {ctx['name']} NOT NULL (ALTER TABLE {ctx['table']} ALTER COLUMN {ctx['col']} SET NOT NULL) so loads "
+            f"without a key fail instead of landing"
+        ],
+        "rewrites": True
+    }
+
+
+def _null_numeric(ctx):
+    if ctx["family"] != "numeric":
+        return None
+    dist = ctx["distribution"]
+    fill = dist.get("50%", dist.get("median", dist.get("mean")))
+    lookup = ""
+    if fill is None:
+        # UPDATE cannot take a subquery, so the median is looked up first
+        lookup = f"SELECT percentile_approx({ctx['col']}, 0.5) AS median FROM {ctx['table']};\n"
+        fill_sql, fill_python, fill_note = "<median>", "median", "median"
+    else:
+        fill_sql = fill_python = _number(fill)
+        fill_note = f"median {fill_sql}" if "50%" in dist or "median" in dist else f"mean {fill_sql}"
+    caution = " Over 20% is missing, so imputing will shift its distribution; prefer fixing the source." if ctx["severity"] == "High" else ""
+    return {
+        "cause": f"{ctx['null_ratio']:.1%} of {ctx['name']} is null: the measure is optional in the source, or values "
+                 f"fail a CAST upstream (non-numeric strings become NULL).{caution}",
+        "sql": f"-- Values that failed a cast show up as NULL; impute with the {fill_note} once the source is fixed\n"
+               f"{lookup}UPDATE {ctx['table']} SET {ctx['col']} = {fill_sql} WHERE {ctx['col']} IS NULL;",
+        "python": (f"median = df.approxQuantile({ctx['name']!r}, [0.5], 0.01)[0]\n" if fill is None else "")
+                  + f"df = df.fillna({{{ctx['name']!r}: {fill_python}}})",
+        "delta": [],
+        "rewrites": True
+    }
+
+
+def _null_temporal(ctx):
+    if ctx["family"] != "temporal":
+        return None
+    return {
+        "cause": f"{ctx['null_ratio']:.1%} of {ctx['name']} is null: records arrive before their time is known, or date "
+                 f"strings do not match the parse format (to_date/to_timestamp return NULL on a mismatch).",
+        "sql": f"-- Inspect the rows to tell late-arriving records from parse failures\n"
+               f"SELECT * FROM {ctx['table']} WHERE {ctx['col']} IS NULL LIMIT 100;",
+        "python": f"# Parse with an explicit format and keep unparseable rows aside\n"
+                  f"unparsed = df.filter(F.col({ctx['name']!r}).isNull())\n"
+                  f"df = df.filter(F.col({ctx['name']!r}).isNotNull())",
+        "delta": []
+    }
+
+
+def _null_categorical(ctx):
+    if ctx["family"] != "string" or (ctx["distinct"] is not None and ctx["distinct"] > CATEGORY_MAX_DISTINCT):
+        return None
+    return {
+        "cause": f"{ctx['null_ratio']:.1%} of {ctx['name']} is null: the category is optional in the source and left empty "
+                 f"rather than set to an explicit value.",
+        "sql": f"UPDATE {ctx['table']} SET {ctx['col']} = 'UNKNOWN' WHERE {ctx['col']} IS NULL;",
+        "python": f"df = df.fillna({{{ctx['name']!r}: 'UNKNOWN'}})",
+        "delta": [
+            f"Default new rows to 'UNKNOWN': ALTER TABLE {ctx['table']} SET TBLPROPERTIES ('delta.feature.allowColumnDefaults' = 'supported'); "
+            f"ALTER TABLE {ctx['table']} ALTER COLUMN {ctx['col']} SET DEFAULT 'UNKNOWN'"
+        ],
+        "rewrites": True
+    }
+
+
+def _null_generic(ctx):
+    return {
+        "cause": f"{ctx['null_ratio']:.1%} of {ctx['name']} is null: the field is optional in the source, or an outer "
+                 f"join upstream finds no match for some rows.",
+        "sql": f"{_null_count(ctx)}\n"
+               f"-- Once the source is fixed, keep it that way\n"
+               f"ALTER TABLE {ctx['table']} ADD CONSTRAINT {ctx['constraint']}_not_null CHECK ({ctx['col']} IS NOT NULL);",
+        "python": f"df = df.filter(F.col({ctx['name']!r}).isNotNull())",
+        "delta": []
+    }
+
+
+def _duplicates_unconfirmed(ctx):
+    if not ctx["duplicates_estimated"]:
+        return None
+    bound = ctx["duplicate_check"].get("error_bound")
+    margin = f" (±{bound:,} rows)" if bound is not None else ""
+    within = " That is within the estimate's error bound, so there may be none." if ctx["duplicates_inconclusive"] else ""
+    return {
+        "cause": f"About {ctx['duplicates']:,} duplicate rows were estimated{margin} from a sketch, not counted.{within} "
+                 f"Confirm the exact count before removing any rows.",
+        "sql": f"-- Exact duplicate count; deduplicate only if it confirms the estimate\n"
+               f"SELECT COUNT(*) - (SELECT COUNT(*) FROM (SELECT DISTINCT * FROM {ctx['table']})) AS duplicate_rows "
+               f"FROM {ctx['table']};",
+        "python": "print(df.count() - df.dropDuplicates().count())",
+        "delta": []
+    }
+
+
+def _recency_column(ctx):
+    """The timestamp column most likely to order copies of a record by recency, or None."""
+    temporal = [name for name, col_type in ctx["column_types"].items() if _type_family(col_type) == "temporal"]
+    for pattern in RECENCY_NAMES:
+        for name in temporal:
+            if pattern.search(str(name)):
+                return name
+    return None
+
+
+def _duplicates_by_key(ctx):
+    if ctx["name"] in (None, "All"):
+        return None
+    keys = [key.strip() for key in ctx["name"].split(",")]
+    key_sql = ", ".join(f"`{key}`" for key in keys)
+    merge_on = " AND ".join(f"t.`{key}` = s.`{key}`" for key in keys)
+    recency = _recency_column(ctx)
+    if recency is not None:
+        order_sql, order_python = f"`{recency}` DESC", f"F.col({recency!r}).desc()"
+        keeps = f"The fix keeps the row with the latest {recency} per key."
+    else:
+        # Fails to parse until filled in, so the rewrite cannot run with an arbitrary survivor
+        order_sql, order_python = "<recency_column> DESC", "F.col('<recency_column>').desc()"
+        keeps = ("No timestamp column tells which copy is latest: replace <recency_column> with the column that "
+                 "orders versions of a record before running the fix, since ordering by the key alone keeps an "
+                 "arbitrary row per key.")
+    return {
+        "cause": f"{ctx['duplicates']:,} rows repeat the key ({', '.join(keys)}): new versions of records are appended "
+                 f"instead of merged, or the same batch is loaded more than once. {keeps}",
+        "sql": f"INSERT OVERWRITE {ctx['table']}\n"
+               f"SELECT * FROM {ctx['table']}\n"
+               f"QUALIFY ROW_NUMBER() OVER (PARTITION BY {key_sql} ORDER BY {order_sql}) = 1;",
+        "python": f"from pyspark.sql import Window\n"
+                  f"latest = Window.partitionBy(*{keys!r}).orderBy({order_python})\n"
+                  f"df = df.withColumn('_rn', F.row_number().over(latest)).filter('_rn = 1').drop('_rn')",
+        "delta": [
+            f"Load with MERGE INTO {ctx['table']} t USING updates s ON {merge_on} WHEN MATCHED THEN UPDATE SET * "
+            f"WHEN NOT MATCHED THEN INSERT * instead of appending",
+            f"OPTIMIZE {ctx['table']} ZORDER BY ({key_sql}) to keep the MERGE's key lookups fast"
+        ],
+        "rewrites": True
+    }
+
+
+def _duplicates_repeated_load(ctx):
+    if not ctx["row_count"] or ctx["duplicates"] / ctx["row_count"] < 0.45:
+        return None
+    return {
+        "cause": f"{ctx['duplicates']:,} of {ctx['row_count']:,} rows are exact copies, so a whole load was appended twice: "
+                 f"a retried or re-run job wrote its batch again.",
+        "sql": f"-- Find the repeated write, then roll back to the version before it\n"
+               f"DESCRIBE HISTORY {ctx['table']};\n"
+               f"RESTORE TABLE {ctx['table']} TO VERSION AS OF <version_before_duplicate_load>;",
+        "python": "df = df.dropDuplicates()",
+        "delta": [
+            "Make appends idempotent with the txnAppId/txnVersion writer options (or MERGE), so a retried batch is skipped"
+        ],
+        "rewrites": True
+    }
+
+
+def _duplicates_exact(ctx):
+    if ctx["name"] not in (None, "All"):
+        return None
+    delta = ["Ingest with Auto Loader or COPY INTO, which track processed files, so source files are not loaded twice"]
+    if ctx["potential_keys"]:
+        keys = ", ".join(f"`{key}`" for key in ctx["potential_keys"])
+        delta.append(f"{', '.join(ctx['potential_keys'])} look unique; MERGE on them (and OPTIMIZE {ctx['table']} ZORDER BY ({keys}))")
+    return {
+        "cause": f"{ctx['duplicates']:,} rows are exact duplicates: an at-least-once ingest (retried job, overlapping "
+                 f"backfill, or files picked up twice) appended the same records again.",
+        "sql": f"INSERT OVERWRITE {ctx['table']} SELECT DISTINCT * FROM {ctx['table']};",
+        "python": "df = df.dropDuplicates()",
+        "delta": delta,
+        "rewrites": True
+    }
+
+
+def _constant_column(ctx):
+    value = ctx["distribution"].get("min")
+    shown = f" ({_number(value)})" if value is not None else ""
+    never_set = " A constant 0 usually means the metric is never populated." if value == 0 else ""
+    return {
+        "cause": f"{ctx['name']} holds the same value{shown} in every row: a default filled in by the source or a "
+                 f"hard-coded literal in the pipeline, so it carries no information.{never_set}",
+        "sql": f"SELECT {ctx['col']}, COUNT(*) AS n FROM {ctx['table']} GROUP BY {ctx['col']};\n"
+               f"-- If the column is not needed: ALTER TABLE {ctx['table']} DROP COLUMN {ctx['col']};",
+        "python": f"df = df.drop({ctx['name']!r})",
+        "delta": []
+    }
+
+
+def _future_dates(ctx):
+    return {
+        "cause": f"{ctx['name']} has values after the current time: placeholder dates for open-ended records "
+                 f"(e.g. 9999-12-31), local times stored as UTC, or day and month swapped while parsing.",
+        "sql": f"SELECT {ctx['col']}, COUNT(*) AS n FROM {ctx['table']}\n"
+               f"WHERE {ctx['col']} > current_timestamp() GROUP BY {ctx['col']} ORDER BY n DESC LIMIT 20;\n"
+               f"UPDATE {ctx['table']} SET {ctx['col']} = NULL WHERE {ctx['col']} > current_timestamp() + INTERVAL 1 DAY;",
+        "python": f"df = df.withColumn({ctx['name']!r}, F.when(F.col({ctx['name']!r}) > F.current_timestamp(), None)"
+                  f".otherwise(F.col({ctx['name']!r})))",
+        "delta": [],
+        "rewrites": True
+    }
+
+
+# Rules per issue type, most specific first; the first that applies covers the issue
+RULES = {
+    "High Null Ratio": [
+        ("null_inconclusive", _null_inconclusive),
+        ("null_mostly_empty", _null_mostly_empty),
+        ("null_key_column", _null_key_column),
+        ("null_numeric", _null_numeric),
+        ("null_temporal", _null_temporal),
+        ("null_categorical", _null_categorical),
+        ("null_generic", _null_generic)
+    ],
+    "Duplicate Rows": [
+        ("duplicates_unconfirmed", _duplicates_unconfirmed),
+        ("duplicates_by_key", _duplicates_by_key),
+        ("duplicates_repeated_load", _duplicates_repeated_load),
+        ("duplicates_exact", _duplicates_exact)
+    ],
+    "Zero Variance": [("constant_column", _constant_column)],
+    "Future Dates Detected": [("future_dates", _future_dates)]
+}
+
+
+class RuleEngine:
+    """Deterministic analysis of DQ results from rules keyed on issue type.
+
+    Within an issue type, rules look at the column's type, the issue's
+    severity, the column's null ratio and cardinality (distinct count, likely
+    keys) to pick the likely root cause and concrete SQL, PySpark and Delta
+    fixes for the table. The analysis has the same fields as an LLM analysis
+    and takes microseconds; issues no rule covers are listed in
+    'uncovered_issues' so only those need the LLM.
+    """
+
+    @staticmethod
+    def analyze(dq_results):
+        """
+        Analyzes DQ results with the rules.
+
+        Returns:
+            dict with root_cause_analysis, pipeline_health, recommended_sql_fixes,
+            recommended_python_fixes, delta_optimizations and summary, plus
+            'analysis_source' ('rules'), 'rule_matches' and 'uncovered_issues'
+        """
+        issues = sorted(dq_results.get("issues", []), key=lambda issue: -SEVERITY_RANK.get(issue.get("severity"), 0))
+        findings = []
+        uncovered = []
+        for issue in issues:
+            ctx = RuleEngine._context(dq_results, issue)
+            for name, rule in RULES.get(issue.get("type"), []):
+                finding = rule(ctx)
+                if finding is not None:
+                    findings.append((issue, name, finding))
+                    break
+            else:
+                uncovered.append(issue)
+
+        table = RuleEngine._table(dq_results)
+        causes, sql, python, delta = [], [], [], []
+        for issue, _, finding in findings:
+            title = f"{issue.get('type')} ({issue.get('column')})"
+            causes.append(f"- {title}: {finding['cause']}")
+            sql.append(f"-- {title}\n{finding['sql']}")
+            python.append(f"# {title}\n{finding['python']}")
+            delta.extend(item for item in finding["delta"] if item not in delta)
+        delta.extend(item for item in RuleEngine._table_recommendations(dq_results, table, findings) if item not in delta)
+
+        python_header = f"from pyspark.sql import functions as F\n\ndf = spark.table({table!r})\n\n"
+        nothing = "No issues found" if not issues else "No built-in rule covers these issues"
+        analysis = {
+            "root_cause_analysis": "\n".join(causes) if causes else f"{nothing}.",
+            "pipeline_health": RuleEngine._health(issues),
+            "recommended_sql_fixes": "\n\n".join(sql) if sql else f"-- {nothing}",
+            "recommended_python_fixes": python_header + "\n\n".join(python) if python else f"# {nothing}",
+            "delta_optimizations": delta,
+            "summary": RuleEngine._summary(dq_results, issues, uncovered),
+            "analysis_source": "rules",
+            "rule_matches": [{"type": issue.get("type"), "column": issue.get("column"), "rule": name} for issue, name, _ in findings],
+            "uncovered_issues": uncovered
+        }
+        logger.info(f"Rules covered {len(findings)} of {len(issues)} issues in {dq_results.get('source')}")
+        return analysis
+
+    @staticmethod
+    def merge(rules_analysis, llm_analysis):
+        """Combines a rules analysis with an LLM analysis of the issues it did not cover."""
+        merged = dict(rules_analysis)
+        for field in ("root_cause_analysis", "recommended_sql_fixes", "recommended_python_fixes", "summary"):
+            extra = llm_analysis.get(field)
+            if isinstance(extra, list):
+                extra = "\n".join(str(item) for item in extra)
+            if extra:
+                merged[field] = f"{rules_analysis[field]}\n\n{extra}" if rules_analysis.get("rule_matches") else str(extra)
+        extra_delta = llm_analysis.get("delta_optimizations") or []
+        if isinstance(extra_delta, str):
+            extra_delta = [extra_delta]
+        merged["delta_optimizations"] = rules_analysis["delta_optimizations"] + [
+            item for item in extra_delta if item not in rules_analysis["delta_optimizations"]
+        ]
+        merged["analysis_source"] = "rules+llm"
+        if "prompt_stats" in llm_analysis:
+            merged["prompt_stats"] = llm_analysis["prompt_stats"]
+        return merged
+
+    @staticmethod
+    def _table(dq_results):
+        if dq_results.get("source_type") == "table":
+            return dq_results.get("source")
+        # Files are fixed once loaded into a table; the SQL uses a placeholder name for it
+        return "target_table"
+
+    @staticmethod
+    def _context(dq_results, issue):
+        name = issue.get("column")
+        row_count = dq_results.get("row_count") or 0
+        nulls = dq_results.get("missing_values", {}).get(name)
+        distinct = dq_results.get("distinct_counts", {}).get(name)
+        potential_keys = dq_results.get("potential_keys") or []
+        col_type = dq_results.get("column_types", {}).get(name)
+        duplicate_check = dq_results.get("duplicate_check") or {}
+        return {
+            "issue": issue,
+            "name": name,
+            "col": f"`{name}`",
+            "constraint": re.sub(r"\W", "_", str(name)).lower(),
+            "table": RuleEngine._table(dq_results),
+            "severity": issue.get("severity"),
+            "family": _type_family(col_type),
+            "null_ratio": nulls / row_count if nulls is not None and row_count else 0.0,
+            "distinct": distinct,
+            "is_key": name in potential_keys or bool(KEY_NAME.search(str(name)))
+                      or bool(distinct and row_count and distinct / row_count > 0.99),
+            "potential_keys": potential_keys,
+            "distribution": dq_results.get("numeric_distribution", {}).get(name) or {},
+            "column_types": dq_results.get("column_types", {}),
+            "duplicates": dq_results.get("duplicates") or 0,
+            "duplicate_check": duplicate_check,
+            # Sketch estimates (HLL, Bloom filter) are confirmed before any rows are removed
+            "duplicates_estimated": bool(duplicate_check.get("estimated")) or bool(duplicate_check.get("inconclusive")),
+            "duplicates_inconclusive": bool(duplicate_check.get("inconclusive")),
+            "row_count": row_count
+        }
+
+    @staticmethod
+    def _table_recommendations(dq_results, table, findings):
+        recommendations = []
+        if dq_results.get("source_type") != "table":
+            return recommendations
+        plan = dq_results.get("scan_plan") or {}
+        files, size = plan.get("num_files"), plan.get("size_bytes")
+        if files and size is not None and files >= SMALL_FILE_MIN_FILES and size / files < SMALL_FILE_BYTES:
+            recommendations.append(
+                f"{files:,} files averaging {size / files / (1 << 20):.1f} MB: run OPTIMIZE {table} and set "
+                f"'delta.autoOptimize.optimizeWrite' = 'true' and 'delta.autoOptimize.autoCompact' = 'true'"
+            )
+        if any(finding.get("rewrites") for _, _, finding in findings):
+            recommendations.append(f"After applying the fixes, VACUUM {table} (past the retention period) to remove the rewritten files")
+        return recommendations
+
+    @staticmethod
+    def _health(issues):
+        severities = Counter(issue.get("severity") for issue in issues)
+        if severities["High"]:
+            return "At Risk"
+        if severities["Medium"]:
+            return "Needs Attention"
+        return "Healthy"
+
+    @staticmethod
+    def _summary(dq_results, issues, uncovered):
+        source = dq_results.get("source", "the data")
+        if not issues:
+            return f"No data quality issues found in {source} ({dq_results.get('row_count') or 0:,} rows)."
+        severities = Counter(issue.get("severity") for issue in issues)
+        counts = ", ".join(f"{severities[level]} {level}" for level in ("High", "Medium", "Low") if severities[level])
+        top = issues[0]
+        summary = (f"{len(issues)} issue{'s' if len(issues) != 1 else ''} in {source} ({counts}); most severe: "
+                   f"{top.get('type')} on {top.get('column')}.")
+        if uncovered:
+            summary += f" {len(uncovered)} not covered by the built-in rules."
+        return summary
@@ -0,0 +1,253 @@
+import asyncio
+import json
+import sqlite3
+import time
+import uuid
+from utils import get_logger
+
+logger = get_logger(__name__)
+
+TERMINAL_STATES = ("complete", "failed", "cancelled")
+
+
+class ScanJob:
+    """A single scan running in the background, with progress that can be polled or streamed."""
+
+    def __init__(self, scan_id, request, store=None, persist_interval_seconds=1.0):
+        self.scan_id = scan_id
+        self.request = request
+        self.store = store
+        self.persist_interval_seconds = persist_interval_seconds
+        self.status = "queued"
+        self.stage = "Queued"
+        self.progress = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.task = None
+        self._subscribers = []
+        self._persisted_status = None
+        self._persisted_at = 0.0
+        self._persist_due = None
+        self._persist_wake = asyncio.Event()
+        self._writer = None
+
+    def update(self, stage=None, progress=None, status=None):
+        """Records a progress step and notifies any SSE subscribers."""
+        if stage is not None:
+            self.stage = stage
+        if progress is not None:
+            self.progress = progress
+        if status is not None:
+            self.status = status
+        self.updated_at = time.time()
+        logger.info(f"Scan {self.scan_id}: {self.stage} ({self.progress}%)")
+        self.persist()
+        self.publish("progress", self.snapshot())
+
+    def persist(self):
+        """Queues a write of the job's status to the scan store so other workers can see it.
+
+        Writes run in a thread, one at a time per job, and always store the latest
+        state. A status change is written straight away; progress within a status is
+        written at most once per persist_interval_seconds.
+        """
+        if self.store is None:
+            return
+        now = time.monotonic()
+        due = now if self.status != self._persisted_status else max(now, self._persisted_at + self.persist_interval_seconds)
+        if self._persist_due is None or due < self._persist_due:
+            self._persist_due = due
+            self._persist_wake.set()
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_status())
+
+    async def flush(self):
+        """Waits for queued status writes to reach the store."""
+        if self._persist_due is not None:
+            self._persist_due = time.monotonic()
+            self._persist_wake.set()
+        if self._writer is not None:
+            await asyncio.shield(self._writer)
+
+    async def _write_status(self):
+        while self._persist_due is not None:
+            wait = self._persist_due - time.monotonic()
+            if wait > 0:
+                self._persist_wake.clear()
+                try:
+                    await asyncio.wait_for(self._persist_wake.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._persist_due = None
+            self._persisted_status = self.status
+            self._persisted_at = time.monotonic()
+            try:
+                await asyncio.to_thread(
+                    self.store.save_status,
+                    self.scan_id, self.status,
+                    stage=self.stage,
+                    progress=self.progress,
+                    error=self.error,
+                    request=self.request.model_dump() if hasattr(self.request, "model_dump") else None
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist status of scan {self.scan_id}: {e}")
+
+    def publish(self, event, data):
+        for queue in list(self._subscribers):
+            queue.put_nowait((event, data))
+
+    def subscribe(self):
+        queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    @property
+    def done(self):
+        return self.status in TERMINAL_STATES
+
+    def snapshot(self, include_result=False):
+        data = {
+            "scan_id": self.scan_id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
+        if include_result and self.result is not None:
+            data.update(self.result)
+            data["status"] = self.status
+        return data
+
+
+class ScanJobManager:
+    """Runs scans as asyncio tasks so POST /api/scan can return a job id immediately.
+
+    Finished jobs are kept (up to max_finished_jobs) so clients can still poll
+    their final state after completion. With a scan store, status changes are
+    also persisted so a scan started on one worker can be followed from another.
+    """
+
+    def __init__(self, max_finished_jobs=500, store=None, persist_interval_seconds=1.0):
+        self.jobs = {}
+        self.max_finished_jobs = max_finished_jobs
+        self.store = store
+        self.persist_interval_seconds = persist_interval_seconds
+
+    def submit(self, request, runner, scan_id=None):
+        """Starts runner(job) in the background and returns the job.
+
+        Args:
+            request: The originating request model (kept on the job for reference)
+            runner: Async callable taking the ScanJob and returning the final result dict
+            scan_id: Optional id to use instead of a fresh UUID
+        """
+        job = ScanJob(scan_id or str(uuid.uuid4()), request, store=self.store,
+                      persist_interval_seconds=self.persist_interval_seconds)
+        self.jobs[job.scan_id] = job
+        job.persist()
+        job.task = asyncio.create_task(self._run(job, runner))
+        return job
+
+    def get(self, scan_id):
+        return self.jobs.get(scan_id)
+
+    async def cancel(self, scan_id, wait_seconds=5):
+        """Cancels a running job's task and waits briefly for it to wind down.
+
+        Returns:
+            The job, or None if it is not running in this worker
+        """
+        job = self.jobs.get(scan_id)
+        if job is None or job.done:
+            return job
+        job.task.cancel()
+        await asyncio.wait([job.task], timeout=wait_seconds)
+        return job
+
+    async def _run(self, job, runner):
+        job.update(stage="Starting scan", progress=1, status="running")
+        try:
+            job.result = await runner(job)
+            job.update(stage="Complete", progress=100, status="complete")
+        except asyncio.CancelledError:
+            # Cancelled through cancel(); the task ends here, so the error is not re-raised
+            logger.info(f"Scan {job.scan_id} cancelled")
+            job.error = "Cancelled"
+            job.update(stage="Cancelled", status="cancelled")
+        except Exception as e:
+            logger.error(f"Scan {job.scan_id} failed: {e}")
+            job.error = str(e)
+            job.update(stage="Failed", status="failed")
+        finally:
+            # Other workers following this scan through the store see it end before its subscribers do
+            await job.flush()
+            job.publish("end", job.snapshot(include_result=True))
+            self._prune()
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job.done]
+        excess = len(finished) - self.max_finished_jobs
+        if excess > 0:
+            for job in sorted(finished, key=lambda j: j.updated_at)[:excess]:
+                del self.jobs[job.scan_id]
+
+    async def stream(self, job, keepalive_seconds=15):
+        """Yields server-sent events for a job until it finishes.
+
+        Besides 'progress' and the final 'end', a scan publishes 'results' (its DQ results,
+        before the AI analysis has run) and 'analysis_token' (each piece of streamed analysis).
+        """
+        queue = job.subscribe()
+        try:
+            yield _format_sse("progress", job.snapshot())
+            if job.done:
+                yield _format_sse("end", job.snapshot(include_result=True))
+                return
+            if job.result is not None:
+                # Subscribed after the results were published; replay them before following on
+                yield _format_sse("results", job.result)
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _format_sse(event, data)
+                if event == "end":
+                    return
+        finally:
+            job.unsubscribe(queue)
+
+    async def stream_stored(self, scan_id, load, poll_seconds=1.0):
+        """Yields server-sent events for a scan running in another worker by polling the store.
+
+        Args:
+            scan_id: Scan to follow
+            load: Async callable(scan_id, include_result) returning the scan's snapshot dict or None
+        """
+        last = None
+        while True:
+            snapshot = await load(scan_id, False)
+            if snapshot is None:
+                return
+            if snapshot != last:
+                yield _format_sse("progress", snapshot)
+                last = snapshot
+            if snapshot["status"] in TERMINAL_STATES:
+                yield _format_sse("end", await load(scan_id, True))
+                return
+            await asyncio.sleep(poll_seconds)
+
+
+def _format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,161 @@
+import asyncio
+from dbx_cli import DatabricksCLI
+from query_planner import QueryPlanner, DISTINCT_TYPES
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+# Strategies from heaviest to lightest; a request heavier than the recommendation needs confirming
+STRATEGIES = ("full", "approximate", "sampled")
+
+# Exact distinct counts shuffle every distinct value, so they run several times slower than a plain scan
+EXACT_DISTINCT_SLOWDOWN = 3.0
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if size < 1000 or unit == "TB":
+            return f"{size:,.0f} {unit}" if unit == "B" else f"{size:,.1f} {unit}"
+        size /= 1000
+
+
+def _format_seconds(seconds):
+    if seconds < 90:
+        return f"{seconds:.0f}s"
+    if seconds < 5400:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ScanPlanner:
+    """Estimates the cost of a push-down table scan from metadata before any heavy SQL runs.
+
+    Table size and file count come from DESCRIBE DETAIL and the row count from
+    the table's statistics properties (when ANALYZE TABLE has run); both are
+    cached with the rest of the Unity Catalog metadata. From the size, the
+    planner recommends a strategy: a full exact profile up to
+    SCAN_APPROXIMATE_ABOVE_BYTES, approximate sketches up to
+    SCAN_SAMPLE_ABOVE_BYTES, and an approximate TABLESAMPLE beyond that. A
+    request heavier than its recommendation must be confirmed before it runs.
+    """
+
+    @staticmethod
+    async def plan(table_name, profile_mode="exact", duplicate_mode=None, sampling=None, incremental=False):
+        """
+        Plans a scan of a Unity Catalog table.
+
+        Args:
+            table_name: Fully qualified table name
+            profile_mode, duplicate_mode, sampling, incremental: The scan's settings, as on ScanRequest
+
+        Returns:
+            dict with the table's size, the requested and recommended strategies,
+            'recommended_options' (ScanRequest fields), the estimated bytes scanned
+            and duration, 'requires_confirmation' and a one-line 'summary'
+        """
+        catalog, schema, table = table_name.split(".")
+        table_info, detail = await asyncio.gather(
+            DatabricksCLI.get_table_info(catalog, schema, table),
+            DatabricksCLI.describe_detail(table_name)
+        )
+        columns = [] if table_info.get("mock") else table_info.get("columns", [])
+        properties = table_info.get("properties") or {}
+        size_bytes = _int_or_none(detail.get("sizeInBytes"))
+        duplicate_mode = duplicate_mode or profile_mode
+
+        plan = {
+            "table": table_name,
+            "size_bytes": size_bytes,
+            "num_files": _int_or_none(detail.get("numFiles")),
+            "row_estimate": _int_or_none(properties.get("spark.sql.statistics.numRows")),
+            "last_modified": detail.get("lastModified"),
+            "column_count": len(columns),
+            "exact_distinct_columns": sum(1 for col in columns if col.get("type_name", "STRING").upper() in DISTINCT_TYPES)
+                                      if profile_mode == "exact" else 0,
+            "batches": len(QueryPlanner.plan_batches(columns, profile_mode)) if columns else None,
+            "requested_strategy": ScanPlanner._requested_strategy(profile_mode, duplicate_mode, sampling, incremental),
+            "recommended_strategy": None,
+            "recommended_options": {},
+            "scanned_bytes": None,
+            "estimated_seconds": None,
+            "requires_confirmation": False
+        }
+
+        if size_bytes is None:
+            plan["summary"] = f"Size of {table_name} unknown ({detail.get('error', 'no DESCRIBE DETAIL')}); no estimate"
+            return plan
+
+        recommended, options = ScanPlanner._recommend(size_bytes)
+        plan["recommended_strategy"] = recommended
+        plan["recommended_options"] = options
+        plan["scanned_bytes"] = ScanPlanner._scanned_bytes(plan, sampling, duplicate_mode)
+        slowdown = EXACT_DISTINCT_SLOWDOWN if plan["exact_distinct_columns"] or duplicate_mode == "exact" else 1.0
+        plan["estimated_seconds"] = round(plan["scanned_bytes"] / config["scan_planner_bytes_per_second"] * slowdown, 1)
+
+        requested = plan["requested_strategy"]
+        if requested != "incremental" and STRATEGIES.index(requested) < STRATEGIES.index(recommended):
+            plan["requires_confirmation"] = True
+        plan["summary"] = (
+            f"{table_name}: {_format_bytes(size_bytes)} in {plan['num_files'] or 0:,} files; "
+            f"{requested} scan reads ~{_format_bytes(plan['scanned_bytes'])} "
+            f"(~{_format_seconds(plan['estimated_seconds'])}); recommended: {recommended}"
+        )
+        logger.info(f"Scan plan: {plan['summary']}")
+        return plan
+
+    @staticmethod
+    def _requested_strategy(profile_mode, duplicate_mode, sampling, incremental):
+        if incremental:
+            return "incremental"
+        if sampling:
+            return "sampled"
+        # Exact duplicate detection hashes every row, so it is as heavy as an exact profile
+        if profile_mode == "exact" or duplicate_mode == "exact":
+            return "full"
+        return "approximate"
+
+    @staticmethod
+    def _recommend(size_bytes):
+        """Returns the recommended strategy for a table size and the ScanRequest options that select it."""
+        if size_bytes <= config["scan_approximate_above_bytes"]:
+            return "full", {"profile_mode": "exact"}
+        if size_bytes <= config["scan_sample_above_bytes"]:
+            return "approximate", {"profile_mode": "approximate", "duplicate_mode": "approximate"}
+        # Sample down to roughly the largest table that would be profiled without sampling
+        percent = max(0.01, round(100 * config["scan_approximate_above_bytes"] / size_bytes, 2))
+        return "sampled", {"profile_mode": "approximate", "duplicate_mode": "approximate", "sample_percent": percent}
+
+    @staticmethod
+    def rows_to_percent(sample_rows, row_estimate):
+        """
+        Converts a sample_rows request into the TABLESAMPLE PERCENT that reads about as many rows.
+
+        TABLESAMPLE (n ROWS) is a LIMIT on Databricks (the first rows of the first files), so a
+        random sample of a given size has to be asked for as a fraction of the table instead.
+
+        Returns:
+            The percentage, or None when the table's row count is unknown
+        """
+        if not row_estimate:
+            return None
+        return min(100.0, max(0.01, round(100 * sample_rows / row_estimate, 2)))
+
+    @staticmethod
+    def _scanned_bytes(plan, sampling, duplicate_mode):
+        """Estimated bytes read: the profile's scan, plus a second one for duplicate detection."""
+        size_bytes = plan["size_bytes"]
+        fraction = 1.0
+        if sampling and sampling["method"] == "percent":
+            fraction = sampling["value"] / 100
+        elif sampling and plan["row_estimate"]:
+            fraction = min(1.0, sampling["value"] / plan["row_estimate"])
+        scans = 1 if duplicate_mode == "none" else 2
+        return int(size_bytes * fraction * scans)
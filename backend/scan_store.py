@@ -0,0 +1,373 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+# Summary columns callers may set through ScanStore.update()
+UPDATABLE_FIELDS = ("status", "stage", "progress", "error", "report_path", "notebook_local_path", "notebook_filename")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    scan_id TEXT PRIMARY KEY,
+    source TEXT,
+    source_type TEXT,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress INTEGER,
+    error TEXT,
+    dq_score INTEGER,
+    issue_count INTEGER,
+    row_count INTEGER,
+    report_path TEXT,
+    notebook_local_path TEXT,
+    notebook_filename TEXT,
+    request TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scans_source_created ON scans (source, created_at);
+CREATE INDEX IF NOT EXISTS idx_scans_created ON scans (created_at);
+CREATE TABLE IF NOT EXISTS scan_payloads (
+    scan_id TEXT PRIMARY KEY REFERENCES scans (scan_id) ON DELETE CASCADE,
+    dq_results BLOB,
+    ai_analysis BLOB
+);
+"""
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, default=str).encode("utf-8"), 1)
+
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8")) if blob is not None else None
+
+
+class ScanStore(ABC):
+    """Interface for scan persistence.
+
+    A scan record is a flat summary (status, source, score, paths, timestamps)
+    plus a separately loaded payload holding the full dq_results and
+    ai_analysis, so listings and status polls never deserialize large results.
+    """
+
+    @abstractmethod
+    def save_status(self, scan_id, status, stage=None, progress=None, error=None, request=None):
+        ...
+
+    @abstractmethod
+    def save_result(self, scan_id, dq_results, ai_analysis, report_path=None, request=None):
+        ...
+
+    @abstractmethod
+    def update(self, scan_id, **fields):
+        ...
+
+    @abstractmethod
+    def get(self, scan_id, include_payload=False):
+        ...
+
+    @abstractmethod
+    def get_payload(self, scan_id):
+        ...
+
+    @abstractmethod
+    def list(self, source=None, since=None, limit=50):
+        ...
+
+    @abstractmethod
+    def last_scanned(self, sources):
+        ...
+
+    @abstractmethod
+    def evict(self):
+        ...
+
+
+class SQLiteScanStore(ScanStore):
+    """Scan store in a SQLite database (WAL mode) shared by every uvicorn worker.
+
+    Summaries are indexed by scan id, source table and creation time; result
+    payloads live in their own table as compressed JSON and are only read when
+    asked for. Old scans are evicted by age (retention_days) and count
+    (max_scans), checked at most once per evict_interval_seconds.
+    """
+
+    def __init__(self, path, retention_days=30, max_scans=100000, evict_interval_seconds=60):
+        self.path = path
+        self.retention_days = retention_days
+        self.max_scans = max_scans
+        self.evict_interval_seconds = evict_interval_seconds
+        self._local = threading.local()
+        self._last_evict = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        logger.info(f"Scan store ready at {path}")
+
+    def _connect(self):
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def save_status(self, scan_id, status, stage=None, progress=None, error=None, request=None):
+        """Creates or updates a scan's summary row (called on every progress step)."""
+        now = time.time()
+        request = request or {}
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO scans (scan_id, source, source_type, status, stage, progress, error, request, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (scan_id) DO UPDATE SET
+                    status = excluded.status,
+                    stage = COALESCE(excluded.stage, stage),
+                    progress = COALESCE(excluded.progress, progress),
+                    error = excluded.error,
+                    updated_at = excluded.updated_at
+                """,
+                (scan_id, request.get("path"), request.get("type"), status, stage, progress, error,
+                 json.dumps(request) if request else None, now, now)
+            )
+
+    def save_result(self, scan_id, dq_results, ai_analysis, report_path=None, request=None):
+        """Stores a finished scan's summary and payload, and marks it complete."""
+        now = time.time()
+        request = request or {}
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO scans (scan_id, source, source_type, status, dq_score, issue_count, row_count,
+                                   report_path, request, created_at, updated_at)
+                VALUES (?, ?, ?, 'complete', ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (scan_id) DO UPDATE SET
+                    status = 'complete',
+                    error = NULL,
+                    source = excluded.source,
+                    source_type = excluded.source_type,
+                    dq_score = excluded.dq_score,
+                    issue_count = excluded.issue_count,
+                    row_count = excluded.row_count,
+                    report_path = excluded.report_path,
+                    request = excluded.request,
+                    updated_at = excluded.updated_at
+                """,
+                (scan_id, dq_results.get("source", request.get("path")), dq_results.get("source_type", request.get("type")),
+                 dq_results.get("dq_score"), len(dq_results.get("issues", [])), dq_results.get("row_count"),
+                 report_path, json.dumps(request), now, now)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO scan_payloads (scan_id, dq_results, ai_analysis) VALUES (?, ?, ?)",
+                (scan_id, _pack(dq_results), _pack(ai_analysis))
+            )
+        self._maybe_evict()
+
+    def update(self, scan_id, **fields):
+        unknown = set(fields) - set(UPDATABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot update scan fields: {', '.join(sorted(unknown))}")
+        if not fields:
+            return
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE scans SET {assignments}, updated_at = ? WHERE scan_id = ?",
+                (*fields.values(), time.time(), scan_id)
+            )
+
+    def get(self, scan_id, include_payload=False):
+        """Returns a scan's summary (and payload if requested), or None."""
+        row = self._connect().execute("SELECT * FROM scans WHERE scan_id = ?", (scan_id,)).fetchone()
+        if row is None:
+            return None
+        scan = self._summary(row)
+        if include_payload:
+            scan.update(self.get_payload(scan_id) or {"dq_results": None, "ai_analysis": None})
+        return scan
+
+    def get_payload(self, scan_id):
+        row = self._connect().execute(
+            "SELECT dq_results, ai_analysis FROM scan_payloads WHERE scan_id = ?", (scan_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"dq_results": _unpack(row["dq_results"]), "ai_analysis": _unpack(row["ai_analysis"])}
+
+    def list(self, source=None, since=None, limit=50):
+        """Most recent scan summaries, optionally for one source and/or after a timestamp."""
+        clauses = []
+        params = []
+        if source:
+            clauses.append("source = ?")
+            params.append(source)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT * FROM scans {where} ORDER BY created_at DESC LIMIT ?", (*params, limit)
+        ).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def last_scanned(self, sources):
+        """Returns {source: created_at} of the latest completed scan of each source that has one."""
+        sources = list(sources)
+        last = {}
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(sources), 500):
+            chunk = sources[start:start + 500]
+            rows = self._connect().execute(
+                f"""
+                SELECT source, MAX(created_at) AS created_at FROM scans
+                WHERE status = 'complete' AND source IN ({', '.join('?' * len(chunk))})
+                GROUP BY source
+                """,
+                chunk
+            ).fetchall()
+            last.update((row["source"], row["created_at"]) for row in rows)
+        return last
+
+    def evict(self):
+        """Deletes scans past the retention period and the oldest beyond max_scans.
+
+        Returns:
+            Number of scans removed
+        """
+        removed = 0
+        with self._connect() as conn:
+            if self.retention_days:
+                cutoff = time.time() - self.retention_days * 86400
+                removed += conn.execute("DELETE FROM scans WHERE created_at < ?", (cutoff,)).rowcount
+            if self.max_scans:
+                removed += conn.execute(
+                    """
+                    DELETE FROM scans WHERE created_at < (
+                        SELECT created_at FROM scans ORDER BY created_at DESC LIMIT 1 OFFSET ?
+                    )
+                    """,
+                    (self.max_scans - 1,)
+                ).rowcount
+        if removed:
+            logger.info(f"Evicted {removed} scans from the scan store")
+        return removed
+
+    def _maybe_evict(self):
+        now = time.monotonic()
+        if now - self._last_evict >= self.evict_interval_seconds:
+            self._last_evict = now
+            self.evict()
+
+    @staticmethod
+    def _summary(row):
+        scan = dict(row)
+        scan["request"] = json.loads(scan["request"]) if scan["request"] else None
+        return scan
+
+
+class MemoryScanStore(ScanStore):
+    """In-process scan store for single-worker demos; nothing survives a restart."""
+
+    def __init__(self, max_scans=500):
+        self.max_scans = max_scans
+        self._scans = {}
+        self._payloads = {}
+
+    def save_status(self, scan_id, status, stage=None, progress=None, error=None, request=None):
+        now = time.time()
+        request = request or {}
+        scan = self._scans.setdefault(scan_id, {
+            "scan_id": scan_id,
+            "source": request.get("path"),
+            "source_type": request.get("type"),
+            "request": request or None,
+            "created_at": now
+        })
+        scan["status"] = status
+        if stage is not None:
+            scan["stage"] = stage
+        if progress is not None:
+            scan["progress"] = progress
+        scan["error"] = error
+        scan["updated_at"] = now
+
+    def save_result(self, scan_id, dq_results, ai_analysis, report_path=None, request=None):
+        self.save_status(scan_id, "complete", request=request)
+        self._scans[scan_id].update({
+            "dq_score": dq_results.get("dq_score"),
+            "issue_count": len(dq_results.get("issues", [])),
+            "row_count": dq_results.get("row_count"),
+            "report_path": report_path
+        })
+        self._payloads[scan_id] = {"dq_results": dq_results, "ai_analysis": ai_analysis}
+        self.evict()
+
+    def update(self, scan_id, **fields):
+        unknown = set(fields) - set(UPDATABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot update scan fields: {', '.join(sorted(unknown))}")
+        if scan_id in self._scans:
+            self._scans[scan_id].update(fields, updated_at=time.time())
+
+    def get(self, scan_id, include_payload=False):
+        scan = self._scans.get(scan_id)
+        if scan is None:
+            return None
+        scan = dict(scan)
+        if include_payload:
+            scan.update(self.get_payload(scan_id) or {"dq_results": None, "ai_analysis": None})
+        return scan
+
+    def get_payload(self, scan_id):
+        return self._payloads.get(scan_id)
+
+    def list(self, source=None, since=None, limit=50):
+        scans = [
+            dict(scan) for scan in self._scans.values()
+            if (not source or scan["source"] == source) and (since is None or scan["created_at"] >= since)
+        ]
+        return sorted(scans, key=lambda s: s["created_at"], reverse=True)[:limit]
+
+    def last_scanned(self, sources):
+        sources = set(sources)
+        last = {}
+        for scan in self._scans.values():
+            if scan["source"] in sources and scan["status"] == "complete":
+                last[scan["source"]] = max(last.get(scan["source"], 0), scan["created_at"])
+        return last
+
+    def evict(self):
+        excess = len(self._scans) - self.max_scans
+        if excess <= 0:
+            return 0
+        for scan in sorted(self._scans.values(), key=lambda s: s["created_at"])[:excess]:
+            del self._scans[scan["scan_id"]]
+            self._payloads.pop(scan["scan_id"], None)
+        return excess
+
+
+def create_scan_store():
+    """Builds the scan store selected by SCAN_STORE_BACKEND ('sqlite' or 'memory')."""
+    if config["scan_store_backend"] == "memory":
+        return MemoryScanStore(max_scans=config["scan_store_max_scans"])
+    return SQLiteScanStore(
+        config["scan_store_path"],
+        retention_days=config["scan_store_retention_days"],
+        max_scans=config["scan_store_max_scans"]
+    )
@@ -0,0 +1,158 @@
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict
+from http_client import DatabricksHTTP
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+# Scan the current task works for; set by the scan runner and inherited by the tasks it starts
+current_scan_id = contextvars.ContextVar("current_scan_id", default=None)
+
+RUNNING_STATES = ("PENDING", "RUNNING")
+
+# Cancelled scan ids remembered so their late statements are refused (oldest forgotten first)
+MAX_CANCELLED_SCANS = 1000
+
+
+class StatementManager:
+    """Runs SQL statements to completion, a deadline, or cancellation.
+
+    Statements are polled with exponential backoff (SQL_POLL_INITIAL_SECONDS
+    growing to SQL_POLL_MAX_SECONDS), so quick statements return promptly
+    and long ones cost few requests. A statement still running at its deadline
+    (SQL_STATEMENT_TIMEOUT_SECONDS) is cancelled on the warehouse rather than
+    left running, as is one whose caller is cancelled or whose polling fails.
+    Statements are tracked by the scan that started them, so cancelling a scan
+    also cancels its statements, including those issued by tasks it spawned.
+    """
+
+    def __init__(self):
+        self.statements = {}
+        self._cancelled_scans = OrderedDict()
+
+    async def execute(self, payload, timeout=None):
+        """
+        Submits a statement and waits for it to reach a terminal state.
+
+        Args:
+            payload: Body for POST /api/2.0/sql/statements
+            timeout: Overall deadline in seconds (defaults to SQL_STATEMENT_TIMEOUT_SECONDS)
+
+        Returns:
+            The statement's final JSON, or {'error': ...} if it timed out or its scan was cancelled
+        """
+        scan_id = current_scan_id.get()
+        if scan_id in self._cancelled_scans:
+            return {"error": f"Scan {scan_id} was cancelled"}
+        timeout = config["sql_statement_timeout_seconds"] if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        post = asyncio.ensure_future(DatabricksHTTP.request("POST", "/api/2.0/sql/statements", json=payload))
+        try:
+            # Shielded so that, if we are cancelled mid-request, the statement can still be cancelled once its id is known
+            response = await asyncio.shield(post)
+        except asyncio.CancelledError:
+            post.add_done_callback(self._cancel_posted)
+            raise
+        response.raise_for_status()
+        result = response.json()
+        statement_id = result.get("statement_id", "")
+        if result.get("status", {}).get("state") not in RUNNING_STATES:
+            return result
+
+        self.statements[statement_id] = {"scan_id": scan_id, "started_at": time.time()}
+        try:
+            if scan_id in self._cancelled_scans:
+                # The scan was cancelled while the statement was being submitted
+                await self.cancel(statement_id)
+                return {"error": f"Scan {scan_id} was cancelled"}
+            return await self._poll(statement_id, scan_id, result, deadline, timeout)
+        except (asyncio.CancelledError, Exception) as e:
+            # Whether our caller was cancelled or polling failed (e.g. a network error), nobody
+            # will wait for this statement any more, so stop it on the warehouse too
+            if not isinstance(e, asyncio.CancelledError):
+                logger.warning(f"Polling statement {statement_id} failed ({e}); cancelling it")
+            await asyncio.shield(self.cancel(statement_id))
+            raise
+        finally:
+            self.statements.pop(statement_id, None)
+
+    async def _poll(self, statement_id, scan_id, result, deadline, timeout):
+        delay = config["sql_poll_initial_seconds"]
+        polls = 0
+        state = result.get("status", {}).get("state", "")
+        while state in RUNNING_STATES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"Statement {statement_id} still {state} after {timeout:.0f}s; cancelling it")
+                await self.cancel(statement_id)
+                return {"error": f"SQL statement timed out after {timeout:.0f}s and was cancelled"}
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 1.5, config["sql_poll_max_seconds"])
+
+            if scan_id in self._cancelled_scans:
+                # cancel_scan() has already cancelled this statement on the warehouse
+                return {"error": f"Scan {scan_id} was cancelled"}
+
+            # A throttled poll must not wait past the statement's deadline
+            response = await DatabricksHTTP.request("GET", f"/api/2.0/sql/statements/{statement_id}", timeout=30,
+                                                    max_retry_delay=max(0.0, deadline - time.monotonic()))
+            response.raise_for_status()
+            result = response.json()
+            state = result.get("status", {}).get("state", "")
+            polls += 1
+            logger.info(f"SQL statement {statement_id}: {state} (poll {polls})")
+        return result
+
+    def _cancel_posted(self, post):
+        """Cancels a statement whose submission finished after its caller had been cancelled."""
+        if post.cancelled() or post.exception() is not None:
+            return
+        try:
+            statement_id = post.result().json().get("statement_id")
+        except ValueError:
+            return
+        if statement_id:
+            asyncio.ensure_future(self.cancel(statement_id))
+
+    async def cancel(self, statement_id):
+        """Asks the warehouse to cancel a statement; returns True if the request was accepted."""
+        try:
+            response = await DatabricksHTTP.request("POST", f"/api/2.0/sql/statements/{statement_id}/cancel")
+        except Exception as e:
+            logger.warning(f"Could not cancel statement {statement_id}: {e}")
+            return False
+        if response.status_code >= 400:
+            logger.warning(f"Cancelling statement {statement_id} returned {response.status_code}")
+            return False
+        logger.info(f"Cancelled statement {statement_id}")
+        return True
+
+    async def cancel_scan(self, scan_id):
+        """
+        Cancels every running statement of a scan and refuses new ones for it.
+
+        Returns:
+            list of the statement ids that were cancelled
+        """
+        self._cancelled_scans[scan_id] = time.time()
+        while len(self._cancelled_scans) > MAX_CANCELLED_SCANS:
+            self._cancelled_scans.popitem(last=False)
+        statement_ids = [sid for sid, info in self.statements.items() if info["scan_id"] == scan_id]
+        await asyncio.gather(*[self.cancel(sid) for sid in statement_ids])
+        return statement_ids
+
+    async def cancel_all(self):
+        """Cancels every statement still running (e.g. on shutdown) so none outlive the server."""
+        statement_ids = list(self.statements)
+        if statement_ids:
+            logger.info(f"Cancelling {len(statement_ids)} running statement(s)")
+            await asyncio.gather(*[self.cancel(sid) for sid in statement_ids])
+        return statement_ids
+
+
+# Global instance shared by every SQL caller
+statement_manager = StatementManager()
@@ -0,0 +1,120 @@
+import asyncio
+import httpx
+import pyarrow as pa
+import pyarrow.ipc
+from http_client import DatabricksHTTP
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+# Pre-signed links expire (after ~15 minutes); these statuses mean the link needs refreshing
+EXPIRED_LINK_STATUS_CODES = (403, 404)
+
+# Errors fetching or decoding result chunks can raise; run_sql reports them as {'error': ...}
+RESULT_ERRORS = (httpx.HTTPError, pa.ArrowException, KeyError, IndexError)
+
+
+class StatementResults:
+    """Collects every chunk of a SQL Statement Execution API result.
+
+    Results larger than one chunk are split across chunk indices, and only
+    the first is returned with the statement itself. JSON_ARRAY (INLINE)
+    results fetch the remaining chunks from the API; ARROW_STREAM
+    (EXTERNAL_LINKS) results download each chunk from a pre-signed cloud
+    storage link. Either way the chunks are fetched concurrently (up to
+    SQL_RESULT_DOWNLOAD_CONCURRENCY) and reassembled in order.
+    """
+
+    @staticmethod
+    async def _chunk(statement_id, chunk_index):
+        response = await DatabricksHTTP.request(
+            "GET", f"/api/2.0/sql/statements/{statement_id}/result/chunks/{chunk_index}"
+        )
+        response.raise_for_status()
+        return response.json()
+
+    @staticmethod
+    async def _gather(indices, fetch):
+        """Runs fetch(index) for every index with bounded concurrency, returning results in index order."""
+        semaphore = asyncio.Semaphore(config["sql_result_download_concurrency"])
+
+        async def bounded(index):
+            async with semaphore:
+                return await fetch(index)
+
+        return await asyncio.gather(*[bounded(index) for index in indices])
+
+    @staticmethod
+    async def fetch_json(statement_id, first, manifest):
+        """
+        Returns all rows of a JSON_ARRAY result.
+
+        Args:
+            statement_id: Statement the result belongs to
+            first: The 'result' object returned with the statement (chunk 0)
+            manifest: The statement's manifest
+
+        Returns:
+            list of rows (values as the strings the API returns)
+        """
+        rows = list(first.get("data_array") or [])
+        next_index = first.get("next_chunk_index")
+        if next_index is None:
+            return rows
+
+        total = manifest.get("total_chunk_count")
+        if total is not None:
+            # The manifest lists every chunk, so the rest can be requested at once
+            chunks = await StatementResults._gather(
+                range(next_index, total), lambda index: StatementResults._chunk(statement_id, index)
+            )
+            for chunk in chunks:
+                rows.extend(chunk.get("data_array") or [])
+        else:
+            while next_index is not None:
+                chunk = await StatementResults._chunk(statement_id, next_index)
+                rows.extend(chunk.get("data_array") or [])
+                next_index = chunk.get("next_chunk_index")
+
+        logger.info(f"Fetched {len(rows):,} rows of statement {statement_id} across chunks")
+        return rows
+
+    @staticmethod
+    async def fetch_arrow(statement_id, first, manifest):
+        """
+        Downloads and decodes all chunks of an ARROW_STREAM / EXTERNAL_LINKS result.
+
+        Each chunk is an Arrow IPC stream; it is read straight from the
+        downloaded bytes, so record batches reference the response buffer
+        instead of being copied.
+
+        Returns:
+            pyarrow.Table with the result's typed columns
+        """
+        links = {link["chunk_index"]: link for link in first.get("external_links") or []}
+        total = manifest.get("total_chunk_count", len(links))
+
+        async def download(index):
+            link = links.get(index)
+            if link is None:
+                link = (await StatementResults._chunk(statement_id, index))["external_links"][0]
+            response = await DatabricksHTTP.download(link["external_link"])
+            if response.status_code in EXPIRED_LINK_STATUS_CODES:
+                # Ask the API for a fresh link to the same chunk and try once more
+                link = (await StatementResults._chunk(statement_id, index))["external_links"][0]
+                response = await DatabricksHTTP.download(link["external_link"])
+            response.raise_for_status()
+            return await asyncio.to_thread(StatementResults._decode, response.content)
+
+        tables = await StatementResults._gather(range(total), download)
+        if not tables:
+            columns = manifest.get("schema", {}).get("columns", [])
+            return pa.table({col["name"]: pa.array([], type=pa.null()) for col in columns})
+        table = pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+        logger.info(f"Downloaded {table.num_rows:,} rows of statement {statement_id} in {len(tables)} Arrow chunk(s)")
+        return table
+
+    @staticmethod
+    def _decode(content):
+        return pa.ipc.open_stream(pa.py_buffer(content)).read_all()
@@ -0,0 +1,512 @@
+import math
+import numpy as np
+import pandas as pd
+from utils import get_logger, get_config
+
+logger = get_logger(__name__)
+config = get_config()
+
+# Duplicate detection in the streaming profiler: 'approximate' uses a Bloom filter sized for a
+# target false-positive rate and bounded by STREAMING_BLOOM_MAX_BITS; 'exact' keeps every 64-bit
+# row hash, up to STREAMING_EXACT_MAX_ROWS of them; 'none' skips the check
+STREAMING_DUPLICATE_MODES = ("exact", "approximate", "none")
+
+
+# Set bits in each byte value, for measuring how full a Bloom filter is
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _hash_values(values):
+    """64-bit hashes of a 1-D array; numbers are hashed as float64 so 1 and 1.0 collide like in pandas."""
+    if values.dtype.kind in "iufb":
+        values = values.astype(np.float64, copy=False)
+    return pd.util.hash_array(values, categorize=False)
+
+
+class RunningMoments:
+    """Count, mean, variance (Welford/Chan), min and max of a numeric column, mergeable across chunks."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        """Adds a chunk of non-null float64 values."""
+        if len(values) == 0:
+            return
+        chunk = RunningMoments()
+        chunk.count = len(values)
+        chunk.mean = float(values.mean())
+        deviations = values - chunk.mean
+        chunk.m2 = float(np.dot(deviations, deviations))
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        self.merge(chunk)
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count sketch over 64-bit hashes (2**precision one-byte registers)."""
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        if len(hashes) == 0:
+            return
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        p = np.uint64(self.precision)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        # Remaining bits, with a guard bit so the rank is bounded by 64 - precision + 1
+        rest = (hashes << p) | (np.uint64(1) << (p - np.uint64(1)))
+        high = (rest >> np.uint64(32)).astype(np.float64)
+        low = (rest & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        # 32-bit halves convert to float exactly, so floor(log2) gives the exact bit length
+        with np.errstate(divide="ignore"):
+            rank = np.where(
+                high > 0,
+                32 - np.floor(np.log2(high)),
+                64 - np.floor(np.log2(low))
+            ).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class TDigest:
+    """Merging t-digest for streaming quantiles.
+
+    Incoming values are buffered; each flush sorts the buffer together with the
+    existing centroids and regroups them so every centroid spans at most one
+    unit of the arcsine scale function, which keeps the tails precise.
+    """
+
+    def __init__(self, compression=100, buffer_size=None):
+        self.compression = compression
+        self.buffer_size = buffer_size or compression * 50
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self._buffer = []
+        self._buffered = 0
+
+    def update(self, values):
+        if len(values) == 0:
+            return
+        self._buffer.append(np.asarray(values, dtype=np.float64))
+        self._buffered += len(values)
+        if self._buffered >= self.buffer_size:
+            self._flush()
+
+    def merge(self, other):
+        other._flush()
+        self._flush()
+        self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        values = np.concatenate(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        self._compress(np.concatenate([self.means, values]), np.concatenate([self.weights, np.ones(len(values))]))
+
+    def _compress(self, means, weights):
+        if len(means) == 0:
+            return
+        order = np.argsort(means, kind="stable")
+        means = means[order]
+        weights = weights[order]
+        total = weights.sum()
+        cumulative = np.cumsum(weights)
+        q = (cumulative - weights / 2) / total
+        k = self.compression / (2 * math.pi) * np.arcsin(np.clip(2 * q - 1, -1, 1))
+        groups = np.floor(k)
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+        group_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / group_weights
+        self.weights = group_weights
+
+    def quantile(self, q):
+        self._flush()
+        if len(self.means) == 0:
+            return None
+        if len(self.means) == 1:
+            return float(self.means[0])
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * self.weights.sum(), centers, self.means))
+
+
+class BloomFilter:
+    """Bloom filter over 64-bit hashes sized for `capacity` items at a target false-positive rate.
+
+    Uses the optimal bits (-n ln p / ln(2)**2) and hash count (bits / n * ln 2),
+    with double hashing for the probe positions. false_positive_rate() is
+    measured from the bits actually set, and exceeds the target once more
+    than `capacity` items are added.
+    """
+
+    def __init__(self, capacity, fp_rate=0.001):
+        self.capacity = max(1, int(capacity))
+        self.bits = max(64, int(math.ceil(-self.capacity * math.log(fp_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.bits / self.capacity * math.log(2))))
+        self.count = 0
+        self.array = np.zeros((self.bits + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, hashes):
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        return ((h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.bits)).astype(np.int64)
+
+    def check(self, hashes):
+        """Which hashes are (probably) present."""
+        positions = self._positions(hashes)
+        return ((self.array[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1).all(axis=1)
+
+    def add(self, hashes):
+        positions = self._positions(hashes)
+        np.bitwise_or.at(self.array, (positions >> 3).ravel(), (np.uint8(1) << (positions & 7).astype(np.uint8)).ravel())
+        self.count += len(hashes)
+
+    def add_and_check(self, hashes):
+        """Returns which hashes were (probably) already present, then adds them all."""
+        present = self.check(hashes)
+        self.add(hashes)
+        return present
+
+    def false_positive_rate(self):
+        set_bits = sum(int(_POPCOUNT[self.array[i:i + (1 << 24)]].sum(dtype=np.int64))
+                       for i in range(0, len(self.array), 1 << 24))
+        return (set_bits / self.bits) ** self.hashes
+
+
+class ScalableBloomFilter:
+    """Bloom filter that keeps its false-positive rate under fp_rate however many items arrive.
+
+    Starts with one BloomFilter for initial_capacity items; when it is full a new
+    layer twice as large with half the target rate is added (Almeida et al.), so
+    the rates of all layers sum to less than fp_rate. Once the layers reach
+    max_bits in total the last layer keeps filling instead, and
+    false_positive_rate() reports the rate it degrades to.
+    """
+
+    def __init__(self, initial_capacity, fp_rate=0.001, max_bits=None):
+        self.fp_rate = fp_rate
+        self.max_bits = max_bits
+        if max_bits:
+            # Capacity whose optimal filter fits in max_bits
+            initial_capacity = min(initial_capacity, max_bits * math.log(2) ** 2 / -math.log(fp_rate / 2))
+        self.layers = [BloomFilter(initial_capacity, fp_rate / 2)]
+        self.checked = 0
+
+    @property
+    def bits(self):
+        return sum(layer.bits for layer in self.layers)
+
+    def add_and_check(self, hashes):
+        """Returns which hashes were (probably) already present, then adds the new ones."""
+        present = np.zeros(len(hashes), dtype=bool)
+        for layer in self.layers:
+            present |= layer.check(hashes)
+        self.checked += len(hashes)
+        new = hashes[~present]
+        while len(new):
+            layer = self.layers[-1]
+            room = layer.capacity - layer.count
+            if room <= 0 and (not self.max_bits or self.bits + layer.bits * 2 <= self.max_bits):
+                target = self.fp_rate / 2 ** (len(self.layers) + 1)
+                self.layers.append(BloomFilter(layer.capacity * 2, target))
+                continue
+            take = len(new) if room <= 0 else min(room, len(new))
+            layer.add(new[:take])
+            new = new[take:]
+        return present
+
+    def false_positive_rate(self):
+        """Chance that a new row is taken for a duplicate, at the current fill."""
+        miss = 1.0
+        for layer in self.layers:
+            miss *= 1 - layer.false_positive_rate()
+        return 1 - miss
+
+
+class StreamingProfiler:
+    """Profiles a DataFrame delivered in chunks with bounded memory.
+
+    Each chunk updates mergeable per-column accumulators: null counts,
+    Welford/Chan moments with min/max, a HyperLogLog sketch for distinct counts
+    and a t-digest for quartiles. Duplicate rows are counted from 64-bit row
+    hashes, kept exactly or in a Bloom filter. profile() returns the same dict
+    as ColumnProfiler.profile, so DQChecks.results_from_profile turns it into
+    regular DQ results; distinct counts and quartiles (and Bloom-filter
+    duplicates) are estimates, listed in 'estimated_metrics'.
+
+    The Bloom filter is sized for expected_rows (when the caller knows how many
+    rows it will read) and grows if more arrive, so its false-positive rate
+    stays under STREAMING_BLOOM_FP_RATE up to STREAMING_BLOOM_MAX_BITS.
+    Bloom-filter duplicates only overcount, by at most the false-positive rate
+    times the rows checked; the profile reports that bound.
+
+    Exact mode keeps 8 bytes per row, so it is only bounded by exact_max_rows:
+    past that many rows the hashes kept so far are counted exactly and moved
+    into a Bloom filter, and the rest of the file is checked approximately
+    (flagged 'switched_from_exact' in the profile's duplicate_check).
+    """
+
+    def __init__(self, duplicate_mode="approximate", hll_precision=None, compression=None, expected_rows=None,
+                 bloom_fp_rate=None, bloom_max_bits=None, exact_max_rows=None):
+        self.duplicate_mode = duplicate_mode
+        self.hll_precision = hll_precision or config["streaming_hll_precision"]
+        self.compression = compression or config["streaming_tdigest_compression"]
+        self.bloom_fp_rate = bloom_fp_rate or config["streaming_bloom_fp_rate"]
+        self.bloom_max_bits = bloom_max_bits or config["streaming_bloom_max_bits"]
+        self.exact_max_rows = exact_max_rows or config["streaming_exact_max_rows"]
+        # Unknown sizes start at ten chunks' worth of rows and grow from there
+        initial_capacity = expected_rows or config["streaming_chunk_rows"] * 10
+        self._initial_capacity = initial_capacity
+
+        self.row_count = 0
+        self.chunks = 0
+        self.columns = None
+        self.column_types = {}
+        self.nulls = {}
+        self.moments = {}
+        self.sketches = {}
+        self.digests = {}
+        self.latest = {}
+        self.duplicates = 0
+        self._row_hashes = []
+        self._kept_hashes = 0
+        self.switched_from_exact = False
+        self._bloom = ScalableBloomFilter(initial_capacity, self.bloom_fp_rate, self.bloom_max_bits) if duplicate_mode == "approximate" else None
+
+    def update(self, chunk: pd.DataFrame):
+        """Adds one chunk of rows; later chunks must have the same columns."""
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            self.nulls = {col: 0 for col in self.columns}
+            for col in self.columns:
+                self.column_types[col] = chunk[col].dtype
+                if pd.api.types.is_numeric_dtype(chunk[col]) and not pd.api.types.is_bool_dtype(chunk[col]):
+                    self.moments[col] = RunningMoments()
+                    self.sketches[col] = HyperLogLog(self.hll_precision)
+                    self.digests[col] = TDigest(self.compression)
+
+        for col in self.columns:
+            series = chunk[col]
+            if col in self.moments:
+                # A later chunk may infer a different dtype (e.g. stray text); unparsable values count as null
+                if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+                    series = pd.to_numeric(series, errors="coerce")
+                if isinstance(series.dtype, np.dtype) and isinstance(self.column_types[col], np.dtype):
+                    # Report the dtype pandas would infer for the whole file (int64 + float64 -> float64)
+                    self.column_types[col] = np.promote_types(self.column_types[col], series.dtype)
+                values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+                valid = values[~np.isnan(values)]
+                self.nulls[col] += len(values) - len(valid)
+                self.moments[col].update(valid)
+                self.sketches[col].add_hashes(_hash_values(valid))
+                self.digests[col].update(valid)
+            else:
+                self.nulls[col] += int(series.isna().sum())
+                if pd.api.types.is_datetime64_any_dtype(series):
+                    latest = series.max()
+                    if not pd.isna(latest) and (col not in self.latest or latest > self.latest[col]):
+                        self.latest[col] = latest
+
+        if self.duplicate_mode != "none":
+            self._update_duplicates(chunk)
+
+        self.row_count += len(chunk)
+        self.chunks += 1
+
+    def _row_hashes_for(self, chunk):
+        hashes = np.zeros(len(chunk), dtype=np.uint64)
+        for i, col in enumerate(self.columns):
+            values = chunk[col]
+            if col in self.moments:
+                values = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                values = values.to_numpy()
+            # Combine column hashes order-dependently, as hash_pandas_object does
+            hashes = hashes * np.uint64(1000003) ^ (_hash_values(values) + np.uint64(i))
+        return hashes
+
+    def _update_duplicates(self, chunk):
+        if len(chunk) == 0:
+            return
+        hashes = self._row_hashes_for(chunk)
+        if self._bloom is None:
+            self._row_hashes.append(hashes)
+            self._kept_hashes += len(hashes)
+            if self._kept_hashes > self.exact_max_rows:
+                self._switch_to_bloom()
+            return
+        # Repeats inside the chunk are exact; the Bloom filter catches repeats of earlier chunks
+        repeated = pd.Series(hashes).duplicated().to_numpy()
+        first = hashes[~repeated]
+        self.duplicates += int(repeated.sum()) + int(self._bloom.add_and_check(first).sum())
+
+    def _switch_to_bloom(self):
+        """Counts the duplicates among the kept row hashes exactly, then keeps the unique ones in a Bloom filter."""
+        hashes = np.concatenate(self._row_hashes)
+        unique = np.unique(hashes)
+        self.duplicates += len(hashes) - len(unique)
+        self._row_hashes = []
+        self._kept_hashes = 0
+        self._bloom = ScalableBloomFilter(max(self._initial_capacity, 2 * len(unique)), self.bloom_fp_rate, self.bloom_max_bits)
+        self._bloom.add_and_check(unique)
+        # Only rows checked from here on can be false positives
+        self._bloom.checked = 0
+        self.duplicate_mode = "approximate"
+        self.switched_from_exact = True
+        logger.warning(f"Exact duplicate detection passed {self.exact_max_rows:,} rows; "
+                       f"checking the rest of the file with a Bloom filter")
+
+    def merge(self, other):
+        """Folds another profiler's accumulators (same columns, later rows) into this one."""
+        if other.columns is None:
+            return
+        if self.columns is None:
+            # Nothing profiled here yet: adopt the other profiler's state wholesale
+            self.__dict__.update(other.__dict__)
+            return
+        for col in self.columns:
+            self.nulls[col] += other.nulls[col]
+            if col in self.moments:
+                self.moments[col].merge(other.moments[col])
+                self.sketches[col].merge(other.sketches[col])
+                self.digests[col].merge(other.digests[col])
+            if col in other.latest and (col not in self.latest or other.latest[col] > self.latest[col]):
+                self.latest[col] = other.latest[col]
+        self._row_hashes.extend(other._row_hashes)
+        self._kept_hashes += other._kept_hashes
+        self.switched_from_exact |= other.switched_from_exact
+        if self._bloom is None and (other._bloom is not None or self._kept_hashes > self.exact_max_rows) and self._row_hashes:
+            self._switch_to_bloom()
+        if self._bloom is not None:
+            logger.warning("Bloom-filter duplicate counts cannot be merged exactly; summing partial counts")
+            self.duplicates += other.duplicates
+            self._bloom.checked += other._bloom.checked
+        self.row_count += other.row_count
+        self.chunks += other.chunks
+
+    def profile(self) -> dict:
+        """Metrics in the ColumnProfiler.profile() shape, plus 'estimated_metrics' and 'chunks'."""
+        columns = self.columns or []
+        numeric_distribution = {}
+        distinct_counts = {}
+        for col, moments in self.moments.items():
+            digest = self.digests[col]
+            numeric_distribution[col] = {
+                "count": float(moments.count),
+                "mean": moments.mean if moments.count else None,
+                "std": moments.std,
+                "min": moments.min if moments.count else None,
+                "25%": digest.quantile(0.25),
+                "50%": digest.quantile(0.5),
+                "75%": digest.quantile(0.75),
+                "max": moments.max if moments.count else None
+            }
+            distinct_counts[col] = min(self.sketches[col].estimate(), moments.count)
+
+        if self.duplicate_mode == "exact" and self._row_hashes:
+            hashes = np.concatenate(self._row_hashes)
+            self.duplicates = int(len(hashes) - len(np.unique(hashes)))
+
+        now = pd.Timestamp.now(tz="UTC")
+        future = []
+        for col, latest in self.latest.items():
+            reference = now if latest.tzinfo is not None else now.tz_localize(None)
+            if latest > reference:
+                future.append(col)
+
+        estimated = ["distinct_count", "quartiles"]
+        duplicate_check = None
+        if self._bloom is not None:
+            estimated.append("duplicates")
+            fp_rate = self._bloom.false_positive_rate()
+            duplicate_check = {
+                "duplicates": self.duplicates,
+                "mode": "approximate",
+                "method": "Bloom filter",
+                "key_columns": [],
+                "estimated": True,
+                "total_rows": self.row_count,
+                "false_positive_rate": fp_rate,
+                # Each row checked against the filter may be a false positive; allow three standard deviations
+                "error_bound": int(math.ceil(self._bloom.checked * fp_rate
+                                             + 3 * math.sqrt(self._bloom.checked * fp_rate * (1 - fp_rate))))
+            }
+            if self.switched_from_exact:
+                duplicate_check["switched_from_exact"] = True
+                duplicate_check["exact_max_rows"] = self.exact_max_rows
+
+        profile = {
+            "row_count": self.row_count,
+            "columns": columns,
+            "missing_values": {col: int(self.nulls[col]) for col in columns},
+            "duplicates": self.duplicates,
+            "column_types": {col: str(self.column_types[col]) for col in columns},
+            "numeric_distribution": numeric_distribution,
+            "distinct_counts": distinct_counts,
+            "future_date_columns": future,
+            "estimated_metrics": estimated,
+            "chunks": self.chunks
+        }
+        if duplicate_check is not None:
+            profile["duplicate_check"] = duplicate_check
+        return profile
+
+    @staticmethod
+    def profile_csv(source, chunk_rows=None, duplicate_mode="approximate", **read_csv_kwargs) -> dict:
+        """
+        Streams a CSV file (path or file-like object) through the profiler.
+
+        Args:
+            source: Path or readable file object
+            chunk_rows: Rows per chunk (defaults to STREAMING_CHUNK_ROWS)
+            duplicate_mode: One of STREAMING_DUPLICATE_MODES
+
+        Returns:
+            Profile dict (see profile())
+        """
+        chunk_rows = chunk_rows or config["streaming_chunk_rows"]
+        profiler = StreamingProfiler(duplicate_mode=duplicate_mode)
+        for chunk in pd.read_csv(source, chunksize=chunk_rows, **read_csv_kwargs):
+            profiler.update(chunk)
+        logger.info(f"Streamed {profiler.row_count:,} rows in {profiler.chunks} chunk(s)")
+        return profiler.profile()
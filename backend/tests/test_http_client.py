@@ -0,0 +1,22 @@
+import httpx
+from http_client import DatabricksHTTP, config
+
+
+def _throttled(retry_after):
+    return httpx.Response(429, headers={"Retry-After": retry_after})
+
+
+def test_retry_after_is_capped(monkeypatch):
+    monkeypatch.setitem(config, "http_max_retry_delay_seconds", 60.0)
+    assert DatabricksHTTP._retry_delay(_throttled("5"), 0) == 5.0
+    assert DatabricksHTTP._retry_delay(_throttled("86400"), 0) == 60.0
+    assert DatabricksHTTP._retry_delay(_throttled("86400"), 0, max_delay=2.5) == 2.5
+    assert DatabricksHTTP._retry_delay(_throttled("-3"), 0) == 0.0
+
+
+def test_backoff_is_capped(monkeypatch):
+    monkeypatch.setitem(config, "http_max_retry_delay_seconds", 10.0)
+    monkeypatch.setitem(config, "http_backoff_seconds", 1.0)
+    assert 1.0 <= DatabricksHTTP._retry_delay(None, 0) <= 1.5
+    assert DatabricksHTTP._retry_delay(None, 20) == 10.0
+    assert DatabricksHTTP._retry_delay(_throttled("soon"), 20, max_delay=0) == 0.0
@@ -0,0 +1,127 @@
+import asyncio
+import re
+import pytest
+import query_planner
+from query_planner import QueryPlanner
+
+
+COLUMNS = [{"name": f"c{i}", "type_name": "INT" if i % 2 else "STRING"} for i in range(8)]
+
+
+class FakeWarehouse:
+    """Stands in for DatabricksCLI.run_sql: answers profile statements column by column.
+
+    failures maps a column name to the (error, sql_state) of any statement that profiles it.
+    """
+
+    def __init__(self, failures=None):
+        self.failures = failures or {}
+        self.statements = []
+
+    async def run_sql(self, sql):
+        self.statements.append(sql)
+        columns = re.findall(r"COUNT\(`([^`]+)`\) as", sql)
+        for name in columns:
+            if name in self.failures:
+                error, sql_state = self.failures[name]
+                return {"error": error, "sql_state": sql_state}
+        names = ["total_rows"] + [f"{name}_non_null" for name in columns]
+        values = [100] + [100 - int(name[1:]) for name in columns]
+        return {"manifest": {"schema": {"columns": [{"name": n} for n in names]}}, "data_array": [values], "row_count": 1}
+
+
+@pytest.fixture
+def warehouse(monkeypatch):
+    monkeypatch.setitem(query_planner.config, "pushdown_batch_max_cost", 60)
+    monkeypatch.setitem(query_planner.config, "pushdown_batch_retries", 1)
+    monkeypatch.setitem(query_planner.config, "pushdown_max_concurrent_statements", 4)
+
+    def install(failures=None):
+        fake = FakeWarehouse(failures)
+        monkeypatch.setattr(query_planner.DatabricksCLI, "run_sql", staticmethod(fake.run_sql))
+        return fake
+    return install
+
+
+def _profile(columns=COLUMNS):
+    return asyncio.run(QueryPlanner.run_profile("main.sales.orders", columns, version=7))
+
+
+def _metrics(result):
+    names = [col["name"] for col in result["manifest"]["schema"]["columns"]]
+    return dict(zip(names, result["data_array"][0]))
+
+
+def test_plan_batches_balances_cost_and_keeps_column_order():
+    batches = QueryPlanner.plan_batches(COLUMNS, "exact", max_batch_cost=20)
+    costs = [sum(QueryPlanner.column_cost(col) for col in batch) for batch in batches]
+
+    assert len(batches) > 1 and max(costs) - min(costs) <= max(QueryPlanner.column_cost(col) for col in COLUMNS)
+    assert sorted(col["name"] for batch in batches for col in batch) == sorted(col["name"] for col in COLUMNS)
+    for batch in batches:
+        assert batch == sorted(batch, key=COLUMNS.index)
+    assert QueryPlanner.plan_batches(COLUMNS, "exact", max_batch_cost=1000) == [COLUMNS]
+
+
+def test_profile_merges_every_batch_at_one_version(warehouse):
+    fake = warehouse()
+    result = _profile()
+
+    metrics = _metrics(result)
+    assert result["version"] == 7 and result["failed_columns"] == []
+    assert result["batches"] == len(fake.statements) > 1
+    assert all("FROM main.sales.orders VERSION AS OF 7" in sql for sql in fake.statements)
+    # total_rows appears in every batch but only once in the merged row
+    assert list(metrics).count("total_rows") == 1 and metrics["total_rows"] == 100
+    assert {name: metrics[f"{name}_non_null"] for name in (col["name"] for col in COLUMNS)} == \
+        {f"c{i}": 100 - i for i in range(8)}
+
+
+@pytest.mark.parametrize("sql_state", ["42K09", "22003"])
+def test_column_errors_are_bisected_to_the_failing_column(warehouse, sql_state):
+    fake = warehouse({"c5": ("cannot profile c5", sql_state)})
+    result = _profile()
+
+    assert result["failed_columns"] == [{"column": "c5", "error": "cannot profile c5"}]
+    metrics = _metrics(result)
+    assert "c5_non_null" not in metrics
+    assert all(f"c{i}_non_null" in metrics for i in range(8) if i != 5)
+    # A column error is not retried as is: each statement profiling c5 covers fewer columns than the last
+    failing = [len(re.findall(r"_non_null`", sql)) for sql in fake.statements if "`c5`" in sql]
+    assert failing == sorted(set(failing), reverse=True) and failing[0] > 1 and failing[-1] == 1
+
+
+@pytest.mark.parametrize("sql_state", [None, "HY000", "08000"])
+def test_other_errors_fail_the_whole_batch(warehouse, sql_state):
+    fake = warehouse({"c5": ("warehouse stopped", sql_state)})
+    result = _profile()
+
+    batch = next(batch for batch in QueryPlanner.plan_batches(COLUMNS, "exact") if any(col["name"] == "c5" for col in batch))
+    assert len(batch) > 1
+    assert [f["column"] for f in result["failed_columns"]] == [col["name"] for col in batch]
+    assert all(f["error"] == "warehouse stopped" for f in result["failed_columns"])
+    # Retried once as a whole, never split
+    assert len([sql for sql in fake.statements if "`c5`" in sql]) == 2
+    metrics = _metrics(result)
+    assert all(f"{col['name']}_non_null" in metrics for col in COLUMNS if col not in batch)
+
+
+def test_profile_fails_when_every_batch_fails(warehouse):
+    warehouse({col["name"]: ("table not found", "42P01") for col in COLUMNS})
+    assert _profile() == {"error": "table not found"}
+
+
+def test_transient_failures_are_retried(warehouse):
+    calls = []
+
+    async def flaky(batch):
+        calls.append(batch)
+        return {"error": "timed out"} if len(calls) == 1 else {"data_array": [[1]]}
+
+    result = asyncio.run(QueryPlanner._run_with_retry(flaky, COLUMNS))
+    assert result == {"data_array": [[1]]} and len(calls) == 2
+
+
+def test_merge_results_without_any_result_reports_the_first_error():
+    partials = [[(None, [{"column": "c0", "error": "boom"}])], [(None, [{"column": "c1", "error": "bang"}])]]
+    assert QueryPlanner.merge_results(partials) == {"error": "boom"}
@@ -0,0 +1,79 @@
+import pytest
+from rule_engine import RuleEngine
+
+
+def _results(issue, **fields):
+    results = {
+        "source": "main.sales.orders",
+        "source_type": "table",
+        "row_count": 1000,
+        "columns": ["order_id", "amount", "status", "updated_at"],
+        "column_types": {"order_id": "LONG", "amount": "DOUBLE", "status": "STRING", "updated_at": "TIMESTAMP"},
+        "missing_values": {"order_id": 100, "amount": 300, "status": 100, "updated_at": 0},
+        "distinct_counts": {"order_id": 900, "status": 4},
+        "numeric_distribution": {"amount": {"50%": 12.5}},
+        "duplicates": 0,
+        "issues": [issue]
+    }
+    results.update(fields)
+    return results
+
+
+def _rule(results):
+    analysis = RuleEngine.analyze(results)
+    assert analysis["uncovered_issues"] == []
+    return analysis["rule_matches"][0]["rule"], analysis
+
+
+@pytest.mark.parametrize("column, severity, expected", [
+    ("order_id", "Medium", "null_key_column"),
+    ("amount", "High", "null_numeric"),
+    ("status", "Medium", "null_categorical"),
+])
+def test_null_rules_follow_the_column(column, severity, expected):
+    issue = {"type": "High Null Ratio", "column": column, "severity": severity}
+    assert _rule(_results(issue))[0] == expected
+
+
+def test_key_nulls_are_quarantined_before_any_delete():
+    rule, analysis = _rule(_results({"type": "High Null Ratio", "column": "order_id", "severity": "Medium"}))
+    statements = [line for line in analysis["recommended_sql_fixes"].splitlines() if not line.startswith("--")]
+    assert any(line.startswith("INSERT INTO main.sales.orders_quarantine") for line in statements)
+    assert not any("DELETE" in line or "SET NOT NULL" in line for line in statements)
+
+
+@pytest.mark.parametrize("check", [
+    {"mode": "approximate", "estimated": True, "error_bound": 40},
+    {"mode": "exact", "estimated": False, "inconclusive": True},
+])
+def test_estimated_duplicates_are_confirmed_not_removed(check):
+    issue = {"type": "Duplicate Rows", "column": "All", "severity": "Low"}
+    rule, analysis = _rule(_results(issue, duplicates=30, duplicate_check=check))
+
+    assert rule == "duplicates_unconfirmed"
+    assert "INSERT OVERWRITE" not in analysis["recommended_sql_fixes"]
+    assert "RESTORE" not in analysis["recommended_sql_fixes"]
+
+
+def test_counted_duplicates_pick_the_load_or_exact_rule():
+    issue = {"type": "Duplicate Rows", "column": "All", "severity": "Medium"}
+    check = {"mode": "exact", "estimated": False}
+    assert _rule(_results(issue, duplicates=500, duplicate_check=check))[0] == "duplicates_repeated_load"
+    assert _rule(_results(issue, duplicates=20, duplicate_check=check))[0] == "duplicates_exact"
+
+
+def test_key_duplicates_keep_the_latest_row():
+    issue = {"type": "Duplicate Rows", "column": "order_id", "severity": "Medium"}
+    rule, analysis = _rule(_results(issue, duplicates=20))
+
+    assert rule == "duplicates_by_key"
+    assert "PARTITION BY `order_id` ORDER BY `updated_at` DESC" in analysis["recommended_sql_fixes"]
+
+
+def test_key_duplicates_without_a_timestamp_ask_for_the_ordering_column():
+    issue = {"type": "Duplicate Rows", "column": "order_id", "severity": "Medium"}
+    results = _results(issue, duplicates=20, column_types={"order_id": "LONG", "amount": "DOUBLE"})
+    analysis = _rule(results)[1]
+
+    assert "ORDER BY <recency_column> DESC" in analysis["recommended_sql_fixes"]
+    assert "<recency_column>" in analysis["root_cause_analysis"]
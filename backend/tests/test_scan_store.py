@@ -0,0 +1,53 @@
+import pytest
+from scan_store import MemoryScanStore, SQLiteScanStore
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryScanStore(max_scans=3)
+    return SQLiteScanStore(str(tmp_path / "scans.db"), retention_days=0, max_scans=3, evict_interval_seconds=0)
+
+
+REQUEST = {"path": "main.sales.orders", "type": "table"}
+RESULTS = {"source": "main.sales.orders", "source_type": "table", "dq_score": 90, "row_count": 10,
+           "issues": [{"type": "High Null Ratio", "column": "a", "severity": "Medium"}]}
+
+
+def test_save_result_marks_a_running_scan_complete(store):
+    store.save_status("s1", "running", stage="Profiling", progress=40, request=REQUEST)
+    store.save_result("s1", RESULTS, {"summary": "ok"}, report_path="report.md", request=REQUEST)
+
+    scan = store.get("s1", include_payload=True)
+    assert scan["status"] == "complete"
+    assert scan["error"] is None
+    assert (scan["dq_score"], scan["issue_count"], scan["row_count"]) == (90, 1, 10)
+    assert scan["dq_results"] == RESULTS and scan["ai_analysis"] == {"summary": "ok"}
+    assert store.last_scanned(["main.sales.orders", "main.sales.other"]).keys() == {"main.sales.orders"}
+
+
+def test_status_updates_keep_stage_and_progress(store):
+    store.save_status("s1", "running", stage="Profiling", progress=40, request=REQUEST)
+    store.save_status("s1", "failed", error="boom")
+
+    scan = store.get("s1")
+    assert (scan["status"], scan["stage"], scan["progress"], scan["error"]) == ("failed", "Profiling", 40, "boom")
+    assert store.get_payload("s1") is None
+    assert store.last_scanned(["main.sales.orders"]) == {}
+
+
+def test_update_rejects_unknown_fields(store):
+    store.save_status("s1", "running", request=REQUEST)
+    store.update("s1", notebook_filename="fix.py")
+    assert store.get("s1")["notebook_filename"] == "fix.py"
+    with pytest.raises(ValueError):
+        store.update("s1", dq_score=1)
+
+
+def test_list_is_newest_first_and_evicts_beyond_max_scans(store):
+    for i in range(5):
+        store.save_status(f"s{i}", "running", request=REQUEST)
+    store.evict()
+
+    assert [scan["scan_id"] for scan in store.list(limit=10)] == ["s4", "s3", "s2"]
+    assert store.get("s0") is None
@@ -0,0 +1,83 @@
+import asyncio
+import httpx
+import pytest
+import statement_manager
+from statement_manager import StatementManager
+
+
+class FakeStatementsAPI:
+    """Stands in for DatabricksHTTP.request against /api/2.0/sql/statements."""
+
+    def __init__(self, polls):
+        self.polls = list(polls)  # per GET: a state string, or an exception to raise
+        self.cancelled = []
+        self.poll_kwargs = []
+
+    async def request(self, method, path, **kwargs):
+        request = httpx.Request(method, f"https://workspace{path}")
+        if path.endswith("/cancel"):
+            self.cancelled.append(path.split("/")[-2])
+            return httpx.Response(200, json={}, request=request)
+        if method == "POST":
+            return httpx.Response(200, json={"statement_id": "st-1", "status": {"state": "PENDING"}}, request=request)
+        self.poll_kwargs.append(kwargs)
+        poll = self.polls.pop(0) if self.polls else "RUNNING"
+        if isinstance(poll, Exception):
+            raise poll
+        return httpx.Response(200, json={"statement_id": "st-1", "status": {"state": poll}}, request=request)
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setitem(statement_manager.config, "sql_poll_initial_seconds", 0.001)
+    monkeypatch.setitem(statement_manager.config, "sql_poll_max_seconds", 0.001)
+
+    def install(*polls):
+        fake = FakeStatementsAPI(polls)
+        monkeypatch.setattr(statement_manager.DatabricksHTTP, "request", staticmethod(fake.request))
+        return fake
+    return install
+
+
+def test_finished_statement_is_not_cancelled(api):
+    fake = api("RUNNING", "SUCCEEDED")
+    manager = StatementManager()
+    result = asyncio.run(manager.execute({"statement": "SELECT 1"}, timeout=10))
+
+    assert result["status"]["state"] == "SUCCEEDED"
+    assert fake.cancelled == [] and manager.statements == {}
+    # A throttled poll may not wait past the statement's deadline
+    assert all(0 < kwargs["max_retry_delay"] <= 10 for kwargs in fake.poll_kwargs)
+
+
+def test_failed_poll_cancels_the_statement(api):
+    fake = api("RUNNING", httpx.ReadError("connection reset"))
+    manager = StatementManager()
+    with pytest.raises(httpx.ReadError):
+        asyncio.run(manager.execute({"statement": "SELECT 1"}, timeout=10))
+
+    assert fake.cancelled == ["st-1"] and manager.statements == {}
+
+
+def test_cancelled_caller_cancels_the_statement(api):
+    fake = api()
+    manager = StatementManager()
+
+    async def cancel_while_polling():
+        task = asyncio.create_task(manager.execute({"statement": "SELECT 1"}, timeout=10))
+        while not fake.poll_kwargs:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_while_polling())
+    assert fake.cancelled == ["st-1"] and manager.statements == {}
+
+
+def test_statement_past_its_deadline_is_cancelled(api):
+    fake = api()
+    result = asyncio.run(StatementManager().execute({"statement": "SELECT 1"}, timeout=0.01))
+
+    assert "timed out" in result["error"]
+    assert fake.cancelled == ["st-1"]
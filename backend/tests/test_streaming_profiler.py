@@ -0,0 +1,178 @@
+import math
+import numpy as np
+import pandas as pd
+import pytest
+from dq_checks import DQChecks
+from streaming_profiler import (
+    BloomFilter, HyperLogLog, RunningMoments, ScalableBloomFilter, StreamingProfiler, TDigest, _hash_values
+)
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(7)
+
+
+def _chunks(values, size):
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def test_running_moments_merge_matches_pandas(rng):
+    values = rng.normal(50, 12, 100_000)
+    parts = []
+    for chunk in _chunks(values, 7_000):
+        moments = RunningMoments()
+        moments.update(chunk)
+        parts.append(moments)
+    merged = RunningMoments()
+    for moments in parts:
+        merged.merge(moments)
+
+    series = pd.Series(values)
+    assert merged.count == len(series)
+    assert merged.mean == pytest.approx(series.mean(), rel=1e-12)
+    assert merged.std == pytest.approx(series.std(), rel=1e-9)
+    assert (merged.min, merged.max) == (series.min(), series.max())
+
+
+def test_hyperloglog_estimate_and_merge(rng):
+    values = rng.integers(0, 200_000, 300_000).astype(np.float64)
+    exact = pd.Series(values).nunique()
+
+    whole = HyperLogLog(14)
+    whole.add_hashes(_hash_values(values))
+    left, right = HyperLogLog(14), HyperLogLog(14)
+    left.add_hashes(_hash_values(values[:120_000]))
+    right.add_hashes(_hash_values(values[120_000:]))
+    left.merge(right)
+
+    # Standard error is 1.04 / sqrt(2**14), about 0.8%; allow three of them
+    assert abs(whole.estimate() - exact) / exact < 3 * 1.04 / math.sqrt(1 << 14)
+    # A merged sketch is the sketch of the union
+    assert left.estimate() == whole.estimate()
+
+
+def test_hyperloglog_small_cardinality_is_exact_enough():
+    sketch = HyperLogLog(14)
+    sketch.add_hashes(_hash_values(np.arange(100, dtype=np.float64)))
+    assert sketch.estimate() == 100
+
+
+def test_tdigest_quartiles_and_merge(rng):
+    values = rng.lognormal(0, 1, 200_000)
+    exact = np.quantile(values, [0.25, 0.5, 0.75])
+    spread = exact[2] - exact[0]
+
+    parts = []
+    for chunk in _chunks(values, 30_000):
+        digest = TDigest(100)
+        digest.update(chunk)
+        parts.append(digest)
+    merged = parts[0]
+    for digest in parts[1:]:
+        merged.merge(digest)
+
+    for q, expected in zip((0.25, 0.5, 0.75), exact):
+        assert abs(merged.quantile(q) - expected) < 0.01 * spread
+
+
+def test_bloom_filter_sizing_has_no_false_negatives_and_keeps_its_rate(rng):
+    bloom = BloomFilter(100_000, fp_rate=0.01)
+    assert bloom.bits == math.ceil(-100_000 * math.log(0.01) / math.log(2) ** 2)
+    assert bloom.hashes == 7
+
+    members = rng.integers(0, 2 ** 63, 100_000, dtype=np.int64).astype(np.uint64)
+    others = rng.integers(0, 2 ** 63, 100_000, dtype=np.int64).astype(np.uint64) | np.uint64(1 << 63)
+    assert not bloom.add_and_check(members).any()
+    assert bloom.check(members).all()
+
+    observed = bloom.check(others).mean()
+    assert observed < 0.015
+    assert bloom.false_positive_rate() == pytest.approx(0.01, rel=0.05)
+
+
+def test_scalable_bloom_filter_grows_past_its_initial_capacity(rng):
+    bloom = ScalableBloomFilter(10_000, fp_rate=0.01)
+    members = rng.integers(0, 2 ** 63, 200_000, dtype=np.int64).astype(np.uint64)
+    for chunk in _chunks(members, 25_000):
+        bloom.add_and_check(chunk)
+
+    assert len(bloom.layers) > 1
+    assert bloom.false_positive_rate() < 0.01
+    others = rng.integers(0, 2 ** 63, 100_000, dtype=np.int64).astype(np.uint64) | np.uint64(1 << 63)
+    assert bloom.add_and_check(others).mean() < 0.01
+
+
+def test_scalable_bloom_filter_reports_the_rate_past_its_memory_cap(rng):
+    bloom = ScalableBloomFilter(10_000, fp_rate=0.01, max_bits=200_000)
+    bloom.add_and_check(rng.integers(0, 2 ** 63, 100_000, dtype=np.int64).astype(np.uint64))
+    assert bloom.bits <= 200_000
+    assert bloom.false_positive_rate() > 0.01
+
+
+def _frame_with_duplicates(rng, rows, duplicates):
+    df = pd.DataFrame({
+        "id": np.arange(rows, dtype=np.int64),
+        "value": rng.normal(size=rows),
+        "label": rng.choice(["a", "b", None], rows)
+    })
+    repeated = df.sample(duplicates, random_state=1)
+    return pd.concat([df, repeated], ignore_index=True).sample(frac=1, random_state=2).reset_index(drop=True)
+
+
+def test_streaming_profile_matches_pandas(rng):
+    df = _frame_with_duplicates(rng, 50_000, 1_234)
+    profiler = StreamingProfiler(duplicate_mode="exact", hll_precision=14, compression=100)
+    for start in range(0, len(df), 8_000):
+        profiler.update(df.iloc[start:start + 8_000])
+    profile = profiler.profile()
+
+    assert profile["row_count"] == len(df)
+    assert profile["duplicates"] == int(df.duplicated().sum())
+    assert profile["missing_values"] == df.isna().sum().to_dict()
+    assert profile["numeric_distribution"]["value"]["mean"] == pytest.approx(df["value"].mean(), rel=1e-9)
+    assert profile["numeric_distribution"]["value"]["std"] == pytest.approx(df["value"].std(), rel=1e-9)
+    assert abs(profile["distinct_counts"]["id"] - df["id"].nunique()) / df["id"].nunique() < 0.025
+    assert "duplicate_check" not in profile
+
+
+def test_bloom_duplicates_are_bounded_by_the_reported_error(rng):
+    df = _frame_with_duplicates(rng, 100_000, 500)
+    exact = int(df.duplicated().sum())
+    profiler = StreamingProfiler(duplicate_mode="approximate", expected_rows=len(df), bloom_fp_rate=0.01)
+    for start in range(0, len(df), 10_000):
+        profiler.update(df.iloc[start:start + 10_000])
+    check = profiler.profile()["duplicate_check"]
+
+    # A Bloom filter never misses a repeat; it can only add false positives, up to the bound
+    assert exact <= check["duplicates"] <= exact + check["error_bound"]
+    assert check["false_positive_rate"] < 0.01
+
+
+def test_bloom_duplicates_within_the_bound_are_inconclusive(rng):
+    df = pd.DataFrame({"id": np.arange(200_000, dtype=np.int64)})
+    profiler = StreamingProfiler(duplicate_mode="approximate", expected_rows=20_000, bloom_fp_rate=0.05,
+                                 bloom_max_bits=50_000)
+    for start in range(0, len(df), 20_000):
+        profiler.update(df.iloc[start:start + 20_000])
+    profile = profiler.profile()
+    assert profile["duplicates"] > 0
+
+    results = DQChecks.results_from_profile(profile)
+    issue = next(issue for issue in results["issues"] if issue["type"] == "Duplicate Rows")
+    assert issue["severity"] == "Low"
+    assert results["duplicate_check"]["inconclusive"]
+
+
+def test_exact_duplicates_switch_to_bloom_past_the_row_cap(rng):
+    df = pd.DataFrame({"a": rng.integers(0, 5_000, 20_000), "b": rng.integers(0, 3, 20_000)})
+    expected = int(df.duplicated().sum())
+    profiler = StreamingProfiler(duplicate_mode="exact", expected_rows=len(df), bloom_fp_rate=0.001, exact_max_rows=5_000)
+    for start in range(0, len(df), 2_000):
+        profiler.update(df.iloc[start:start + 2_000])
+    profile = profiler.profile()
+    check = profile["duplicate_check"]
+    assert check["switched_from_exact"] and check["exact_max_rows"] == 5_000
+    assert profiler._row_hashes == []
+    # The Bloom filter only overcounts, and by no more than its reported bound
+    assert expected <= profile["duplicates"] <= expected + check["error_bound"]
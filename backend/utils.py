@@ -6,11 +6,13 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Configure logging
+LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "outputs/logs")
+os.makedirs(LOG_DIR, exist_ok=True)
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     handlers=[
-        logging.FileHandler(os.path.join(os.path.dirname(os.path.dirname(__file__)), "outputs/logs/app.log")),
+        logging.FileHandler(os.path.join(LOG_DIR, "app.log")),
         logging.StreamHandler()
     ]
 )
@@ -24,5 +26,93 @@ def get_config():
         "token": os.getenv("DATABRICKS_TOKEN"),
         "warehouse_id": os.getenv("DATABRICKS_WAREHOUSE_ID"),
         "serving_endpoint": os.getenv("DATABRICKS_SERVING_ENDPOINT", "databricks-meta-llama-3-70b-instruct"),
-        "hf_token": os.getenv("HUGGINGFACE_API_TOKEN")
+        "hf_token": os.getenv("HUGGINGFACE_API_TOKEN"),
+        # 'auto' uses the REST API and falls back to the databricks CLI; 'rest' or 'cli' force one
+        "api_backend": os.getenv("DATABRICKS_API_BACKEND", "auto").lower(),
+        # Default relative error for approximate push-down profiling
+        "profile_relative_error": float(os.getenv("PROFILE_RELATIVE_ERROR", "0.05")),
+        # Column-batched push-down profiling for wide tables
+        "pushdown_batch_max_cost": int(os.getenv("PUSHDOWN_BATCH_MAX_COST", "300")),
+        "pushdown_max_concurrent_statements": int(os.getenv("PUSHDOWN_MAX_CONCURRENT_STATEMENTS", "4")),
+        "pushdown_batch_retries": int(os.getenv("PUSHDOWN_BATCH_RETRIES", "1")),
+        # Seed for REPEATABLE TABLESAMPLE scans so sampled results are deterministic
+        "sample_seed": int(os.getenv("SAMPLE_SEED", "42")),
+        # Parallel local profiling: worker count (0 = one per CPU core) and 'thread' or 'process' pool
+        "profiler_workers": int(os.getenv("PROFILER_WORKERS", "0")),
+        "profiler_executor": os.getenv("PROFILER_EXECUTOR", "thread").lower(),
+        # Chunked streaming profiler for files larger than memory
+        "streaming_chunk_rows": int(os.getenv("STREAMING_CHUNK_ROWS", "100000")),
+        "streaming_hll_precision": int(os.getenv("STREAMING_HLL_PRECISION", "14")),
+        "streaming_tdigest_compression": int(os.getenv("STREAMING_TDIGEST_COMPRESSION", "100")),
+        "streaming_bloom_fp_rate": float(os.getenv("STREAMING_BLOOM_FP_RATE", "0.001")),
+        "streaming_bloom_max_bits": int(os.getenv("STREAMING_BLOOM_MAX_BITS", str(1 << 30))),
+        # Row hashes kept by exact streamed duplicate detection (8 bytes each) before it switches to the Bloom filter
+        "streaming_exact_max_rows": int(os.getenv("STREAMING_EXACT_MAX_ROWS", "10000000")),
+        # Ranged DBFS reads: 'head' (first DBFS_SAMPLE_ROWS rows), 'blocks' (DBFS_SAMPLE_BLOCKS evenly spaced blocks) or 'full'
+        "dbfs_sample_mode": os.getenv("DBFS_SAMPLE_MODE", "head").lower(),
+        "dbfs_sample_rows": int(os.getenv("DBFS_SAMPLE_ROWS", "100000")),
+        "dbfs_sample_blocks": int(os.getenv("DBFS_SAMPLE_BLOCKS", "32")),
+        "dbfs_sample_block_bytes": int(os.getenv("DBFS_SAMPLE_BLOCK_BYTES", str(1 << 20))),
+        "dbfs_read_concurrency": int(os.getenv("DBFS_READ_CONCURRENCY", "4")),
+        "dbfs_parse_bytes": int(os.getenv("DBFS_PARSE_BYTES", str(16 << 20))),
+        # SQL statement lifecycle: overall deadline (then cancelled) and adaptive poll interval bounds
+        "sql_statement_timeout_seconds": float(os.getenv("SQL_STATEMENT_TIMEOUT_SECONDS", "1800")),
+        "sql_poll_initial_seconds": float(os.getenv("SQL_POLL_INITIAL_SECONDS", "0.5")),
+        "sql_poll_max_seconds": float(os.getenv("SQL_POLL_MAX_SECONDS", "10")),
+        # SQL statement results: Arrow chunks downloaded at once, and rows fetched when push-down profiling fails
+        "sql_result_download_concurrency": int(os.getenv("SQL_RESULT_DOWNLOAD_CONCURRENCY", "8")),
+        "sql_fallback_rows": int(os.getenv("SQL_FALLBACK_ROWS", "100000")),
+        # Batch scans: table scans running at once per warehouse, and the most tables one batch may cover
+        "batch_max_concurrent_scans": int(os.getenv("BATCH_MAX_CONCURRENT_SCANS", "4")),
+        "batch_max_tables": int(os.getenv("BATCH_MAX_TABLES", "1000")),
+        # Cost-aware scan planning: table sizes above which approximate / sampled profiles are recommended,
+        # and the warehouse scan rate assumed for time estimates
+        "scan_approximate_above_bytes": int(os.getenv("SCAN_APPROXIMATE_ABOVE_BYTES", str(100 * 10**9))),
+        "scan_sample_above_bytes": int(os.getenv("SCAN_SAMPLE_ABOVE_BYTES", str(10**12))),
+        "scan_planner_bytes_per_second": float(os.getenv("SCAN_PLANNER_BYTES_PER_SECOND", str(500 * 10**6))),
+        # Push-down profile result cache: memory bound (0 disables), entry lifetime, optional disk tier,
+        # and how long a table's Delta version is trusted before DESCRIBE HISTORY is asked again
+        "profile_cache_max_bytes": int(os.getenv("PROFILE_CACHE_MAX_BYTES", str(64 << 20))),
+        "profile_cache_ttl_seconds": float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "86400")),
+        "profile_cache_dir": os.getenv("PROFILE_CACHE_DIR", ""),
+        "profile_cache_disk_max_bytes": int(os.getenv("PROFILE_CACHE_DISK_MAX_BYTES", str(1 << 30))),
+        "profile_cache_version_ttl_seconds": float(os.getenv("PROFILE_CACHE_VERSION_TTL_SECONDS", "30")),
+        # LLM analysis cache: entry lifetime, entries kept, and directory persisting them ('' keeps them in memory only)
+        "llm_cache_ttl_seconds": float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400")),
+        "llm_cache_max_entries": int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+        "llm_cache_dir": os.getenv("LLM_CACHE_DIR", "../outputs/llm_cache"),
+        # Most tokens (estimated) an AI analysis prompt may use; issues and columns beyond it are summarized
+        "prompt_token_budget": int(os.getenv("PROMPT_TOKEN_BUDGET", "2000")),
+        # AI analysis: 'auto' (rules, plus the LLM for issues they do not cover), 'rules' or 'llm'
+        "ai_mode": os.getenv("AI_MODE", "auto").lower(),
+        # Serving endpoint calls: stream the completion token by token, and give up (falling back) after this long
+        "llm_streaming": os.getenv("LLM_STREAMING", "true").lower() == "true",
+        "llm_timeout_seconds": float(os.getenv("LLM_TIMEOUT_SECONDS", "120")),
+        # LLM request scheduling: concurrent requests, pacing (0 = unpaced), and batching of small tables' reports
+        "llm_max_in_flight": int(os.getenv("LLM_MAX_IN_FLIGHT", "4")),
+        "llm_requests_per_minute": float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60")),
+        "llm_batch_max_tables": int(os.getenv("LLM_BATCH_MAX_TABLES", "5")),
+        "llm_batch_table_max_tokens": int(os.getenv("LLM_BATCH_TABLE_MAX_TOKENS", "500")),
+        "llm_batch_window_seconds": float(os.getenv("LLM_BATCH_WINDOW_SECONDS", "1.0")),
+        # Local files may only be scanned from inside this directory
+        "local_data_dir": os.getenv("LOCAL_DATA_DIR", "data"),
+        # Where incremental Delta scans keep the mergeable profile of each table between runs
+        "profile_state_dir": os.getenv("PROFILE_STATE_DIR", "../outputs/profiles"),
+        # Scan history store: 'sqlite' (shared across workers, survives restarts) or 'memory'
+        "scan_store_backend": os.getenv("SCAN_STORE_BACKEND", "sqlite").lower(),
+        "scan_store_path": os.getenv("SCAN_STORE_PATH", "../outputs/scans.db"),
+        "scan_store_retention_days": float(os.getenv("SCAN_STORE_RETENTION_DAYS", "30")),
+        "scan_store_max_scans": int(os.getenv("SCAN_STORE_MAX_SCANS", "100000")),
+        "scan_persist_interval_seconds": float(os.getenv("SCAN_PERSIST_INTERVAL_SECONDS", "1")),
+        # Unity Catalog metadata cache
+        "metadata_cache_ttl_seconds": float(os.getenv("METADATA_CACHE_TTL_SECONDS", "300")),
+        "metadata_cache_max_entries": int(os.getenv("METADATA_CACHE_MAX_ENTRIES", "2048")),
+        # Shared HTTP connection pool for Databricks REST calls
+        "http_pool_size": int(os.getenv("DATABRICKS_HTTP_POOL_SIZE", "20")),
+        "http_keepalive_seconds": float(os.getenv("DATABRICKS_HTTP_KEEPALIVE_SECONDS", "60")),
+        "http_timeout_seconds": float(os.getenv("DATABRICKS_HTTP_TIMEOUT_SECONDS", "60")),
+        "http_max_retries": int(os.getenv("DATABRICKS_HTTP_MAX_RETRIES", "3")),
+        "http_backoff_seconds": float(os.getenv("DATABRICKS_HTTP_BACKOFF_SECONDS", "1.0")),
+        # Longest wait before a retry, whatever Retry-After asks for
+        "http_max_retry_delay_seconds": float(os.getenv("DATABRICKS_HTTP_MAX_RETRY_DELAY_SECONDS", "60"))
     }
@@ -16,6 +16,10 @@ function App() {
     const [activeTab, setActiveTab] = useState('results');
     const [mainView, setMainView] = useState('scanner'); // 'scanner' or 'catalog'
     const [scanPath, setScanPath] = useState('sample');
+    const [scanStage, setScanStage] = useState('');
+    const [activeScanId, setActiveScanId] = useState(null);
+    const [analysisStream, setAnalysisStream] = useState('');
+    const [llmPending, setLlmPending] = useState(false);
 
     useEffect(() => {
         fetch('http://localhost:8000/api/status')
@@ -30,23 +34,165 @@ function App() {
             });
     }, []);
 
-    const handleScan = async (path, type) => {
+    const pollScan = async (scanId, onResults) => {
+        // Scans run as background jobs; poll until the job reaches a terminal state
+        let shownResults = false;
+        while (true) {
+            const res = await fetch(`http://localhost:8000/api/scan/${scanId}`);
+            const data = await res.json();
+            if (data.status === 'complete') return data;
+            if (data.status === 'failed') throw new Error(data.error || 'Scan failed');
+            if (data.status === 'cancelled') throw new Error('Scan cancelled');
+            if (data.results && !shownResults) {
+                shownResults = true;
+                onResults(data);
+            }
+            setScanStage(`${data.stage} (${data.progress}%)`);
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    };
+
+    const followScan = (scanId, onResults) => new Promise((resolve, reject) => {
+        // DQ results arrive before the AI analysis, which then streams in token by token
+        const source = new EventSource(`http://localhost:8000/api/scan/${scanId}/events`);
+        let finished = false;
+        source.addEventListener('progress', (e) => {
+            const data = JSON.parse(e.data);
+            setScanStage(`${data.stage} (${data.progress}%)`);
+        });
+        source.addEventListener('results', (e) => {
+            setAnalysisStream('');
+            onResults(JSON.parse(e.data));
+        });
+        source.addEventListener('analysis_token', (e) => {
+            const { text } = JSON.parse(e.data);
+            setAnalysisStream(prev => prev + text);
+        });
+        source.addEventListener('end', (e) => {
+            finished = true;
+            source.close();
+            const data = JSON.parse(e.data);
+            if (data.status === 'complete') resolve(data);
+            else if (data.status === 'cancelled') reject(new Error('Scan cancelled'));
+            else reject(new Error(data.error || 'Scan failed'));
+        });
+        source.onerror = () => {
+            // Connection lost before the end event; fall back to polling
+            if (finished) return;
+            finished = true;
+            source.close();
+            pollScan(scanId, onResults).then(resolve, reject);
+        };
+    });
+
+    const showResults = (data) => {
+        setScanResult(data);
+        setMainView('scanner');
+        setActiveTab('results');
+    };
+
+    const confirmPlan = async (path, type, options) => {
+        // Table scans are estimated from metadata first; heavy ones need the user's go-ahead
+        if (type !== 'table' || path === 'sample' || path.split('.').length !== 3) return options;
+        const res = await fetch('http://localhost:8000/api/scan/plan', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ path, type, ...options })
+        });
+        if (!res.ok) return options;
+        const plan = await res.json();
+        setScanStage(plan.summary);
+        if (!plan.requires_confirmation) return options;
+        if (window.confirm(`${plan.summary}\n\nRun the recommended ${plan.recommended_strategy} scan instead?`)) {
+            return { ...options, ...plan.recommended_options };
+        }
+        if (window.confirm(`Run the ${plan.requested_strategy} scan anyway?`)) {
+            return { ...options, confirmed: true };
+        }
+        return null;
+    };
+
+    const handleScan = async (path, type, options = {}) => {
         setStatus('scanning');
+        setScanStage('');
         setScanPath(path);
         try {
+            options = await confirmPlan(path, type, options);
+            if (options === null) {
+                setStatus('online');
+                return;
+            }
             const res = await fetch('http://localhost:8000/api/scan', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ path, type })
+                body: JSON.stringify({ path, type, ...options })
             });
-            const data = await res.json();
+            const job = await res.json();
+            setActiveScanId(job.scan_id);
+            const data = await followScan(job.scan_id, showResults);
+            setScanResult(data);
+            setStatus('complete');
+        } catch (err) {
+            console.error(err);
+            setStatus('error');
+        } finally {
+            setScanStage('');
+            setActiveScanId(null);
+        }
+    };
+
+    const handleCancelScan = async () => {
+        // Stops the scan and cancels its statements on the warehouse; followScan then sees 'cancelled'
+        if (!activeScanId) return;
+        setScanStage('Cancelling...');
+        try {
+            await fetch(`http://localhost:8000/api/scan/${activeScanId}/cancel`, { method: 'POST' });
+        } catch (err) {
+            console.error(err);
+        }
+    };
+
+    const handleUpgradeScan = async (scanId) => {
+        // Re-run a sampled scan over the full table
+        setStatus('scanning');
+        try {
+            let res = await fetch(`http://localhost:8000/api/scan/${scanId}/upgrade`, { method: 'POST' });
+            if (res.status === 409) {
+                // The full scan is heavier than the planner recommends
+                const { detail } = await res.json();
+                if (!window.confirm(`${detail.plan.summary}\n\nRun the full scan anyway?`)) {
+                    setStatus('complete');
+                    return;
+                }
+                res = await fetch(`http://localhost:8000/api/scan/${scanId}/upgrade?confirmed=true`, { method: 'POST' });
+            }
+            const job = await res.json();
+            setActiveScanId(job.scan_id);
+            const data = await followScan(job.scan_id, showResults);
             setScanResult(data);
             setStatus('complete');
-            setMainView('scanner');
-            setActiveTab('results');
         } catch (err) {
             console.error(err);
             setStatus('error');
+        } finally {
+            setScanStage('');
+            setActiveScanId(null);
+        }
+    };
+
+    const handleRequestLLM = async (scanId) => {
+        // Replace a rule-based analysis with one from the serving endpoint
+        setLlmPending(true);
+        try {
+            const res = await fetch(`http://localhost:8000/api/scan/${scanId}/analyze`, { method: 'POST' });
+            const data = await res.json();
+            if (!res.ok) throw new Error(data.detail || 'LLM analysis failed');
+            setScanResult(prev => ({ ...prev, analysis: data.analysis, report_path: data.report_path }));
+        } catch (err) {
+            console.error(err);
+            window.alert(err.message);
+        } finally {
+            setLlmPending(false);
         }
     };
 
@@ -125,7 +271,7 @@ function App() {
             <!-- Scanner View -->
             ${mainView === 'scanner' && html`
                 <div>
-                    <${DataSelector} onScan=${handleScan} disabled=${status === 'scanning'} defaultPath=${scanPath} />
+                    <${DataSelector} onScan=${handleScan} onCancel=${activeScanId ? handleCancelScan : null} disabled=${status === 'scanning'} defaultPath=${scanPath} progress=${scanStage} />
 
                     ${scanResult && html`
                         <div className="card">
@@ -136,11 +282,11 @@ function App() {
                             </div>
 
                             ${activeTab === 'results' && html`
-                                <${DataQualityResults} results=${scanResult.results} analysis=${scanResult.analysis} />
+                                <${DataQualityResults} results=${scanResult.results} analysis=${scanResult.analysis} analysisStream=${analysisStream} onUpgrade=${() => handleUpgradeScan(scanResult.scan_id)} upgrading=${status === 'scanning'} onRequestLLM=${status === 'complete' ? () => handleRequestLLM(scanResult.scan_id) : null} llmPending=${llmPending} />
                             `}
 
                             ${activeTab === 'report' && html`
-                                <${ReportCard} reportPath=${scanResult.report_path} analysis=${scanResult.analysis} scanId=${scanResult.scan_id} />
+                                <${ReportCard} reportPath=${scanResult.report_path} analysis=${scanResult.analysis} analysisStream=${analysisStream} scanId=${scanResult.scan_id} />
                             `}
 
                             ${activeTab === 'fixit' && html`
@@ -13,6 +13,7 @@ export function CatalogBrowser({ onSelectTable }) {
     const [tableInfo, setTableInfo] = useState(null);
     const [loading, setLoading] = useState(true);
     const [isMockData, setIsMockData] = useState(false);
+    const [batch, setBatch] = useState(null);
 
     useEffect(() => {
         fetchCatalogs();
@@ -31,6 +32,25 @@ export function CatalogBrowser({ onSelectTable }) {
         }
     };
 
+    const refreshCatalogs = async () => {
+        // Drop the server-side metadata cache so the tree reflects the latest Unity Catalog state
+        try {
+            await fetch('/api/cache/invalidate', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({})
+            });
+        } catch (err) {
+            console.error('Failed to invalidate metadata cache:', err);
+        }
+        setSchemas({});
+        setTables({});
+        setExpandedCatalogs({});
+        setExpandedSchemas({});
+        setLoading(true);
+        fetchCatalogs();
+    };
+
     const toggleCatalog = async (catalogName) => {
         const isExpanded = expandedCatalogs[catalogName];
         setExpandedCatalogs({ ...expandedCatalogs, [catalogName]: !isExpanded });
@@ -62,6 +82,37 @@ export function CatalogBrowser({ onSelectTable }) {
         }
     };
 
+    const scanSchema = async (catalogName, schemaName) => {
+        // Profiles every table in the schema as a batch; smallest tables are scanned first
+        const target = `${catalogName}.${schemaName}`;
+        setBatch({ target, status: 'queued', stage: 'Starting batch scan', progress: 0, tables: [] });
+        try {
+            const res = await fetch('/api/batch-scan', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ path: target, priority: 'size' })
+            });
+            const job = await res.json();
+            if (!res.ok) throw new Error(job.detail || 'Batch scan failed');
+            while (true) {
+                const poll = await fetch(`/api/scan/${job.batch_id}`);
+                const data = await poll.json();
+                setBatch({
+                    target,
+                    status: data.status,
+                    stage: data.error || data.stage,
+                    progress: data.progress,
+                    tables: data.results?.tables || []
+                });
+                if (['complete', 'failed', 'cancelled'].includes(data.status)) break;
+                await new Promise(resolve => setTimeout(resolve, 2000));
+            }
+        } catch (err) {
+            console.error('Batch scan failed:', err);
+            setBatch({ target, status: 'failed', stage: err.message, progress: 0, tables: [] });
+        }
+    };
+
     const selectTable = async (catalogName, schemaName, tableName) => {
         const key = `${catalogName}.${schemaName}.${tableName}`;
         setSelectedTable(key);
@@ -175,7 +226,10 @@ export function CatalogBrowser({ onSelectTable }) {
             
             <div style=${styles.container}>
                 <div style=${styles.treePanel}>
-                    <h4 style=${{ marginBottom: '16px', color: '#111111' }}>Unity Catalog Explorer</h4>
+                    <div style=${{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', marginBottom: '16px' }}>
+                        <h4 style=${{ margin: 0, color: '#111111' }}>Unity Catalog Explorer</h4>
+                        <button onClick=${refreshCatalogs} style=${{ padding: '6px 12px', fontSize: '0.8125rem' }}>Refresh</button>
+                    </div>
                     
                     ${catalogs.map(catalog => html`
                         <div key=${catalog.name}>
@@ -203,6 +257,12 @@ export function CatalogBrowser({ onSelectTable }) {
                                                 <span style=${styles.icon}>${expandedSchemas[`${catalog.name}.${schema.name}`] ? '📂' : '📁'}</span>
                                                 <span style=${{ color: '#111111' }}>${schema.name}</span>
                                                 <span style=${{ ...styles.badge, backgroundColor: '#d4edda', color: '#008060' }}>schema</span>
+                                                <button
+                                                    onClick=${(e) => { e.stopPropagation(); scanSchema(catalog.name, schema.name); }}
+                                                    disabled=${batch && !['complete', 'failed', 'cancelled'].includes(batch.status)}
+                                                    title="Scan every table in this schema"
+                                                    style=${{ padding: '2px 8px', fontSize: '0.75rem' }}
+                                                >Scan schema</button>
                                             </div>
                                             
                                             ${expandedSchemas[`${catalog.name}.${schema.name}`] && tables[`${catalog.name}.${schema.name}`] && html`
@@ -238,6 +298,19 @@ export function CatalogBrowser({ onSelectTable }) {
                 </div>
                 
                 <div style=${styles.detailPanel}>
+                    ${batch && html`
+                        <div style=${{ marginBottom: '24px', paddingBottom: '16px', borderBottom: '1px solid #e9ecef' }}>
+                            <h4 style=${{ margin: '0 0 8px 0', color: '#111111' }}>Batch scan: ${batch.target}</h4>
+                            <p style=${{ color: '#444444', margin: '0 0 12px 0', fontSize: '0.875rem' }}>${batch.stage} (${batch.progress}%)</p>
+                            ${batch.tables.map(t => html`
+                                <div key=${t.table} style=${{ ...styles.columnRow, gridTemplateColumns: '1fr 100px 80px', padding: '6px 12px' }}>
+                                    <span style=${{ color: '#111111' }}>${t.table}</span>
+                                    <span style=${{ color: t.status === 'failed' ? '#CC3300' : t.status === 'complete' ? '#008060' : '#444444' }}>${t.status}</span>
+                                    <span style=${{ fontWeight: '600' }}>${t.dq_score ?? ''}</span>
+                                </div>
+                            `)}
+                        </div>
+                    `}
                     ${!tableInfo && html`
                         <div style=${{ textAlign: 'center', padding: '60px 20px', color: '#666666' }}>
                             <p style=${{ fontSize: '1.125rem', marginBottom: '8px' }}>Select a table to view details</p>
@@ -4,7 +4,23 @@ import { colors } from '../colorblind_palette.js';
 
 const html = htm.bind(React.createElement);
 
-export function DataQualityResults({ results, analysis }) {
+// Reads a string field out of a JSON completion that is still streaming in (possibly cut off mid-value)
+function streamedField(text, key) {
+    const match = (text || '').match(new RegExp(`"${key}"\\s*:\\s*"((?:[^"\\\\]|\\\\.)*)`));
+    if (!match) return null;
+    try {
+        return JSON.parse(`"${match[1].replace(/\\$/, '')}"`);
+    } catch (err) {
+        return match[1];
+    }
+}
+
+export function DataQualityResults({ results, analysis, analysisStream, onUpgrade, upgrading, onRequestLLM, llmPending }) {
+    // Until the analysis completes, show whatever of it has streamed in so far
+    const pending = 'AI analysis in progress...';
+    const summary = analysis ? analysis.summary : (streamedField(analysisStream, 'summary') || pending);
+    const pipelineHealth = analysis ? analysis.pipeline_health : (streamedField(analysisStream, 'pipeline_health') || pending);
+    const rootCause = analysis ? analysis.root_cause_analysis : streamedField(analysisStream, 'root_cause_analysis');
     const chartRef = useRef(null);
 
     useEffect(() => {
@@ -88,10 +104,81 @@ export function DataQualityResults({ results, analysis }) {
                     </div>
                     <div>
                         <h3 style=${{ fontSize: '1.25rem', marginBottom: '8px', color: '#111111' }}>Data Quality Score</h3>
-                        <p style=${{ margin: 0, color: '#444444', fontSize: '1rem', lineHeight: '1.6' }}>${analysis.summary}</p>
+                        <p style=${{ margin: 0, color: '#444444', fontSize: '1rem', lineHeight: '1.6' }}>${summary}</p>
+                        ${analysis?.analysis_source && html`
+                            <div style=${{ display: 'flex', alignItems: 'center', gap: '12px', marginTop: '8px', fontSize: '0.875rem', color: '#666666' }}>
+                                <span>${{ rules: 'Rule-based analysis', llm: 'LLM analysis', 'rules+llm': 'Rule-based analysis with LLM for uncovered issues' }[analysis.analysis_source]}</span>
+                                ${analysis.analysis_source === 'rules' && onRequestLLM && html`
+                                    <button onClick=${onRequestLLM} disabled=${llmPending}>
+                                        ${llmPending ? 'Asking the LLM...' : 'Ask the LLM'}
+                                    </button>
+                                `}
+                            </div>
+                        `}
                     </div>
                 </div>
 
+                ${results.profile_mode === 'approximate' && html`
+                    <div style=${{
+            padding: '12px 16px',
+            marginBottom: '16px',
+            backgroundColor: '#fff3cd',
+            border: '1px solid #ffc107',
+            borderRadius: '8px',
+            fontSize: '0.875rem',
+            color: '#664d03'
+        }}>
+                        <strong>Approximate profile:</strong> ${(results.estimated_metrics || []).map(m => m.replace('_', ' ')).join(', ')} are estimates
+                        ${results.relative_error ? ` (±${Math.round(results.relative_error * 100)}% relative error)` : ''}.
+                    </div>
+                `}
+
+                ${results.sampling && html`
+                    <div style=${{
+            display: 'flex',
+            alignItems: 'center',
+            justifyContent: 'space-between',
+            gap: '16px',
+            padding: '12px 16px',
+            marginBottom: '16px',
+            backgroundColor: '#cce5ff',
+            border: '1px solid #0066CC',
+            borderRadius: '8px',
+            fontSize: '0.875rem',
+            color: '#003d7a'
+        }}>
+                        <span>
+                            <strong>Sampled scan:</strong> ${results.sampling.sampled_rows.toLocaleString()} rows profiled
+                            (${results.sampling.value}${results.sampling.method === 'percent' ? '%' : ' rows'} TABLESAMPLE).
+                            Null ratios are judged at 95% confidence.
+                        </span>
+                        ${onUpgrade && html`
+                            <button onClick=${onUpgrade} disabled=${upgrading} style=${{ flexShrink: 0 }}>
+                                ${upgrading ? 'Running...' : 'Upgrade to Full Scan'}
+                            </button>
+                        `}
+                    </div>
+                `}
+
+                ${results.incremental && html`
+                    <div style=${{
+            padding: '12px 16px',
+            marginBottom: '16px',
+            backgroundColor: '#d1e7dd',
+            border: '1px solid #198754',
+            borderRadius: '8px',
+            fontSize: '0.875rem',
+            color: '#0f5132'
+        }}>
+                        <strong>Incremental scan:</strong> Delta version ${results.incremental.version} —
+                        ${results.incremental.mode === 'incremental'
+                ? ` merged ${results.incremental.rows_added.toLocaleString()} new rows into the profile from version ${results.incremental.previous_version}.`
+                : results.incremental.mode === 'unchanged'
+                    ? ' table unchanged since the stored profile.'
+                    : ' full profile stored as the new baseline.'}
+                    </div>
+                `}
+
                 <h4 style=${{ fontSize: '1.125rem', marginBottom: '16px', color: '#111111' }}>Identified Issues</h4>
                 <ul style=${{ listStyle: 'none', padding: 0, margin: 0 }}>
                     ${results.issues.map((issue, idx) => html`
@@ -134,9 +221,9 @@ export function DataQualityResults({ results, analysis }) {
         }}>
                     <div style=${{ marginBottom: '12px' }}>
                         <strong style=${{ color: '#111111', fontSize: '1rem' }}>Status:</strong>
-                        <span style=${{ marginLeft: '8px', color: '#444444', fontSize: '1rem' }}>${analysis.pipeline_health}</span>
+                        <span style=${{ marginLeft: '8px', color: '#444444', fontSize: '1rem' }}>${pipelineHealth}</span>
                     </div>
-                    <p style=${{ margin: 0, color: '#444444', fontSize: '0.9375rem', lineHeight: '1.6' }}>${analysis.root_cause_analysis}</p>
+                    <p style=${{ margin: 0, color: '#444444', fontSize: '0.9375rem', lineHeight: '1.6', whiteSpace: 'pre-line' }}>${rootCause}</p>
                 </div>
             </div>
         </div>
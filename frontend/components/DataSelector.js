@@ -3,20 +3,37 @@ import htm from 'https://esm.sh/htm@3.1.1';
 
 const html = htm.bind(React.createElement);
 
-export function DataSelector({ onScan, disabled }) {
+export function DataSelector({ onScan, onCancel, disabled, progress }) {
     const [path, setPath] = useState('sample');
     const [type, setType] = useState('file');
+    const [profileMode, setProfileMode] = useState('exact');
+    const [samplePercent, setSamplePercent] = useState('');
+    const [duplicateMode, setDuplicateMode] = useState('');
+    const [incremental, setIncremental] = useState(false);
+    const [fileSampleMode, setFileSampleMode] = useState('');
 
     const handleSubmit = (e) => {
         e.preventDefault();
-        onScan(path, type);
+        const options = { profile_mode: profileMode };
+        if (type === 'table' && duplicateMode !== '') {
+            options.duplicate_mode = duplicateMode;
+        }
+        if (type === 'file' && fileSampleMode !== '') {
+            options.file_sample_mode = fileSampleMode;
+        }
+        if (type === 'table' && incremental) {
+            options.incremental = true;
+        } else if (type === 'table' && samplePercent !== '') {
+            options.sample_percent = parseFloat(samplePercent);
+        }
+        onScan(path, type, options);
     };
 
     return html`
         <div className="card">
             <h3 style=${{ marginBottom: '20px', fontSize: '1.25rem', color: '#111111' }}>Select Data Source</h3>
             <form onSubmit=${handleSubmit}>
-                <div style=${{ display: 'grid', gridTemplateColumns: '1fr 180px', gap: '16px', marginBottom: '16px' }}>
+                <div style=${{ display: 'grid', gridTemplateColumns: '1fr 160px 160px 160px 120px 150px', gap: '16px', marginBottom: '16px' }}>
                     <div>
                         <label style=${{ display: 'block', marginBottom: '8px', fontWeight: '600', color: '#111111' }}>DBFS Path or Table Name</label>
                         <input 
@@ -38,9 +55,86 @@ export function DataSelector({ onScan, disabled }) {
                             <option value="table">Delta Table</option>
                         </select>
                     </div>
+                    <div>
+                        <label style=${{ display: 'block', marginBottom: '8px', fontWeight: '600', color: '#111111' }}>Profile Mode</label>
+                        <select 
+                            value=${profileMode} 
+                            onChange=${(e) => setProfileMode(e.target.value)}
+                            disabled=${type !== 'table'}
+                            style=${{ marginBottom: 0, width: '100%' }}
+                        >
+                            <option value="exact">Exact</option>
+                            <option value="approximate">Approximate (fast)</option>
+                        </select>
+                    </div>
+                    <div>
+                        <label style=${{ display: 'block', marginBottom: '8px', fontWeight: '600', color: '#111111' }}>Duplicates</label>
+                        <select 
+                            value=${duplicateMode} 
+                            onChange=${(e) => setDuplicateMode(e.target.value)}
+                            disabled=${type !== 'table'}
+                            style=${{ marginBottom: 0, width: '100%' }}
+                        >
+                            <option value="">Match profile</option>
+                            <option value="exact">Exact (row hash)</option>
+                            <option value="approximate">Approximate (HLL)</option>
+                            <option value="key">By inferred key</option>
+                            <option value="none">Skip</option>
+                        </select>
+                    </div>
+                    <div>
+                        <label style=${{ display: 'block', marginBottom: '8px', fontWeight: '600', color: '#111111' }}>Sample %</label>
+                        <input 
+                            type="number" 
+                            min="0.01" 
+                            max="100" 
+                            step="any"
+                            value=${samplePercent} 
+                            onChange=${(e) => setSamplePercent(e.target.value)} 
+                            placeholder="Full scan"
+                            disabled=${type !== 'table' || incremental}
+                            style=${{ marginBottom: 0, width: '100%' }}
+                        />
+                    </div>
+                    <div>
+                        <label style=${{ display: 'block', marginBottom: '8px', fontWeight: '600', color: '#111111' }}>DBFS Sample</label>
+                        <select 
+                            value=${fileSampleMode} 
+                            onChange=${(e) => setFileSampleMode(e.target.value)}
+                            disabled=${type !== 'file'}
+                            style=${{ marginBottom: 0, width: '100%' }}
+                        >
+                            <option value="">Default</option>
+                            <option value="head">First rows</option>
+                            <option value="blocks">Spread blocks</option>
+                            <option value="full">Whole file</option>
+                        </select>
+                    </div>
                 </div>
                 <div style=${{ display: 'flex', alignItems: 'center', justifyContent: 'space-between', marginTop: '20px' }}>
-                    <small style=${{ color: '#444444', fontSize: '0.9rem' }}>Tip: Use "sample" to test with mock data.</small>
+                    <div style=${{ display: 'flex', alignItems: 'center', gap: '24px' }}>
+                        <label style=${{ display: 'flex', alignItems: 'center', gap: '8px', fontWeight: '600', color: '#111111' }}>
+                            <input 
+                                type="checkbox" 
+                                checked=${incremental} 
+                                onChange=${(e) => setIncremental(e.target.checked)}
+                                disabled=${type !== 'table'}
+                                style=${{ marginBottom: 0 }}
+                            />
+                            Incremental (Delta)
+                        </label>
+                        <small style=${{ color: '#444444', fontSize: '0.9rem' }}>${disabled && progress ? progress : 'Tip: Use "sample" to test with mock data.'}</small>
+                    </div>
+                    <div style=${{ display: 'flex', gap: '12px' }}>
+                    ${disabled && onCancel && html`
+                        <button 
+                            type="button" 
+                            onClick=${onCancel}
+                            style=${{ padding: '12px 20px', fontSize: '1rem', fontWeight: '600', background: '#ffffff', color: '#B00020', border: '2px solid #B00020' }}
+                        >
+                            Cancel
+                        </button>
+                    `}
                     <button 
                         type="submit" 
                         disabled=${disabled}
@@ -53,6 +147,7 @@ export function DataSelector({ onScan, disabled }) {
                     >
                         ${disabled ? 'Scanning...' : 'Run Quality Scan'}
                     </button>
+                    </div>
                 </div>
             </form>
         </div>
@@ -3,15 +3,16 @@ import htm from 'https://esm.sh/htm@3.1.1';
 
 const html = htm.bind(React.createElement);
 
-export function ReportCard({ reportPath, analysis, scanId }) {
+export function ReportCard({ reportPath, analysis, analysisStream, scanId }) {
     const [reportContent, setReportContent] = useState(null);
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
-        if (scanId) {
+        // The report is written once the AI analysis has finished
+        if (scanId && analysis) {
             fetchReport();
         }
-    }, [scanId]);
+    }, [scanId, analysis]);
 
     const fetchReport = async () => {
         try {
@@ -121,6 +122,15 @@ export function ReportCard({ reportPath, analysis, scanId }) {
         }
     };
 
+    if (!analysis) {
+        return html`
+            <div>
+                <p>The report is generated when the AI analysis completes.</p>
+                ${analysisStream && html`<pre style=${styles.codeBlock}>${analysisStream}</pre>`}
+            </div>
+        `;
+    }
+
     if (loading) {
         return html`<div><p>Loading report...</p></div>`;
     }
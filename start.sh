@@ -3,7 +3,7 @@ echo "Starting Databricks PS AI Data Quality Guardrail..."
 
 # Check for Databricks CLI
 if ! command -v databricks &> /dev/null; then
-    echo "Warning: databricks CLI not found. Some features may not work."
+    echo "Note: databricks CLI not found. The REST API will be used without a CLI fallback."
     echo "Please install it: pip install databricks-cli"
 fi
 